@@ -0,0 +1,163 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import (ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS,
+                     DEADLINE_EXCEEDED, STAGE_HOOKS)
+
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class Overloaded(Exception):
+    """Raised when an analysis is turned away; retry_after is a suggested wait in whole seconds."""
+
+    def __init__(self, modality, reason, retry_after):
+        super().__init__(f"Too many {modality} analyses in progress ({reason})")
+        self.modality = modality
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage starts after its request's deadline; the client has stopped waiting."""
+
+    def __init__(self, stage):
+        super().__init__(f"Deadline exceeded before stage '{stage}'")
+        self.stage = stage
+
+
+class AdmissionController:
+    """
+    Limit how many analyses of one modality run at once.
+
+    Up to max_in_flight analyses run; up to max_queue more wait at most
+    queue_timeout seconds (or until their deadline) for a slot. Anything
+    beyond is rejected at once with Overloaded, so a burst costs the rejected
+    clients a fast 503 instead of slowing everyone down. Retry-After is
+    estimated from recent service times.
+
+    Parameters:
+        modality (str): Label for metrics and errors, e.g. 'voice'.
+        max_in_flight (int): Analyses allowed to run concurrently.
+        max_queue (int): Analyses allowed to wait for a slot.
+        queue_timeout (float): Longest wait for a slot, in seconds.
+    """
+
+    def __init__(self, modality, max_in_flight, max_queue, queue_timeout=2.0):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.modality = modality
+        self.max_in_flight = int(max_in_flight)
+        self.max_queue = int(max_queue)
+        self.queue_timeout = float(queue_timeout)
+        self._in_flight = 0
+        self._queued = 0
+        self._service_seconds = None  # moving average of how long a slot is held
+        self._stats = {'admitted': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0}
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def admit(self, block=False):
+        """
+        Hold a slot for the duration of the block.
+
+        Parameters:
+            block (bool): Wait for a slot however long it takes, ignoring the queue
+                limits; for background jobs, whose clients are not waiting.
+        """
+        self._acquire(block)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+
+    def _acquire(self, block):
+        start = time.monotonic()
+        with self._cond:
+            if self._in_flight >= self.max_in_flight:
+                if not block and self._queued >= self.max_queue:
+                    self._reject('queue_full')
+                wait = None if block else self.queue_timeout
+                left = remaining()
+                if left is not None:
+                    wait = left if wait is None else min(wait, left)
+                self._set_queued(self._queued + 1)
+                try:
+                    admitted = self._cond.wait_for(lambda: self._in_flight < self.max_in_flight, wait)
+                finally:
+                    self._set_queued(self._queued - 1)
+                if not admitted:
+                    self._reject('timeout')
+            self._in_flight += 1
+            self._stats['admitted'] += 1
+        ADMISSION_IN_FLIGHT.inc(modality=self.modality)
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - start, modality=self.modality)
+
+    def _release(self, held):
+        ADMISSION_IN_FLIGHT.dec(modality=self.modality)
+        with self._cond:
+            self._in_flight -= 1
+            average = self._service_seconds
+            self._service_seconds = held if average is None else 0.8 * average + 0.2 * held
+            self._cond.notify()
+
+    def _set_queued(self, queued):
+        # Caller holds the condition's lock
+        self._queued = queued
+        ADMISSION_QUEUED.set(queued, modality=self.modality)
+
+    def _reject(self, reason):
+        # Caller holds the condition's lock
+        self._stats[f'rejected_{reason}'] += 1
+        ADMISSION_REJECTED.inc(modality=self.modality, reason=reason)
+        # Time for everyone ahead (in flight and queued) to drain through the slots
+        service = self._service_seconds or 1.0
+        retry_after = math.ceil(service * (self._queued + self._in_flight) / self.max_in_flight)
+        raise Overloaded(self.modality, reason, min(max(retry_after, 1), MAX_RETRY_AFTER_SECONDS))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'queued': self._queued,
+                'avg_service_ms': (self._service_seconds or 0.0) * 1000,
+                **self._stats,
+            }
+
+
+# Monotonic deadline of the current request, None when it has none
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Give the work in this context (and in copies of it, see AnalysisEngine.run)
+    `seconds` to finish: stages that start later raise DeadlineExceeded.
+    """
+    token = _deadline.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline (may be negative), or None without one."""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+def check_deadline(stage):
+    end = _deadline.get()
+    if end is not None and time.monotonic() > end:
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+
+
+STAGE_HOOKS.append(check_deadline)
@@ -0,0 +1,120 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import stage
+from voice_extraction import extract_features, assess_parkinsons
+
+NO_RESULT = {'prediction': "No"}
+
+def assess_voice(features, reference=None):
+    """
+    Score extracted voice features into the common voice result structure.
+
+    Parameters:
+        features (dict): The 22 voice features.
+        reference (ReferenceIndex): Also report the nearest labelled recordings under 'reference'
+            (left out when a feature is not finite).
+    """
+    prediction, risk_factors, risk_details = assess_parkinsons(features)
+    result = {
+        'prediction': prediction,
+        'risk_factors': risk_factors,
+        'risk_details': risk_details
+    }
+    vote = reference.assess(features) if reference is not None else None
+    if vote is not None:
+        result['reference'] = vote
+    return result
+
+def analyze_voice(source, f0_method='pyin', reference=None):
+    """Analyze a voice recording given as a path, bytes, file-like object or (y, sr) pair."""
+    return assess_voice(extract_features(source, f0_method=f0_method), reference=reference)
+
+@stage('fusion')
+def late_fusion(voice_result, handwriting_result, voice_weight=0.5, hw_weight=0.5):
+    """Combine the per-modality predictions with a weighted vote."""
+    voice_score = 1 if voice_result['prediction'] == "Yes" else 0
+    hw_score = 1 if handwriting_result['prediction'] == "Yes" else 0
+    
+    combined_score = (voice_score * voice_weight + hw_score * hw_weight)
+    final_prediction = "Yes" if combined_score >= 0.5 else "No"
+    confidence = combined_score if final_prediction == "Yes" else (1 - combined_score)
+    
+    return {
+        'prediction': final_prediction,
+        'confidence': confidence
+    }
+
+class AnalysisEngine:
+    """
+    Run voice and handwriting analysis concurrently and fuse the results.
+
+    The two stages share nothing, so the librosa work and the Swin forward
+    pass overlap and a request takes max(voice, handwriting) rather than the sum.
+
+    Parameters:
+        analyze_voice (callable): Voice input -> voice result dict.
+        analyze_handwriting (callable): Handwriting input -> handwriting result dict.
+        voice_weight (float): Weight of the voice vote in late fusion.
+        hw_weight (float): Weight of the handwriting vote in late fusion.
+        fuse_missing (bool): Fuse even when one modality is absent, counting it as "No".
+    """
+
+    def __init__(self, analyze_voice, analyze_handwriting, voice_weight=0.5, hw_weight=0.5,
+                 fuse_missing=False, max_workers=4):
+        self.analyze_voice = analyze_voice
+        self.analyze_handwriting = analyze_handwriting
+        self.voice_weight = voice_weight
+        self.hw_weight = hw_weight
+        self.fuse_missing = fuse_missing
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-stage")
+
+    def run(self, voice_input=None, handwriting_input=None):
+        """
+        Analyze whichever inputs are given and return the common result structure:
+        voice_analysis, handwriting_analysis, combined (when fused) and timings in ms.
+        """
+        start = time.perf_counter()
+        timings = {}
+
+        def timed(name, stage, value):
+            stage_start = time.perf_counter()
+            try:
+                return stage(value)
+            finally:
+                timings[name] = (time.perf_counter() - stage_start) * 1000
+
+        # Each stage runs in a copy of the caller's context so per-request profiling sees it
+        futures = {}
+        if voice_input is not None:
+            futures['voice_analysis'] = self._executor.submit(
+                contextvars.copy_context().run, timed, 'voice', self.analyze_voice, voice_input)
+        if handwriting_input is not None:
+            futures['handwriting_analysis'] = self._executor.submit(
+                contextvars.copy_context().run, timed, 'handwriting', self.analyze_handwriting, handwriting_input)
+
+        results = {'voice_analysis': None, 'handwriting_analysis': None}
+        for name, future in futures.items():
+            results[name] = future.result()
+
+        results.update(self.fuse(results, timings))
+        timings['total'] = (time.perf_counter() - start) * 1000
+        results['timings'] = timings
+        return results
+
+    def fuse(self, results, timings=None):
+        """Return {'combined': ...} when the available results can be fused, else {}."""
+        voice = results.get('voice_analysis')
+        handwriting = results.get('handwriting_analysis')
+        if not (voice and handwriting):
+            if not self.fuse_missing:
+                return {}
+            voice = voice or NO_RESULT
+            handwriting = handwriting or NO_RESULT
+
+        fusion_start = time.perf_counter()
+        combined = late_fusion(voice, handwriting, self.voice_weight, self.hw_weight)
+        if timings is not None:
+            timings['fusion'] = (time.perf_counter() - fusion_start) * 1000
+        return {'combined': combined}
@@ -1,20 +1,148 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, url_for, g, Response
 import os
-from werkzeug.utils import secure_filename
-from voice_extraction import extract_features, assess_parkinsons
-from transformers import pipeline
-import uuid
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import ExitStack, nullcontext
+import numpy as np
+from voice_extraction import extract_features, AudioDecodeError, FEATURE_EXTRACTOR_VERSION
+import voice_extraction
+import handwriting
+from handwriting import (HANDWRITING_MODEL_ID, DEFAULT_BACKEND, DEFAULT_QUANTIZE, preprocess_image,
+                         image_spec, classify_pixel_batch, interpret_prediction)
+from analysis_engine import AnalysisEngine, assess_voice
+from batching import MicroBatcher
+from result_cache import ResultCache, content_key
+from jobs import JobManager, JobStoreFull
+from warmup import BackgroundWarmup
+from voice_stream import VoiceStreamSessions, StreamStoreFull, audio_duration, extract_features_chunked
+from metrics import (REGISTRY, IN_FLIGHT, REQUESTS, REQUEST_SECONDS, UPLOAD_BYTES, DEADLINE_EXCEEDED, stage,
+                     profiling)
+from admission import AdmissionController, Overloaded, DeadlineExceeded, deadline, remaining
+from serving import available_cpus
+from reference_index import INDEX_DIR, load_reference_index
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Handwriting micro-batching: flush after this many images or this many milliseconds
+app.config['HANDWRITING_MAX_BATCH_SIZE'] = int(os.environ.get('HANDWRITING_MAX_BATCH_SIZE', 8))
+app.config['HANDWRITING_MAX_WAIT_MS'] = float(os.environ.get('HANDWRITING_MAX_WAIT_MS', 5))
+# Pitch tracker for voice analysis: 'pyin' (accurate) or 'yin' (fast), see f0_report.py
+app.config['VOICE_F0_METHOD'] = os.environ.get('VOICE_F0_METHOD', 'pyin')
+# Per-modality result cache keyed by upload content; set RESULT_CACHE_DIR to persist across restarts
+app.config['RESULT_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1024))
+app.config['RESULT_CACHE_TTL_SECONDS'] = float(os.environ.get('RESULT_CACHE_TTL_SECONDS', 24 * 3600))
+app.config['RESULT_CACHE_DIR'] = os.environ.get('RESULT_CACHE_DIR') or None
+# Background analysis jobs: worker pool size, jobs held in memory, and how long results are kept
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_MAX_JOBS'] = int(os.environ.get('JOB_MAX_JOBS', 256))
+app.config['JOB_TTL_SECONDS'] = float(os.environ.get('JOB_TTL_SECONDS', 600))
+app.config['JOB_MAX_WAIT_SECONDS'] = 30.0
+# Handwriting inference backend: 'eager', 'torchscript' or 'onnx' (+ int8), see handwriting_backend_report.py
+app.config['HANDWRITING_BACKEND'] = DEFAULT_BACKEND
+app.config['HANDWRITING_QUANTIZE'] = DEFAULT_QUANTIZE
+# Reduced-resolution JPEG decoding and Image.reduce before the resize; 0 resizes the full image like the pipeline
+app.config['HANDWRITING_FAST_PREPROCESS'] = os.environ.get('HANDWRITING_FAST_PREPROCESS', '1') != '0'
+# Load and warm up the models on a background thread at import; set WARMUP_ON_STARTUP=0 to defer
+app.config['WARMUP_ON_STARTUP'] = os.environ.get('WARMUP_ON_STARTUP', '1') != '0'
+# How long a handwriting request waits for the model to finish loading
+app.config['MODEL_READY_TIMEOUT_SECONDS'] = float(os.environ.get('MODEL_READY_TIMEOUT_SECONDS', 120))
+# Streaming voice analysis: pitch tracker ('yin' updates while audio arrives, 'pyin' runs at the end),
+# open streams held in memory, idle expiry and the longest accepted recording. The tracker defaults to
+# VOICE_F0_METHOD so a recorded clip gets the same assessment as its upload and as the reference index
+app.config['VOICE_STREAM_F0_METHOD'] = os.environ.get('VOICE_STREAM_F0_METHOD', app.config['VOICE_F0_METHOD'])
+app.config['VOICE_STREAM_MAX_STREAMS'] = int(os.environ.get('VOICE_STREAM_MAX_STREAMS', 64))
+app.config['VOICE_STREAM_TTL_SECONDS'] = float(os.environ.get('VOICE_STREAM_TTL_SECONDS', 300))
+app.config['VOICE_STREAM_MAX_SECONDS'] = float(os.environ.get('VOICE_STREAM_MAX_SECONDS', 120))
+# Recordings longer than VOICE_CHUNKED_MIN_SECONDS are analysed block by block in bounded memory;
+# only the first VOICE_MAX_SECONDS of a recording are analysed (0 for no limit)
+app.config['VOICE_CHUNKED_MIN_SECONDS'] = float(os.environ.get('VOICE_CHUNKED_MIN_SECONDS', 30))
+app.config['VOICE_MAX_SECONDS'] = float(os.environ.get('VOICE_MAX_SECONDS', 600))
+# Compare each recording with its REFERENCE_K nearest labelled recordings (see reference_index.py);
+# REFERENCE_SEARCH is 'exact', 'ivf' (approximate) or 'auto'. An empty REFERENCE_INDEX_DIR turns it off
+app.config['REFERENCE_INDEX_DIR'] = os.environ.get('REFERENCE_INDEX_DIR', INDEX_DIR)
+app.config['REFERENCE_K'] = int(os.environ.get('REFERENCE_K', 5))
+app.config['REFERENCE_SEARCH'] = os.environ.get('REFERENCE_SEARCH', 'auto')
+app.config['REFERENCE_NPROBE'] = int(os.environ.get('REFERENCE_NPROBE', 8))
+# Allow clients to request a per-stage timing breakdown with /analyze?profile=1
+app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', '1') != '0'
+# Admission control: analyses of each modality running at once (default: this worker's share of the
+# CPUs for voice, one batch for handwriting), how many more may wait for a slot and for how long
+_cpu_share = max(1, available_cpus() // int(os.environ.get('WEB_CONCURRENCY') or 1))
+app.config['ADMISSION_VOICE_MAX_IN_FLIGHT'] = int(os.environ.get('ADMISSION_VOICE_MAX_IN_FLIGHT', _cpu_share))
+app.config['ADMISSION_VOICE_MAX_QUEUE'] = int(
+    os.environ.get('ADMISSION_VOICE_MAX_QUEUE', app.config['ADMISSION_VOICE_MAX_IN_FLIGHT']))
+app.config['ADMISSION_HANDWRITING_MAX_IN_FLIGHT'] = int(
+    os.environ.get('ADMISSION_HANDWRITING_MAX_IN_FLIGHT', app.config['HANDWRITING_MAX_BATCH_SIZE']))
+app.config['ADMISSION_HANDWRITING_MAX_QUEUE'] = int(
+    os.environ.get('ADMISSION_HANDWRITING_MAX_QUEUE', app.config['ADMISSION_HANDWRITING_MAX_IN_FLIGHT']))
+app.config['ADMISSION_QUEUE_TIMEOUT_SECONDS'] = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', 2.0))
+# Stages of an /analyze request that would start later than this are abandoned with a 504;
+# clients can ask for less with an X-Request-Timeout header (seconds)
+app.config['REQUEST_DEADLINE_SECONDS'] = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 60))
 
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Load the handwriting model in the background, then warm up both pipelines
+warmup = BackgroundWarmup([
+    ('handwriting_model', lambda: handwriting.load_handwriting_model(
+        backend=app.config['HANDWRITING_BACKEND'], quantize=app.config['HANDWRITING_QUANTIZE'])),
+    ('handwriting_forward', lambda: handwriting.warm_up(warmup.result('handwriting_model'))),
+    ('voice_pipeline', lambda: voice_extraction.warm_up(app.config['VOICE_F0_METHOD'])),
+])
 
-# Initialize the handwriting model
-handwriting_model = pipeline("image-classification", 
-                           "gianlab/swin-tiny-patch4-window7-224-finetuned-parkinson-classification")
+def handwriting_model():
+    # With WARMUP_ON_STARTUP=0 the first handwriting request starts the loading
+    warmup.start()
+    return warmup.result('handwriting_model', timeout=app.config['MODEL_READY_TIMEOUT_SECONDS'])
+
+def classify_handwriting_batch(pixels):
+    model = handwriting_model()
+    with stage('handwriting.forward_batch'):
+        return classify_pixel_batch(model, np.stack(pixels))
+
+handwriting_batcher = MicroBatcher(classify_handwriting_batch,
+                                   max_batch_size=app.config['HANDWRITING_MAX_BATCH_SIZE'],
+                                   max_wait_ms=app.config['HANDWRITING_MAX_WAIT_MS'])
+
+result_cache = ResultCache(max_entries=app.config['RESULT_CACHE_MAX_ENTRIES'],
+                           ttl_seconds=app.config['RESULT_CACHE_TTL_SECONDS'],
+                           disk_dir=app.config['RESULT_CACHE_DIR'])
+
+job_manager = JobManager(max_workers=app.config['JOB_WORKERS'],
+                         max_jobs=app.config['JOB_MAX_JOBS'],
+                         ttl_seconds=app.config['JOB_TTL_SECONDS'])
+
+# Memory-mapped, so pre-forked workers share the reference vectors
+reference_index = load_reference_index(app.config['REFERENCE_INDEX_DIR'], f0_method=app.config['VOICE_F0_METHOD'],
+                                       k=app.config['REFERENCE_K'], method=app.config['REFERENCE_SEARCH'],
+                                       nprobe=app.config['REFERENCE_NPROBE'])
+
+voice_admission = AdmissionController('voice', app.config['ADMISSION_VOICE_MAX_IN_FLIGHT'],
+                                      app.config['ADMISSION_VOICE_MAX_QUEUE'],
+                                      queue_timeout=app.config['ADMISSION_QUEUE_TIMEOUT_SECONDS'])
+handwriting_admission = AdmissionController('handwriting', app.config['ADMISSION_HANDWRITING_MAX_IN_FLIGHT'],
+                                            app.config['ADMISSION_HANDWRITING_MAX_QUEUE'],
+                                            queue_timeout=app.config['ADMISSION_QUEUE_TIMEOUT_SECONDS'])
+
+voice_streams = VoiceStreamSessions(f0_method=app.config['VOICE_STREAM_F0_METHOD'],
+                                    max_sessions=app.config['VOICE_STREAM_MAX_STREAMS'],
+                                    ttl_seconds=app.config['VOICE_STREAM_TTL_SECONDS'],
+                                    max_seconds=app.config['VOICE_STREAM_MAX_SECONDS'])
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def end_request_metrics(exc):
+    if 'request_start' in g:
+        IN_FLIGHT.dec()
 
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
@@ -23,87 +151,299 @@ def allowed_file(filename, allowed_extensions):
 def index():
     return render_template('index.html')
 
-@app.route('/analyze', methods=['POST'])
-def analyze():
-    voice_file = None
-    handwriting_file = None
+def read_uploads():
+    """Return the (voice, handwriting) upload bytes of the current request, None where absent."""
+    voice_data = None
+    handwriting_data = None
     
     # Handle voice file
     if 'voice' in request.files:
         file = request.files['voice']
         if file and allowed_file(file.filename, {'wav'}):
-            filename = secure_filename(f"{uuid.uuid4()}.wav")
-            voice_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(voice_path)
-            voice_file = voice_path
+            voice_data = file.read()
+            UPLOAD_BYTES.observe(len(voice_data), modality='voice')
 
     # Handle handwriting file
     if 'handwriting' in request.files:
         file = request.files['handwriting']
         if file and allowed_file(file.filename, {'png', 'jpg', 'jpeg'}):
-            filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
-            handwriting_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(handwriting_path)
-            handwriting_file = handwriting_path
-
-    results = {
-        'voice_analysis': analyze_voice(voice_file) if voice_file else None,
-        'handwriting_analysis': analyze_handwriting(handwriting_file) if handwriting_file else None
-    }
-
-    # Perform late fusion if both analyses are available
-    if results['voice_analysis'] and results['handwriting_analysis']:
-        results['combined'] = late_fusion(
-            results['voice_analysis'],
-            results['handwriting_analysis']
-        )
-    
-    # Clean up uploaded files
-    if voice_file and os.path.exists(voice_file):
-        os.remove(voice_file)
-    if handwriting_file and os.path.exists(handwriting_file):
-        os.remove(handwriting_file)
+            handwriting_data = file.read()
+            UPLOAD_BYTES.observe(len(handwriting_data), modality='handwriting')
 
+    return voice_data, handwriting_data
+
+def request_deadline():
+    """Seconds this request may take: REQUEST_DEADLINE_SECONDS, or less if the client asks."""
+    seconds = app.config['REQUEST_DEADLINE_SECONDS']
+    requested = request.headers.get('X-Request-Timeout', type=float)
+    if requested and requested > 0:
+        seconds = min(seconds, requested) if seconds else requested
+    return seconds
+
+@app.errorhandler(Overloaded)
+def handle_overloaded(e):
+    response = jsonify({'error': 'Too many analyses in progress, please retry shortly', 'modality': e.modality})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+@app.errorhandler(DeadlineExceeded)
+def handle_deadline_exceeded(e):
+    return jsonify({'error': 'Analysis did not finish within the request deadline', 'stage': e.stage}), 504
+
+@app.errorhandler(AudioDecodeError)
+def handle_audio_decode_error(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    voice_data, handwriting_data = read_uploads()
+    with deadline(request_deadline()), ExitStack() as slots:
+        # Slots are taken here, before any stage is submitted, so a request waiting for one never
+        # holds an analysis engine thread; an upload whose result is cached needs no slot
+        if voice_data is not None and voice_cache_key(voice_data) not in result_cache:
+            slots.enter_context(voice_admission.admit())
+        if handwriting_data is not None and handwriting_cache_key(handwriting_data) not in result_cache:
+            slots.enter_context(handwriting_admission.admit())
+        if app.config['PROFILING_ENABLED'] and request.args.get('profile') == '1':
+            # Stage breakdown of this request only; cached modalities show no voice/handwriting stages
+            with profiling() as stages:
+                results = analysis_engine.run(voice_data, handwriting_data)
+            results['profile'] = {'stages_ms': stages}
+        else:
+            results = analysis_engine.run(voice_data, handwriting_data)
     return jsonify(results)
 
-def analyze_voice(file_path):
-    features = extract_features(file_path)
-    prediction, risk_factors, risk_details = assess_parkinsons(features)
-    return {
-        'prediction': prediction,
-        'risk_factors': risk_factors,
-        'risk_details': risk_details
-    }
-
-def analyze_handwriting(file_path):
-    result = handwriting_model(file_path)
-    if result and isinstance(result, list) and len(result) > 0:
-        prediction = result[0]
-        has_parkinsons = 'parkinson' in prediction['label'].lower()
-        return {
-            'prediction': "Yes" if has_parkinsons else "No",
-            'confidence': float(prediction['score'])
-        }
-    return {
-        'prediction': "No",
-        'confidence': 0.0
-    }
-
-def late_fusion(voice_result, handwriting_result):
-    voice_score = 1 if voice_result['prediction'] == "Yes" else 0
-    hw_score = 1 if handwriting_result['prediction'] == "Yes" else 0
-    
-    voice_weight = 0.5
-    hw_weight = 0.5
-    
-    combined_score = (voice_score * voice_weight + hw_score * hw_weight)
-    final_prediction = "Yes" if combined_score >= 0.5 else "No"
-    confidence = combined_score if final_prediction == "Yes" else (1 - combined_score)
-    
-    return {
-        'prediction': final_prediction,
-        'confidence': confidence
-    }
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue an analysis and return its job id without waiting for the result."""
+    voice_data, handwriting_data = read_uploads()
+    voice_stream = request.form.get('voice_stream')
+    tasks = {}
+    # Jobs wait for a slot as long as it takes: their clients poll instead of holding a connection
+    if voice_data is not None:
+        tasks['voice_analysis'] = lambda: analyze_voice_upload(voice_data, admission=voice_admission)
+    elif voice_stream:
+        tasks['voice_analysis'] = lambda: admitted(voice_admission, analyze_voice_stream, voice_stream,
+                                                   required=True)
+    if handwriting_data is not None:
+        tasks['handwriting_analysis'] = lambda: analyze_handwriting_upload(handwriting_data,
+                                                                           admission=handwriting_admission)
+    if not tasks:
+        return jsonify({'error': 'Provide a voice (.wav) and/or handwriting (.png/.jpg) file'}), 400
+
+    try:
+        job_id = job_manager.submit(tasks, on_complete=analysis_engine.fuse)
+    except JobStoreFull:
+        return jsonify({'error': 'Too many analyses in progress, please retry shortly'}), 503
+    return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Report a job's status and whatever per-modality results are finished.
+
+    ?wait=<seconds> long-polls until the job finishes or, with ?since=<updated>,
+    until anything changed after that timestamp.
+    """
+    wait = min(request.args.get('wait', 0, type=float), app.config['JOB_MAX_WAIT_SECONDS'])
+    job = job_manager.get(job_id, wait=wait, since=request.args.get('since', type=float))
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job)
+
+@app.route('/stream/voice', methods=['POST'])
+def start_voice_stream():
+    """
+    Open a streaming voice analysis. Send {"sample_rate": <Hz>}, then POST the
+    recording to chunk_url as it is captured and call finish_url at the end.
+    """
+    sample_rate = (request.get_json(silent=True) or {}).get('sample_rate')
+    if not isinstance(sample_rate, (int, float)) or not 8000 <= sample_rate <= 192000:
+        return jsonify({'error': 'sample_rate must be between 8000 and 192000 Hz'}), 400
+    try:
+        stream_id = voice_streams.create(int(sample_rate))
+    except StreamStoreFull:
+        return jsonify({'error': 'Too many voice streams in progress, please retry shortly'}), 503
+    return jsonify({
+        'stream_id': stream_id,
+        'chunk_url': url_for('push_voice_chunk', stream_id=stream_id),
+        'finish_url': url_for('finish_voice_stream', stream_id=stream_id),
+    }), 201
+
+@app.route('/stream/voice/<stream_id>/chunks', methods=['POST'])
+def push_voice_chunk(stream_id):
+    """
+    Add the next chunk of a stream: the body is mono little-endian float32 PCM and
+    ?seq=0, 1, 2, ... numbers the chunks. Returns running pitch/jitter/shimmer statistics.
+    """
+    data = request.get_data()
+    if len(data) % 4:
+        return jsonify({'error': 'Chunk body must be float32 samples'}), 400
+    try:
+        partial = voice_streams.push(stream_id, request.args.get('seq', type=int),
+                                     np.frombuffer(data, dtype='<f4'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    if partial is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    return jsonify(partial)
+
+@app.route('/stream/voice/<stream_id>/finish', methods=['POST'])
+def finish_voice_stream(stream_id):
+    """Finish a stream and return its voice analysis; the stream id can then be passed to /jobs."""
+    with deadline(request_deadline()), voice_admission.admit():
+        result = analyze_voice_stream(stream_id)
+    if result is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    return jsonify({'voice_analysis': result})
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once the model is loaded and warm, 503 until then."""
+    status = warmup.status()
+    if status['state'] == 'failed':
+        # Retry the failed steps in the background once their backoff has passed
+        warmup.start()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: stage latencies, errors, upload sizes and request counters."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats/batching')
+def batching_stats():
+    return jsonify(handwriting_batcher.stats())
+
+@app.route('/stats/jobs')
+def jobs_stats():
+    return jsonify(job_manager.stats())
+
+@app.route('/stats/streams')
+def streams_stats():
+    return jsonify(voice_streams.stats())
+
+@app.route('/stats/cache')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/stats/admission')
+def admission_stats():
+    return jsonify({'voice': voice_admission.stats(), 'handwriting': handwriting_admission.stats()})
+
+def admitted(controller, analyze, *args, **kwargs):
+    """Run a background job's analysis once the controller has a free slot."""
+    with controller.admit(block=True):
+        return analyze(*args, **kwargs)
+
+def voice_cache_key(data, mode=None):
+    # Chunked and whole-recording extraction give slightly different features, so the mode is
+    # part of the key: changing VOICE_CHUNKED_MIN_SECONDS must not serve the other mode's result
+    mode = mode or voice_extraction_mode(data)
+    return content_key(data, f"voice:{FEATURE_EXTRACTOR_VERSION}:{app.config['VOICE_F0_METHOD']}:{mode}"
+                             f":{app.config['VOICE_MAX_SECONDS']:g}")
+
+def handwriting_cache_key(data):
+    variant = app.config['HANDWRITING_BACKEND'] + ('-int8' if app.config['HANDWRITING_QUANTIZE'] else '')
+    variant += '-fast' if app.config['HANDWRITING_FAST_PREPROCESS'] else ''
+    return content_key(data, f"handwriting:{HANDWRITING_MODEL_ID}:{variant}")
+
+def analyze_voice_upload(data, admission=None):
+    """
+    Analyze uploaded WAV bytes in memory, reusing cached features for identical uploads.
+    With an admission controller a cache miss first waits for one of its slots, as background
+    jobs do; /analyze takes its slot on the request thread instead.
+    """
+    mode = voice_extraction_mode(data)
+    key = voice_cache_key(data, mode)
+    features = result_cache.get(key)
+    if features is None:
+        with admission.admit(block=True) if admission else nullcontext():
+            features = extract_voice_features(data, mode=mode)
+        features = {name: float(value) for name, value in features.items()}
+        result_cache.set(key, features)
+    return assess_voice(features, reference=reference_index)
+
+def analyze_handwriting_upload(data, admission=None):
+    """
+    Analyze uploaded image bytes in memory, reusing the cached scores for identical uploads.
+    With an admission controller a cache miss first waits for one of its slots, as in analyze_voice_upload.
+    """
+    key = handwriting_cache_key(data)
+    result = result_cache.get(key)
+    if result is None:
+        with admission.admit(block=True) if admission else nullcontext():
+            result = analyze_handwriting(data)
+        result_cache.set(key, result)
+    return result
+
+def analyze_voice_stream(stream_id, required=False):
+    """Assess a streamed recording, finishing the stream if needed; None if the stream is unknown."""
+    features = voice_streams.finish(stream_id)
+    if features is None:
+        if required:
+            raise ValueError("Unknown or expired voice stream")
+        return None
+    return assess_voice(features, reference=reference_index)
+
+def analyze_voice(source):
+    """Analyze a voice recording given as a path, bytes, file-like object or (y, sr) pair."""
+    return assess_voice(extract_voice_features(source), reference=reference_index)
+
+def voice_extraction_mode(source):
+    """'chunked' for recordings that are long or over VOICE_MAX_SECONDS, 'whole' otherwise."""
+    max_seconds = app.config['VOICE_MAX_SECONDS'] or None
+    duration = None if isinstance(source, tuple) else audio_duration(source)
+    if duration is not None and (duration > app.config['VOICE_CHUNKED_MIN_SECONDS']
+                                 or (max_seconds and duration > max_seconds)):
+        return 'chunked'
+    return 'whole'
+
+def extract_voice_features(source, mode=None):
+    """Voice features of a recording, switching to chunked extraction for long or capped recordings."""
+    if (mode or voice_extraction_mode(source)) == 'chunked':
+        return extract_features_chunked(source, f0_method=app.config['VOICE_F0_METHOD'],
+                                        max_seconds=app.config['VOICE_MAX_SECONDS'] or None)
+    # Strict: an undecodable upload is an error, not all-zero features that would be cached
+    return extract_features(source, f0_method=app.config['VOICE_F0_METHOD'], strict=True)
+
+def analyze_handwriting(source):
+    """Classify a handwriting sample given as a path, bytes, file-like object or PIL image."""
+    # Decoding and preprocessing run in the caller's (analysis engine) thread, in parallel
+    # with other requests, so the batcher's worker only runs the forward pass. The input size and
+    # normalization come from the loaded model's image processor
+    spec = image_spec(handwriting_model())
+    with stage('handwriting.decode'):
+        pixels = preprocess_image(source, fast=app.config['HANDWRITING_FAST_PREPROCESS'], spec=spec)
+    with stage('handwriting.inference'):
+        try:
+            ranked = handwriting_batcher.submit(pixels, timeout=remaining())
+        except FutureTimeoutError:
+            DEADLINE_EXCEEDED.inc(stage='handwriting.inference')
+            raise DeadlineExceeded('handwriting.inference') from None
+        return interpret_prediction(ranked)
+
+# Voice and handwriting run concurrently; both modalities weigh equally in the web app.
+# /analyze admits before submitting, so stage threads never wait for a slot: one per admitted
+# analysis, plus one per modality for cached results, which take no slot
+analysis_engine = AnalysisEngine(analyze_voice_upload, analyze_handwriting_upload,
+                                 voice_weight=0.5, hw_weight=0.5,
+                                 max_workers=(app.config['ADMISSION_VOICE_MAX_IN_FLIGHT']
+                                              + app.config['ADMISSION_HANDWRITING_MAX_IN_FLIGHT'] + 2))
+
+def preload_for_fork():
+    """
+    Load the handwriting model in a pre-forking server's master so the workers
+    share its weights; see gunicorn.conf.py. The forward pass warm-up runs in
+    each worker, since native thread pools started before fork are lost.
+    """
+    if app.config['HANDWRITING_BACKEND'] == 'onnx':
+        # ONNX Runtime starts its threads with the session; each worker loads its own
+        return
+    warmup.run(['handwriting_model'])
+
+if app.config['WARMUP_ON_STARTUP']:
+    warmup.start()
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
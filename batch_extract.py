@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from voice_extraction import (F0_METHODS, FEATURE_DTYPE, FEATURE_EXTRACTOR_VERSION, FEATURE_NAMES, RISK_RULES,
+                              assess_parkinsons_batch, extract_features, features_to_vector)
+
+# Folder name -> label; recordings anywhere else get UNKNOWN_LABEL
+LABELS = {'HC_AH': 0, 'PD_AH': 1}
+UNKNOWN_LABEL = -1
+AUDIO_EXTENSIONS = ('.wav',)
+
+# One .npz holds the index columns and the feature matrix, so a single rename replaces both
+STORE_FILE = 'store.npz'
+# Layout of stores written before STORE_FILE; still read, and removed by the next save
+FEATURES_FILE = 'features.npy'
+INDEX_FILE = 'index.csv'
+INDEX_COLUMNS = ['path', 'size', 'mtime_ns', 'sha256', 'label', 'f0_method', 'version']
+TEXT_COLUMNS = ['path', 'sha256', 'f0_method', 'version']
+
+
+def find_audio_files(root):
+    """Walk root and return every audio file path, sorted."""
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                found.append(os.path.join(dirpath, name))
+    return sorted(found)
+
+
+def label_for(file_path):
+    return LABELS.get(os.path.basename(os.path.dirname(file_path)), UNKNOWN_LABEL)
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _empty_store():
+    return pd.DataFrame(columns=INDEX_COLUMNS), np.empty((0, len(FEATURE_NAMES)), dtype=FEATURE_DTYPE)
+
+
+def load_store(store_dir):
+    """Return (index DataFrame, feature matrix) for an existing store, or empty ones."""
+    store_path = os.path.join(store_dir, STORE_FILE)
+    if os.path.exists(store_path):
+        with np.load(store_path, allow_pickle=False) as stored:
+            index = pd.DataFrame({column: stored[column] for column in INDEX_COLUMNS}, columns=INDEX_COLUMNS)
+            features = stored['features'].astype(FEATURE_DTYPE, copy=False)
+        return index, features
+
+    index_path = os.path.join(store_dir, INDEX_FILE)
+    features_path = os.path.join(store_dir, FEATURES_FILE)
+    if not (os.path.exists(index_path) and os.path.exists(features_path)):
+        return _empty_store()
+    index = pd.read_csv(index_path, dtype={'sha256': str, 'f0_method': str, 'version': str})
+    # Stores written before the float32 schema hold float64 rows
+    features = np.load(features_path).astype(FEATURE_DTYPE, copy=False)
+    if len(index) != len(features):
+        print(f"Warning: {store_dir} index and features disagree, rebuilding from scratch")
+        return _empty_store()
+    return index, features
+
+
+def save_store(store_dir, index, features):
+    """Write the index and features as one file, replaced in a single rename."""
+    os.makedirs(store_dir, exist_ok=True)
+    store_path = os.path.join(store_dir, STORE_FILE)
+    columns = {column: (index[column].fillna('').astype(str).to_numpy(dtype=str) if column in TEXT_COLUMNS
+                        else index[column].to_numpy(dtype=np.int64))
+               for column in INDEX_COLUMNS}
+    with open(store_path + '.tmp', 'wb') as f:
+        np.savez(f, features=np.asarray(features, dtype=FEATURE_DTYPE), **columns)
+    os.replace(store_path + '.tmp', store_path)
+    for name in (FEATURES_FILE, INDEX_FILE):
+        if os.path.exists(os.path.join(store_dir, name)):
+            os.remove(os.path.join(store_dir, name))
+
+
+def _extract_row(file_path, f0_method):
+    """Worker entry point: the 22 features of one file as a FEATURE_NAMES-ordered vector."""
+    return features_to_vector(extract_features(file_path, f0_method=f0_method))
+
+
+def plan_work(files, index, f0_method, use_hash=False):
+    """
+    Split files into rows that can be reused from the store and files to extract.
+
+    A stored row is reused when path, size and mtime are unchanged; with
+    use_hash, a matching content hash also counts (e.g. after a copy or touch).
+    Rows extracted by another F0 method or feature version are never reused.
+    """
+    stored = {row.path: (i, row) for i, row in enumerate(index.itertuples(index=False))}
+    reuse = []   # (file_path, stored row position, index record)
+    pending = []  # (file_path, index record without features)
+
+    for file_path in files:
+        stat = os.stat(file_path)
+        record = {
+            'path': file_path,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': '',
+            'label': label_for(file_path),
+            'f0_method': f0_method,
+            'version': FEATURE_EXTRACTOR_VERSION,
+        }
+        hit = stored.get(file_path)
+        if hit is not None:
+            position, row = hit
+            same_producer = row.f0_method == f0_method and str(row.version) == FEATURE_EXTRACTOR_VERSION
+            unchanged = row.size == stat.st_size and row.mtime_ns == stat.st_mtime_ns
+            if same_producer and not unchanged and use_hash and isinstance(row.sha256, str) and row.sha256:
+                record['sha256'] = file_sha256(file_path)
+                unchanged = record['sha256'] == row.sha256
+            if same_producer and unchanged:
+                record['sha256'] = record['sha256'] or (row.sha256 if isinstance(row.sha256, str) else '')
+                if use_hash and not record['sha256']:
+                    record['sha256'] = file_sha256(file_path)
+                reuse.append((file_path, position, record))
+                continue
+        if use_hash and not record['sha256']:
+            record['sha256'] = file_sha256(file_path)
+        pending.append((file_path, record))
+    return reuse, pending
+
+
+def build_store(data_dir, store_dir, f0_method='pyin', workers=None, use_hash=False):
+    """Incrementally extract features for every recording under data_dir into store_dir."""
+    files = find_audio_files(data_dir)
+    index, features = load_store(store_dir)
+    reuse, pending = plan_work(files, index, f0_method, use_hash=use_hash)
+    print(f"{len(files)} recordings: {len(reuse)} unchanged, {len(pending)} to extract")
+
+    records = [record for _, _, record in reuse]
+    rows = [features[position] for _, position, _ in reuse]
+
+    start = time.perf_counter()
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_extract_row, file_path, f0_method): record
+                       for file_path, record in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                record = futures[future]
+                try:
+                    rows.append(future.result())
+                    records.append(record)
+                except Exception as e:
+                    print(f"Error extracting {record['path']}: {str(e)}")
+                if done % 10 == 0 or done == len(futures):
+                    print(f"- extracted {done}/{len(futures)}")
+
+    order = np.argsort([record['path'] for record in records], kind='stable')
+    index = pd.DataFrame([records[i] for i in order], columns=INDEX_COLUMNS)
+    matrix = np.array([rows[i] for i in order], dtype=FEATURE_DTYPE).reshape(-1, len(FEATURE_NAMES))
+    save_store(store_dir, index, matrix)
+
+    print(f"Saved {len(index)} rows to {store_dir} in {time.perf_counter() - start:.1f}s")
+    return index, matrix
+
+
+def load_features(store_dir):
+    """Load a store as a DataFrame with path, label and the 22 named feature columns."""
+    index, features = load_store(store_dir)
+    df = pd.DataFrame(features, columns=FEATURE_NAMES)
+    df.insert(0, 'label', index['label'].to_numpy())
+    df.insert(0, 'path', index['path'].to_numpy())
+    return df
+
+
+def assess_store(store_dir):
+    """
+    Re-score every stored row with the current risk rules in one vectorized pass.
+    Returns a DataFrame with path, label, prediction, risk_factors and one flag column per rule.
+    """
+    index, features = load_store(store_dir)
+    has_parkinsons, risk_factors, flags = assess_parkinsons_batch(features)
+    df = pd.DataFrame(flags, columns=[rule[3] for rule in RISK_RULES])
+    df.insert(0, 'risk_factors', risk_factors)
+    df.insert(0, 'prediction', np.where(has_parkinsons, "Yes", "No"))
+    df.insert(0, 'label', index['label'].to_numpy())
+    df.insert(0, 'path', index['path'].to_numpy())
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract voice features for a whole directory tree.")
+    parser.add_argument('data_dir', nargs='?', default=os.path.join('data', 'voice_data'))
+    parser.add_argument('--store', default='voice_features', help="Output directory for the feature store")
+    parser.add_argument('--f0-method', default='pyin', choices=F0_METHODS)
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--hash', action='store_true',
+                        help="Also match files by content hash when size/mtime changed")
+    parser.add_argument('--assess', action='store_true',
+                        help="Only re-score the existing store with the current risk rules")
+    args = parser.parse_args()
+    if args.assess:
+        df = assess_store(args.store)
+        print(f"{len(df)} stored recordings re-scored")
+        print(pd.crosstab(df['label'], df['prediction']))
+        return
+    build_store(args.data_dir, args.store, f0_method=args.f0_method, workers=args.workers,
+                use_hash=args.hash)
+
+
+if __name__ == "__main__":
+    main()
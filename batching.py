@@ -0,0 +1,133 @@
+import threading
+import queue
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class MicroBatcher:
+    """
+    Collect individual inference requests into small batches.
+
+    Callers submit one item at a time and block until their own result is
+    ready. A background worker flushes the pending items as soon as either
+    max_batch_size items are queued or the oldest item has waited max_wait_ms.
+
+    Parameters:
+        predict_batch (callable): Takes a list of items, returns a list of results
+            in the same order.
+        max_batch_size (int): Largest batch handed to predict_batch.
+        max_wait_ms (float): Longest time the first item of a batch waits for company.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=8, max_wait_ms=5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_batch = predict_batch
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'errors': 0,
+            'last_batch_size': 0,
+            'max_queue_wait_ms': 0.0,
+            'total_queue_wait_ms': 0.0,
+            'total_batch_time_ms': 0.0,
+        }
+
+    def submit(self, item, timeout=None):
+        """
+        Queue a single item and block until its result is available. If timeout
+        expires first the item is withdrawn, unless its batch already started,
+        and concurrent.futures.TimeoutError is raised.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self):
+        """Return a snapshot of batch fill and queue wait statistics."""
+        with self._lock:
+            s = dict(self._stats)
+        batches = s['batches']
+        items = s['items']
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queued': self._queue.qsize(),
+            'batches': batches,
+            'items': items,
+            'errors': s['errors'],
+            'last_batch_size': s['last_batch_size'],
+            'avg_batch_size': items / batches if batches else 0.0,
+            'avg_batch_fill': items / (batches * self.max_batch_size) if batches else 0.0,
+            'avg_queue_wait_ms': s['total_queue_wait_ms'] / items if items else 0.0,
+            'max_queue_wait_ms': s['max_queue_wait_ms'],
+            'avg_batch_time_ms': s['total_batch_time_ms'] / batches if batches else 0.0,
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or the deadline passes."""
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Skip items whose caller gave up waiting; the rest can no longer be cancelled
+            batch = [entry for entry in self._collect() if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            waits = [(started - enqueued) * 1000.0 for _, _, enqueued in batch]
+            items = [item for item, _, _ in batch]
+
+            try:
+                results = self.predict_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"predict_batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                failed = True
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                failed = False
+
+            elapsed = (time.perf_counter() - started) * 1000.0
+            with self._lock:
+                self._stats['batches'] += 1
+                self._stats['items'] += len(batch)
+                self._stats['errors'] += int(failed)
+                self._stats['last_batch_size'] = len(batch)
+                self._stats['total_queue_wait_ms'] += sum(waits)
+                self._stats['max_queue_wait_ms'] = max(self._stats['max_queue_wait_ms'], max(waits))
+                self._stats['total_batch_time_ms'] += elapsed
@@ -0,0 +1,352 @@
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# The benchmark measures the analysis itself, so the app must not answer from its result cache,
+# and it starts the model warm-up itself to keep loading time out of the request numbers
+os.environ.setdefault('RESULT_CACHE_MAX_ENTRIES', '0')
+os.environ.pop('RESULT_CACHE_DIR', None)
+os.environ.setdefault('WARMUP_ON_STARTUP', '0')
+# Admission control would turn the higher concurrency levels into 503s; let every client in
+# so the throughput numbers measure the analysis rather than the rejection path
+for _name in ('ADMISSION_VOICE_MAX_IN_FLIGHT', 'ADMISSION_VOICE_MAX_QUEUE',
+              'ADMISSION_HANDWRITING_MAX_IN_FLIGHT', 'ADMISSION_HANDWRITING_MAX_QUEUE'):
+    os.environ.setdefault(_name, '64')
+
+BENCHMARK_FORMAT_VERSION = "1"
+DEFAULT_CONCURRENCY = [1, 2, 4, 8]
+VOICE_STAGES = ['load', 'f0', 'jitter_shimmer', 'stft', 'hpss', 'mfcc_spectral', 'assess']
+HANDWRITING_STAGES = ['image_decode', 'image_preprocess', 'swin_forward']
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def summarize(samples):
+    """Latency distribution in ms for one stage or request type."""
+    samples = np.asarray(samples, dtype=float)
+    return {
+        'n': int(samples.size),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+    }
+
+
+def timed(samples, name, func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+    return value
+
+
+def list_files(data_dir, patterns, limit):
+    files = sorted(path for pattern in patterns
+                   for path in glob.glob(os.path.join(data_dir, '**', pattern), recursive=True))
+    # Take files from every class rather than the first `limit` of one directory
+    if limit and len(files) > limit:
+        files = [files[int(i)] for i in np.linspace(0, len(files) - 1, limit)]
+    return files
+
+
+def bench_voice_stages(files, f0_method, repeat):
+    """Time each stage of extract_features separately on every voice file."""
+    import voice_extraction as ve
+    from analysis_engine import assess_voice
+
+    samples = {}
+    for _ in range(repeat):
+        for path in files:
+            y, sr = timed(samples, 'load', ve.load_audio, path)
+            features = timed(samples, 'f0', lambda: ve.f0_features(ve.estimate_f0(y, sr, method=f0_method)))
+            start = time.perf_counter()
+            features.update(ve.extract_jitter_features(y))
+            features.update(ve.extract_shimmer_features(y))
+            samples.setdefault('jitter_shimmer', []).append((time.perf_counter() - start) * 1000)
+            D, S = timed(samples, 'stft', ve.compute_spectrum, y)
+            features.update(timed(samples, 'hpss', ve.extract_harmonicity_features, y, D, S))
+            features.update(timed(samples, 'mfcc_spectral', ve.extract_cepstral_features, S, sr))
+            timed(samples, 'assess', assess_voice, features)
+    return {stage: summarize(samples[stage]) for stage in VOICE_STAGES}
+
+
+def bench_handwriting_stages(files, model, repeat):
+    """
+    Time the full-size decode the pipeline used to do (image_decode), the
+    decode + resize + normalize path the app uses (image_preprocess) and the
+    Swin forward pass on its output (batch of one) on every image.
+    """
+    from handwriting import load_image, preprocess_image, image_spec, classify_pixel_batch
+
+    spec = image_spec(model)
+    samples = {}
+    for _ in range(repeat):
+        for path in files:
+            data = read_bytes(path)
+            timed(samples, 'image_decode', load_image, data)
+            pixels = timed(samples, 'image_preprocess', preprocess_image, data, spec=spec)
+            timed(samples, 'swin_forward', classify_pixel_batch, model, pixels[np.newaxis])
+    return {stage: summarize(samples[stage]) for stage in HANDWRITING_STAGES}
+
+
+def bench_fusion(repeat):
+    from analysis_engine import late_fusion
+
+    samples = []
+    for i in range(max(repeat, 1) * 1000):
+        voice = {'prediction': "Yes" if i % 2 else "No"}
+        handwriting = {'prediction': "Yes" if i % 3 else "No"}
+        start = time.perf_counter()
+        late_fusion(voice, handwriting)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def make_request(client, voice, handwriting, allow_rejection=False):
+    """
+    POST one /analyze request through the Flask test client; returns latency in ms.
+    With allow_rejection, a 503 from admission control returns None instead of raising.
+    """
+    data = {}
+    if voice is not None:
+        data['voice'] = (io.BytesIO(read_bytes(voice)), os.path.basename(voice))
+    if handwriting is not None:
+        data['handwriting'] = (io.BytesIO(read_bytes(handwriting)), os.path.basename(handwriting))
+    start = time.perf_counter()
+    response = client.post('/analyze', data=data, content_type='multipart/form-data')
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code == 503 and allow_rejection:
+        return None
+    if response.status_code != 200:
+        raise RuntimeError(f"/analyze returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return elapsed
+
+
+def bench_requests(flask_app, voice_files, image_files, repeat):
+    """Whole-request latency through /analyze for voice-only, handwriting-only and combined uploads."""
+    client = flask_app.test_client()
+    kinds = {'voice': [(v, None) for v in voice_files]}
+    if image_files:
+        kinds['handwriting'] = [(None, h) for h in image_files]
+        kinds['combined'] = [(v, image_files[i % len(image_files)]) for i, v in enumerate(voice_files)]
+
+    results = {}
+    for kind, uploads in kinds.items():
+        samples = [make_request(client, v, h) for _ in range(repeat) for v, h in uploads]
+        results[kind] = summarize(samples)
+    return results
+
+
+def bench_throughput(flask_app, voice_files, image_files, levels, requests_per_level):
+    """
+    Completed /analyze requests per second with `level` clients sending at once.
+    Requests turned away by admission control are counted as `rejected`, not timed.
+    """
+    uploads = [(v, image_files[i % len(image_files)] if image_files else None)
+               for i, v in enumerate(voice_files)]
+    uploads = [uploads[i % len(uploads)] for i in range(requests_per_level)]
+
+    def send(upload):
+        # The test client is not shared between threads
+        return make_request(flask_app.test_client(), *upload, allow_rejection=True)
+
+    results = {}
+    for level in levels:
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            start = time.perf_counter()
+            responses = list(executor.map(send, uploads))
+            elapsed = time.perf_counter() - start
+        latencies = [latency for latency in responses if latency is not None]
+        results[str(level)] = {
+            'requests_per_s': len(latencies) / elapsed,
+            'p50_ms': float(np.percentile(latencies, 50)) if latencies else float('nan'),
+            'p95_ms': float(np.percentile(latencies, 95)) if latencies else float('nan'),
+            'rejected': len(responses) - len(latencies),
+        }
+    return results
+
+
+def flatten_metrics(results):
+    """
+    Comparable metrics as name -> (value, direction), where direction is +1 if
+    higher is worse (latency, memory) and -1 if lower is worse (throughput).
+    """
+    metrics = {}
+    for section in ('voice_stages', 'handwriting_stages', 'requests'):
+        for name, stats in (results.get(section) or {}).items():
+            metrics[f"{section}.{name}.p50_ms"] = (stats['p50_ms'], 1)
+            metrics[f"{section}.{name}.p95_ms"] = (stats['p95_ms'], 1)
+    if results.get('fusion'):
+        metrics['fusion.p50_ms'] = (results['fusion']['p50_ms'], 1)
+    for level, stats in (results.get('throughput') or {}).items():
+        metrics[f"throughput.{level}.requests_per_s"] = (stats['requests_per_s'], -1)
+    metrics['peak_rss_mb'] = (results['peak_rss_mb'], 1)
+    return metrics
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    Return (name, baseline, current, change) for every metric that got worse by
+    more than `tolerance` (relative). Latencies must also get worse by at least
+    min_delta_ms so sub-millisecond jitter does not fail the run.
+    """
+    current = flatten_metrics(results)
+    previous = flatten_metrics(baseline)
+    regressions = []
+    for name, (value, direction) in current.items():
+        if name not in previous:
+            continue
+        base = previous[name][0]
+        if base <= 0:
+            continue
+        change = (value - base) / base
+        if direction * change <= tolerance:
+            continue
+        if name.endswith('_ms') and value - base < min_delta_ms:
+            continue
+        regressions.append((name, base, value, change))
+    return regressions
+
+
+def print_section(title, stats):
+    print(f"\n{title}")
+    print("-" * 60)
+    print(f"{'':<22}{'n':>6}{'mean ms':>11}{'p50 ms':>11}{'p95 ms':>11}")
+    for name, s in stats.items():
+        print(f"{name:<22}{s['n']:>6}{s['mean_ms']:>11.2f}{s['p50_ms']:>11.2f}{s['p95_ms']:>11.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the voice and handwriting pipelines end to end and check for regressions.")
+    parser.add_argument('--voice-dir', default=os.path.join('data', 'voice_data'))
+    parser.add_argument('--image-dir', default=os.path.join('data', 'image_data'))
+    parser.add_argument('--limit', type=int, default=20, help="Files per modality (0 for all)")
+    parser.add_argument('--repeat', type=int, default=1, help="Passes over the files for latency numbers")
+    parser.add_argument('--f0-method', default=None, help="Pitch tracker; defaults to the app's VOICE_F0_METHOD")
+    parser.add_argument('--concurrency', default=','.join(map(str, DEFAULT_CONCURRENCY)),
+                        help="Comma-separated client counts for the throughput test")
+    parser.add_argument('--requests-per-level', type=int, default=16)
+    parser.add_argument('--skip-handwriting', action='store_true', help="Benchmark the voice pipeline only")
+    parser.add_argument('--output-json', default='benchmark_results.json')
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help="Ignore latency regressions smaller than this many ms")
+    args = parser.parse_args()
+
+    import app as web
+
+    f0_method = args.f0_method or web.app.config['VOICE_F0_METHOD']
+    web.app.config['VOICE_F0_METHOD'] = f0_method
+    voice_files = list_files(args.voice_dir, ['*.wav'], args.limit)
+    if not voice_files:
+        raise FileNotFoundError(f"No WAV files found under {args.voice_dir}")
+    image_files = [] if args.skip_handwriting else list_files(args.image_dir, ['*.png', '*.jpg', '*.jpeg'],
+                                                              args.limit)
+
+    # Load the models and pay every JIT/first-call cost before timing anything
+    start = time.perf_counter()
+    web.warmup.start()
+    web.warmup.wait()
+    warmup_status = web.warmup.status()
+    model = None
+    if image_files:
+        try:
+            model = web.warmup.result('handwriting_model')
+        except RuntimeError as e:
+            print(f"Skipping handwriting benchmarks: {str(e)}")
+            image_files = []
+
+    results = {
+        'format_version': BENCHMARK_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'f0_method': f0_method,
+            'handwriting_backend': web.app.config['HANDWRITING_BACKEND'],
+            'handwriting_quantize': web.app.config['HANDWRITING_QUANTIZE'],
+            'voice_files': len(voice_files),
+            'image_files': len(image_files),
+            'repeat': args.repeat,
+        },
+        'warmup_s': time.perf_counter() - start,
+        'warmup_steps_ms': warmup_status['completed_steps'],
+    }
+
+    results['voice_stages'] = bench_voice_stages(voice_files, f0_method, args.repeat)
+    print_section(f"Voice stages ({f0_method})", results['voice_stages'])
+    if model is not None:
+        results['handwriting_stages'] = bench_handwriting_stages(image_files, model, args.repeat)
+        print_section("Handwriting stages", results['handwriting_stages'])
+    results['fusion'] = bench_fusion(args.repeat)
+    print_section("Fusion", {'late_fusion': results['fusion']})
+
+    results['requests'] = bench_requests(web.app, voice_files, image_files, args.repeat)
+    print_section("/analyze requests", results['requests'])
+
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+    results['throughput'] = bench_throughput(web.app, voice_files, image_files, levels,
+                                             args.requests_per_level)
+    print("\nThroughput")
+    print("-" * 60)
+    for level, stats in results['throughput'].items():
+        print(f"{level + ' clients':<22}{stats['requests_per_s']:>10.2f} req/s"
+              f"{stats['p50_ms']:>11.1f} p50 ms{stats['p95_ms']:>11.1f} p95 ms"
+              f"{stats.get('rejected', 0):>6} rejected")
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    print(f"\nPeak RSS: {results['peak_rss_mb']:.0f} MB")
+
+    with open(args.output_json, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output_json}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != results['config']:
+        print(f"Warning: baseline was recorded with a different config: {baseline.get('config')}")
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\nREGRESSIONS against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for name, base, value, change in regressions:
+            print(f"  {name:<45}{base:>12.2f} -> {value:>10.2f}  ({change:+.0%})")
+        raise SystemExit(f"{len(regressions)} metric(s) regressed against {args.baseline}")
+    print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
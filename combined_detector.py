@@ -1,27 +1,65 @@
 import os
-from transformers import pipeline
-from voice_extraction import extract_features, assess_parkinsons, record_audio
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import voice_extraction
+from voice_extraction import record_audio, extract_features
+from voice_stream import StreamingVoiceAnalyzer
+import handwriting
+from handwriting import (load_handwriting_model, preprocess_image, image_spec, classify_pixel_batch,
+                         interpret_prediction)
+from analysis_engine import AnalysisEngine, assess_voice
+from warmup import BackgroundWarmup
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+RECORD_SECONDS = 5
+RECORD_SAMPLE_RATE = 22050
+# How often the Tk event loop runs the callbacks posted by worker threads
+UI_POLL_MS = 50
+MODEL_STATUS_POLL_MS = 250
 
 class ParkinsonDiseaseDetector:
+    """
+    Desktop front end.
+
+    The window appears immediately while the handwriting model loads on a
+    background thread. Recording and analysis run on worker threads, which
+    never touch Tk themselves: they post callbacks with post(), and the Tk
+    event loop runs them every UI_POLL_MS.
+    """
+
     def __init__(self):
-        self.handwriting_model = pipeline("image-classification", 
-                                        "gianlab/swin-tiny-patch4-window7-224-finetuned-parkinson-classification")
+        self._ui_queue = queue.Queue()
+        self._workers = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detector")
+        self.warmup = BackgroundWarmup([
+            ('handwriting_model', load_handwriting_model),
+            ('handwriting_forward', lambda: handwriting.warm_up(self.warmup.result('handwriting_model'))),
+            ('voice_pipeline', voice_extraction.warm_up),
+        ])
+        # Voice is weighted above handwriting on the desktop; a missing input counts as "No"
+        self.engine = AnalysisEngine(self.analyze_voice, self.classify_handwriting,
+                                     voice_weight=0.6, hw_weight=0.4, fuse_missing=True)
         self.setup_gui()
+        self.warmup.start()
+        self.window.after(UI_POLL_MS, self._run_posted)
+        self.update_model_status()
 
     def setup_gui(self):
         self.window = tk.Tk()
         self.window.title("Parkinson's Disease Multi-Modal Detector")
-        self.window.geometry("600x400")
+        self.window.geometry("600x480")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
 
         # Voice Input Frame
         voice_frame = tk.LabelFrame(self.window, text="Voice Analysis", padx=10, pady=10)
         voice_frame.pack(padx=10, pady=5, fill="x")
 
-        tk.Button(voice_frame, text="Record Voice (5s)", command=self.record_voice).pack(side=tk.LEFT, padx=5)
-        tk.Button(voice_frame, text="Upload Voice File", command=self.upload_voice).pack(side=tk.LEFT, padx=5)
+        self.record_button = tk.Button(voice_frame, text=f"Record Voice ({RECORD_SECONDS}s)",
+                                       command=self.record_voice)
+        self.record_button.pack(side=tk.LEFT, padx=5)
+        self.voice_button = tk.Button(voice_frame, text="Upload Voice File", command=self.upload_voice)
+        self.voice_button.pack(side=tk.LEFT, padx=5)
         self.voice_label = tk.Label(voice_frame, text="No voice file selected")
         self.voice_label.pack(side=tk.LEFT, padx=5)
 
@@ -29,34 +67,119 @@ class ParkinsonDiseaseDetector:
         handwriting_frame = tk.LabelFrame(self.window, text="Handwriting Analysis", padx=10, pady=10)
         handwriting_frame.pack(padx=10, pady=5, fill="x")
 
-        tk.Button(handwriting_frame, text="Upload Handwriting Image", 
-                 command=self.upload_handwriting).pack(side=tk.LEFT, padx=5)
+        self.handwriting_button = tk.Button(handwriting_frame, text="Upload Handwriting Image",
+                                            command=self.upload_handwriting)
+        self.handwriting_button.pack(side=tk.LEFT, padx=5)
         self.handwriting_label = tk.Label(handwriting_frame, text="No image file selected")
         self.handwriting_label.pack(side=tk.LEFT, padx=5)
 
+        # Progress Frame: model loading plus one line per analysis stage
+        progress_frame = tk.LabelFrame(self.window, text="Progress", padx=10, pady=5)
+        progress_frame.pack(padx=10, pady=5, fill="x")
+
+        self.stage_labels = {}
+        for stage, text in (('model', "Handwriting model: loading..."), ('voice', "Voice: -"),
+                            ('handwriting', "Handwriting: -")):
+            self.stage_labels[stage] = tk.Label(progress_frame, text=text, anchor="w")
+            self.stage_labels[stage].pack(fill="x")
+        self.progress = ttk.Progressbar(progress_frame, mode='determinate')
+        self.progress.pack(fill="x", pady=2)
+
         # Results Frame
         results_frame = tk.LabelFrame(self.window, text="Results", padx=10, pady=10)
         results_frame.pack(padx=10, pady=5, fill="x")
 
-        tk.Button(results_frame, text="Analyze", command=self.analyze).pack(pady=5)
+        self.analyze_button = tk.Button(results_frame, text="Analyze", command=self.analyze)
+        self.analyze_button.pack(pady=5)
         self.result_text = tk.Text(results_frame, height=10, width=60)
         self.result_text.pack(pady=5)
 
         # Initialize file paths
         self.voice_file = None
         self.handwriting_file = None
+        # Analyzer fed while recording, reused when the recording is analyzed
+        self.recording = None
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread; safe to call from any thread."""
+        self._ui_queue.put((callback, args))
+
+    def _run_posted(self):
+        while True:
+            try:
+                callback, args = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        self.window.after(UI_POLL_MS, self._run_posted)
+
+    def run_in_background(self, task, on_done, description):
+        """Run task() on the worker thread, then on_done(result) on the Tk thread."""
+        def work():
+            try:
+                result = task()
+            except Exception as e:
+                self.post(self.task_failed, description, e)
+            else:
+                self.post(on_done, result)
+        self._workers.submit(work)
+
+    def task_failed(self, description, error):
+        self.set_busy(False)
+        messagebox.showerror("Error", f"{description} failed: {str(error)}")
+
+    def set_busy(self, busy):
+        state = tk.DISABLED if busy else tk.NORMAL
+        for button in (self.record_button, self.voice_button, self.handwriting_button, self.analyze_button):
+            button.config(state=state)
+        if not busy:
+            self.progress.stop()
+            self.progress.config(mode='determinate', value=0)
+
+    def set_stage(self, stage, text):
+        self.stage_labels[stage].config(text=text)
+
+    def update_model_status(self):
+        status = self.warmup.status()
+        if 'handwriting_model' in status['errors']:
+            self.set_stage('model', f"Handwriting model: failed ({status['errors']['handwriting_model']})")
+        elif 'handwriting_model' in status['completed_steps']:
+            self.set_stage('model', "Handwriting model: ready")
+        if status['state'] not in ('ready', 'failed'):
+            self.window.after(MODEL_STATUS_POLL_MS, self.update_model_status)
 
     def record_voice(self):
         output_file = "recorded_voice.wav"
-        record_audio(duration=5, output_file=output_file)
-        self.voice_file = output_file
-        self.voice_label.config(text=f"Recorded: {os.path.basename(output_file)}")
+        # Jitter and shimmer are computed while recording, pitch when the recording is analyzed
+        analyzer = StreamingVoiceAnalyzer(RECORD_SAMPLE_RATE, f0_method='pyin')
+        self.set_busy(True)
+        self.progress.config(mode='determinate', maximum=RECORD_SECONDS, value=0)
+        self.set_stage('voice', "Voice: recording...")
+
+        def on_chunk(chunk):
+            analyzer.push(chunk)
+            self.post(self.progress.config, {'value': analyzer.samples / analyzer.sr})
+
+        def record():
+            record_audio(duration=RECORD_SECONDS, sample_rate=RECORD_SAMPLE_RATE,
+                         output_file=output_file, on_chunk=on_chunk)
+            return output_file
+
+        def recorded(path):
+            self.voice_file = path
+            self.recording = analyzer
+            self.voice_label.config(text=f"Recorded: {os.path.basename(path)}")
+            self.set_stage('voice', "Voice: recorded")
+            self.set_busy(False)
+
+        self.run_in_background(record, recorded, "Recording")
 
     def upload_voice(self):
         file_path = filedialog.askopenfilename(
             filetypes=[("WAV files", "*.wav"), ("All files", "*.*")])
         if file_path:
             self.voice_file = file_path
+            self.recording = None
             self.voice_label.config(text=f"Selected: {os.path.basename(file_path)}")
 
     def upload_handwriting(self):
@@ -66,78 +189,83 @@ class ParkinsonDiseaseDetector:
             self.handwriting_file = file_path
             self.handwriting_label.config(text=f"Selected: {os.path.basename(file_path)}")
 
-    def analyze_voice(self):
-        if not self.voice_file or not os.path.exists(self.voice_file):
-            return "No", 0, []
-        
-        features = extract_features(self.voice_file)
-        return assess_parkinsons(features)
-
-    def analyze_handwriting(self):
-        if not self.handwriting_file or not os.path.exists(self.handwriting_file):
-            return "No", 0
-        
-        result = self.handwriting_model(self.handwriting_file)
-        if result and isinstance(result, list) and len(result) > 0:
-            prediction = result[0]
-            has_parkinsons = 'parkinson' in prediction['label'].lower()
-            confidence = prediction['score']
-            return "Yes" if has_parkinsons else "No", confidence
-        return "No", 0
-
-    def late_fusion(self, voice_result, handwriting_result):
-        """Combine results using late fusion technique"""
-        voice_pred, voice_risk, voice_details = voice_result
-        hw_pred, hw_confidence = handwriting_result
-
-        # Convert predictions to numerical values
-        voice_score = 1 if voice_pred == "Yes" else 0
-        hw_score = 1 if hw_pred == "Yes" else 0
-
-        # Weight the predictions (can be adjusted based on reliability of each modality)
-        voice_weight = 0.6
-        hw_weight = 0.4
-
-        combined_score = (voice_score * voice_weight + hw_score * hw_weight)
-        final_prediction = "Yes" if combined_score >= 0.5 else "No"
-        confidence = combined_score if final_prediction == "Yes" else (1 - combined_score)
-
-        return final_prediction, confidence, voice_risk, voice_details, hw_confidence
+    def analyze_voice(self, source):
+        """Voice stage, run by the analysis engine on its own thread."""
+        self.post(self.set_stage, 'voice', "Voice: extracting features...")
+        if isinstance(source, StreamingVoiceAnalyzer):
+            features = source.finish()
+        else:
+            features = extract_features(source)
+        result = assess_voice(features)
+        self.post(self.set_stage, 'voice', f"Voice: done ({result['prediction']})")
+        return result
+
+    def classify_handwriting(self, source):
+        """Handwriting stage, run by the analysis engine on its own thread."""
+        if 'handwriting_model' not in self.warmup.status()['completed_steps']:
+            self.post(self.set_stage, 'handwriting', "Handwriting: waiting for the model to load...")
+        model = self.warmup.result('handwriting_model')
+        self.post(self.set_stage, 'handwriting', "Handwriting: preprocessing...")
+        pixels = preprocess_image(source, spec=image_spec(model))[np.newaxis]
+        self.post(self.set_stage, 'handwriting', "Handwriting: classifying...")
+        result = interpret_prediction(classify_pixel_batch(model, pixels)[0])
+        self.post(self.set_stage, 'handwriting', f"Handwriting: done ({result['prediction']})")
+        return result
 
     def analyze(self):
         self.result_text.delete(1.0, tk.END)
-        
+
         if not self.voice_file and not self.handwriting_file:
             messagebox.showerror("Error", "Please provide at least one input (voice or handwriting)")
             return
 
-        # Analyze voice
-        voice_result = self.analyze_voice()
-        
-        # Analyze handwriting
-        handwriting_result = self.analyze_handwriting()
-        
-        # Combine results using late fusion
-        final_pred, confidence, voice_risk, voice_details, hw_conf = self.late_fusion(
-            voice_result, handwriting_result)
+        voice_input = self.voice_file if self.voice_file and os.path.exists(self.voice_file) else None
+        if voice_input is not None and self.recording is not None:
+            voice_input = self.recording
+        handwriting_input = (self.handwriting_file
+                             if self.handwriting_file and os.path.exists(self.handwriting_file) else None)
+
+        self.set_stage('voice', "Voice: queued" if voice_input is not None else "Voice: not provided")
+        self.set_stage('handwriting',
+                       "Handwriting: queued" if handwriting_input is not None else "Handwriting: not provided")
+        self.set_busy(True)
+        self.progress.config(mode='indeterminate')
+        self.progress.start()
+
+        # Analyze voice and handwriting concurrently, then combine using late fusion
+        self.run_in_background(lambda: self.engine.run(voice_input, handwriting_input),
+                               self.show_results, "Analysis")
+
+    def show_results(self, results):
+        self.set_busy(False)
+        voice = results['voice_analysis'] or {'prediction': "No", 'risk_factors': 0, 'risk_details': []}
+        handwriting = results['handwriting_analysis'] or {'prediction': "No", 'confidence': 0.0}
+        combined = results['combined']
 
         # Display results
-        self.result_text.insert(tk.END, f"Final Prediction: {final_pred}\n")
-        self.result_text.insert(tk.END, f"Combined Confidence: {confidence:.2f}\n\n")
-        
+        self.result_text.insert(tk.END, f"Final Prediction: {combined['prediction']}\n")
+        self.result_text.insert(tk.END, f"Combined Confidence: {combined['confidence']:.2f}\n\n")
+
         self.result_text.insert(tk.END, "Voice Analysis:\n")
-        self.result_text.insert(tk.END, f"- Prediction: {voice_result[0]}\n")
-        self.result_text.insert(tk.END, f"- Risk Factors: {voice_risk}/4\n")
-        for detail in voice_details:
+        self.result_text.insert(tk.END, f"- Prediction: {voice['prediction']}\n")
+        self.result_text.insert(tk.END, f"- Risk Factors: {voice['risk_factors']}/4\n")
+        for detail in voice['risk_details']:
             self.result_text.insert(tk.END, f"  * {detail}\n")
-        
+
         self.result_text.insert(tk.END, "\nHandwriting Analysis:\n")
-        self.result_text.insert(tk.END, f"- Prediction: {handwriting_result[0]}\n")
-        self.result_text.insert(tk.END, f"- Confidence: {hw_conf:.2f}\n")
+        self.result_text.insert(tk.END, f"- Prediction: {handwriting['prediction']}\n")
+        self.result_text.insert(tk.END, f"- Confidence: {handwriting['confidence']:.2f}\n")
+
+        timings = results['timings']
+        self.result_text.insert(tk.END, f"\nAnalysis time: {timings['total'] / 1000:.1f}s\n")
+
+    def close(self):
+        self._workers.shutdown(wait=False, cancel_futures=True)
+        self.window.destroy()
 
     def run(self):
         self.window.mainloop()
 
 if __name__ == "__main__":
     detector = ParkinsonDiseaseDetector()
-    detector.run()
\ No newline at end of file
+    detector.run()
@@ -0,0 +1,93 @@
+import argparse
+import glob
+import os
+import time
+
+import librosa
+import numpy as np
+import pandas as pd
+
+from voice_extraction import F0_METHODS, estimate_f0
+
+F0_FEATURES = ['MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)']
+
+
+def f0_features(f0):
+    if len(f0) == 0:
+        return [0.0, 0.0, 0.0]
+    return [np.mean(f0), np.max(f0), np.min(f0)]
+
+
+def compare_file(file_path, methods):
+    """Time every F0 backend on one file and return a row per backend."""
+    y, sr = librosa.load(file_path, sr=None)
+    rows = []
+    for method in methods:
+        start = time.perf_counter()
+        f0 = estimate_f0(y, sr, method=method)
+        elapsed = (time.perf_counter() - start) * 1000
+        rows.append([file_path, method, elapsed] + f0_features(f0))
+    return rows
+
+
+def build_report(data_dir, methods=F0_METHODS):
+    files = sorted(glob.glob(os.path.join(data_dir, "*", "*.wav")))
+    if not files:
+        raise FileNotFoundError(f"No WAV files found under {data_dir}")
+
+    # Pay every backend's JIT/compile cost before timing anything
+    compare_file(files[0], methods)
+
+    rows = []
+    for file_path in files:
+        rows.extend(compare_file(file_path, methods))
+    df = pd.DataFrame(rows, columns=['file', 'method', 'latency_ms'] + F0_FEATURES)
+    df['group'] = df['file'].map(lambda p: os.path.basename(os.path.dirname(p)))
+    return df
+
+
+def summarize(df, reference='pyin'):
+    """Latency per backend and group, plus deviation of each backend from the reference."""
+    latency = df.groupby(['group', 'method'])['latency_ms'].describe(percentiles=[0.5, 0.95])
+    ref = df[df['method'] == reference].set_index('file')[F0_FEATURES]
+
+    deviations = []
+    for method in df['method'].unique():
+        if method == reference:
+            continue
+        other = df[df['method'] == method].set_index('file')
+        for feature in F0_FEATURES:
+            both = (ref[feature] > 0) & (other[feature] > 0)
+            rel = (other.loc[both, feature] - ref.loc[both, feature]).abs() / ref.loc[both, feature]
+            for group, values in rel.groupby(other.loc[both, 'group']):
+                deviations.append({
+                    'method': method, 'group': group, 'feature': feature,
+                    'files': len(values),
+                    'median_rel_dev_%': 100 * values.median(),
+                    'p95_rel_dev_%': 100 * values.quantile(0.95),
+                    'within_5%': float((values <= 0.05).mean()),
+                })
+    return latency, pd.DataFrame(deviations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare F0 backends on latency and deviation from pyin.")
+    parser.add_argument('--data-dir', default=os.path.join('data', 'voice_data'))
+    parser.add_argument('--output-csv', default='f0_report.csv', help="Per-file results")
+    args = parser.parse_args()
+
+    df = build_report(args.data_dir)
+    df.to_csv(args.output_csv, index=False, float_format='%.6f')
+    latency, deviations = summarize(df)
+
+    print("\nLatency (ms per file):")
+    print("-" * 50)
+    print(latency.to_string(float_format='%.2f'))
+    print("\nDeviation from pyin:")
+    print("-" * 50)
+    print(deviations.to_string(index=False, float_format='%.2f'))
+    print(f"\nPer-file results saved to {args.output_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Production server: gunicorn -c gunicorn.conf.py app:app
+#
+# The master imports the app and loads the handwriting model before forking,
+# so the workers share its weights copy-on-write. Every worker then limits its
+# native thread pools to threads_per_worker and runs the rest of the warm-up
+# itself: thread pools and warm-up threads do not survive fork.
+import os
+
+from serving import limit_threads, set_thread_env, worker_plan
+
+plan = worker_plan()
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = plan['workers']
+worker_class = 'gthread'
+threads = plan['request_threads']
+preload_app = True
+# A long recording plus a cold model can take a while; keep in line with MODEL_READY_TIMEOUT_SECONDS
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 180))
+graceful_timeout = 30
+# Restart workers now and then to return memory fragmented by large uploads
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# Must be in place before the app (numpy, torch, numba) is imported by preload_app
+set_thread_env(plan['threads_per_worker'])
+# Never start the warm-up thread in the master; see post_fork
+os.environ['WARMUP_ON_STARTUP'] = '0'
+# The app sizes its admission limits from its share of the CPUs
+os.environ.setdefault('WEB_CONCURRENCY', str(workers))
+
+
+def when_ready(server):
+    import app
+    app.preload_for_fork()
+    server.log.info("Serving with %d workers x %d native threads (%d CPUs), %d request threads each",
+                    plan['workers'], plan['threads_per_worker'], plan['cpus'], plan['request_threads'])
+
+
+def post_fork(server, worker):
+    import app
+    limit_threads(plan['threads_per_worker'])
+    app.warmup.start()
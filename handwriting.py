@@ -0,0 +1,213 @@
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import threading
+
+import numpy as np
+
+HANDWRITING_MODEL_ID = "gianlab/swin-tiny-patch4-window7-224-finetuned-parkinson-classification"
+
+# Input layout expected by the Swin model's image processor: RGB bicubic-resized to 224x224,
+# scaled to [0, 1] and normalized with the ImageNet mean/std, channels first. These are the
+# defaults; image_spec() reads the loaded model's own processor
+IMAGE_SIZE = 224
+IMAGE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+DEFAULT_IMAGE_SPEC = {
+    'size': (IMAGE_SIZE, IMAGE_SIZE),  # (height, width)
+    'resample': Image.Resampling.BICUBIC,
+    'rescale': 1 / 255.0,
+    'mean': IMAGE_MEAN,
+    'std': IMAGE_STD,
+}
+# Large images are decoded (JPEG draft mode) or shrunk (Image.reduce) by an integer factor
+# while they stay at least this many times the target size, then resized with bicubic
+REDUCING_GAP = 2.0
+PREPROCESS_WORKERS = int(os.environ.get('HANDWRITING_PREPROCESS_WORKERS', min(4, os.cpu_count() or 1)))
+
+# 'eager' is the stock transformers pipeline; 'torchscript' and 'onnx' use a cached export
+HANDWRITING_BACKENDS = ('eager', 'torchscript', 'onnx')
+DEFAULT_BACKEND = os.environ.get('HANDWRITING_BACKEND', 'eager')
+DEFAULT_QUANTIZE = os.environ.get('HANDWRITING_QUANTIZE', '0') == '1'
+
+def load_handwriting_model(backend=None, quantize=None, cache_dir=None, num_threads=None):
+    """
+    Build the handwriting classifier.
+
+    Parameters:
+        backend (str): One of HANDWRITING_BACKENDS; defaults to $HANDWRITING_BACKEND or 'eager'.
+        quantize (bool): Use int8 dynamic quantization (exported backends only, ValueError
+            with 'eager'); defaults to $HANDWRITING_QUANTIZE.
+        cache_dir (str): Where exported models are kept; defaults to $HANDWRITING_EXPORT_DIR.
+        num_threads (int): Intra-op threads of an exported model; defaults to $HANDWRITING_NUM_THREADS,
+            else the runtime's own default. The eager model follows torch.set_num_threads.
+
+    Every backend returns a callable with the pipeline's interface.
+    """
+    backend = backend or DEFAULT_BACKEND
+    quantize = DEFAULT_QUANTIZE if quantize is None else quantize
+    if backend not in HANDWRITING_BACKENDS:
+        raise ValueError(f"Unknown handwriting backend '{backend}', expected one of {HANDWRITING_BACKENDS}")
+    if quantize and backend == 'eager':
+        raise ValueError("int8 quantization needs an exported backend; set HANDWRITING_BACKEND to "
+                         "'torchscript' or 'onnx', or HANDWRITING_QUANTIZE=0")
+
+    if backend == 'eager':
+        # transformers/torch take seconds to import, so only pay for them when the model is needed
+        from transformers import pipeline
+        return pipeline("image-classification", HANDWRITING_MODEL_ID)
+
+    from handwriting_export import load_exported_model
+    return load_exported_model(HANDWRITING_MODEL_ID, backend, quantize=quantize,
+                               cache_dir=cache_dir or os.environ.get('HANDWRITING_EXPORT_DIR'),
+                               num_threads=num_threads or int(os.environ.get('HANDWRITING_NUM_THREADS', 0)) or None)
+
+def warm_up(model):
+    """Run one dummy forward pass so the first real request does not pay for lazy initialisation."""
+    check_preprocessing(model)
+    spec = image_spec(model)
+    height, width = spec['size']
+    blank = Image.new('RGB', (width, height), 'white')
+    classify_pixel_batch(model, preprocess_image(blank, spec=spec)[np.newaxis])
+    return model
+
+def image_spec(model):
+    """
+    Input size, resampling filter and normalization of a model's image processor (the
+    pipeline's image_processor or ExportedClassifier.processor), for preprocess_image.
+    Settings the processor leaves out keep DEFAULT_IMAGE_SPEC's values.
+    """
+    processor = getattr(model, 'image_processor', None) or getattr(model, 'processor', None)
+    spec = dict(DEFAULT_IMAGE_SPEC)
+    if processor is None:
+        return spec
+    size = getattr(processor, 'size', None)
+    if isinstance(size, dict) and 'height' in size and 'width' in size:
+        spec['size'] = (int(size['height']), int(size['width']))
+    elif isinstance(size, dict) and 'shortest_edge' in size:
+        spec['size'] = (int(size['shortest_edge']),) * 2
+    elif isinstance(size, int):
+        spec['size'] = (size, size)
+    if getattr(processor, 'resample', None) is not None:
+        spec['resample'] = Image.Resampling(int(processor.resample))
+    if getattr(processor, 'do_rescale', True) is False:
+        spec['rescale'] = 1.0
+    elif getattr(processor, 'rescale_factor', None) is not None:
+        spec['rescale'] = float(processor.rescale_factor)
+    if getattr(processor, 'do_normalize', True) is False:
+        spec['mean'], spec['std'] = np.zeros(3, dtype=np.float32), np.ones(3, dtype=np.float32)
+    else:
+        for key, attribute in (('mean', 'image_mean'), ('std', 'image_std')):
+            if getattr(processor, attribute, None) is not None:
+                spec[key] = np.broadcast_to(np.asarray(getattr(processor, attribute), dtype=np.float32), (3,))
+    return spec
+
+def check_preprocessing(model):
+    """Warn if the model's image processor does something image_spec() cannot express."""
+    processor = getattr(model, 'image_processor', None) or getattr(model, 'processor', None)
+    if getattr(processor, 'do_center_crop', False) or getattr(processor, 'do_resize', True) is False:
+        print(f"Warning: {type(processor).__name__} crops or skips the resize; "
+              f"preprocess_image resizes straight to {image_spec(model)['size']}")
+
+def load_image(source):
+    """Decode a path, raw bytes, file-like object or PIL image into an RGB image."""
+    if isinstance(source, Image.Image):
+        return source.convert('RGB')
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        return img.convert('RGB')
+
+def preprocess_image(source, fast=True, spec=None):
+    """
+    Decode an image straight into the model's input: a float32 (3, height, width) array.
+
+    Parameters:
+        source: Path, raw bytes, file-like object or PIL image.
+        fast (bool): Decode JPEGs at reduced scale (draft mode) and shrink large images with
+            Image.reduce before the resize, so a full-resolution scan is never resampled
+            at full size. False resizes the fully decoded image, as the transformers pipeline does.
+        spec (dict): Size, resampling and normalization from image_spec(model);
+            defaults to DEFAULT_IMAGE_SPEC (224x224, bicubic, ImageNet mean/std).
+    """
+    spec = spec or DEFAULT_IMAGE_SPEC
+    if isinstance(source, Image.Image):
+        return image_to_pixels(_resize(source, fast, spec), spec)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        if fast and img.format == 'JPEG':
+            height, width = spec['size']
+            img.draft('RGB', (int(width * REDUCING_GAP), int(height * REDUCING_GAP)))
+        return image_to_pixels(_resize(img, fast, spec), spec)
+
+def _resize(img, fast, spec):
+    # Grayscale is resized before the RGB conversion (identical result, a third of the work);
+    # other modes are converted first, like the pipeline does
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    height, width = spec['size']
+    img = img.resize((width, height), spec['resample'], reducing_gap=REDUCING_GAP if fast else None)
+    return img.convert('RGB')
+
+def image_to_pixels(img, spec=None):
+    """Rescale and normalize a resized RGB image into a channels-first float32 array."""
+    spec = spec or DEFAULT_IMAGE_SPEC
+    pixels = np.asarray(img, dtype=np.float32)
+    pixels = (pixels * np.float32(spec['rescale']) - spec['mean']) / spec['std']
+    return np.ascontiguousarray(pixels.transpose(2, 0, 1))
+
+_preprocess_pool = None
+_preprocess_pool_lock = threading.Lock()
+
+def preprocess_pool():
+    """Shared thread pool for preprocessing; PIL releases the GIL while decoding and resizing."""
+    global _preprocess_pool
+    with _preprocess_pool_lock:
+        if _preprocess_pool is None:
+            _preprocess_pool = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS,
+                                                  thread_name_prefix='handwriting-preprocess')
+        return _preprocess_pool
+
+def preprocess_images(sources, fast=True, executor=None, spec=None):
+    """Preprocess many images on a thread pool into one (N, 3, height, width) batch."""
+    executor = executor or preprocess_pool()
+    return np.stack(list(executor.map(lambda source: preprocess_image(source, fast=fast, spec=spec), sources)))
+
+def classify_pixel_batch(model, pixel_values):
+    """
+    Classify an (N, 3, height, width) batch from preprocess_image, skipping the
+    pipeline's own decode and resize. Returns one ranked label list per image, like classify_batch.
+    """
+    pixel_values = np.ascontiguousarray(pixel_values, dtype=np.float32)
+    if hasattr(model, 'classify_pixels'):
+        return model.classify_pixels(pixel_values)
+    # Eager transformers pipeline: run its model directly
+    import torch
+    from handwriting_export import rank_labels
+    with torch.inference_mode():
+        logits = model.model(pixel_values=torch.from_numpy(pixel_values)).logits.numpy()
+    return rank_labels(logits, model.model.config.id2label)
+
+def classify_batch(model, images):
+    """Run one batched forward pass over a list of decoded images."""
+    results = model(images, batch_size=len(images))
+    # A single image is returned as a flat list of labels rather than a list of lists
+    if len(images) == 1 and results and isinstance(results[0], dict):
+        results = [results]
+    return results
+
+def interpret_prediction(result):
+    """Turn the pipeline's label scores for one image into a prediction and confidence."""
+    if result and isinstance(result, list) and len(result) > 0:
+        prediction = result[0]
+        has_parkinsons = 'parkinson' in prediction['label'].lower()
+        return {
+            'prediction': "Yes" if has_parkinsons else "No",
+            'confidence': float(prediction['score'])
+        }
+    return {
+        'prediction': "No",
+        'confidence': 0.0
+    }
@@ -0,0 +1,125 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from handwriting import HANDWRITING_BACKENDS, load_handwriting_model, load_image, classify_batch
+
+# (backend, quantize) pairs compared against the eager pipeline
+VARIANTS = [('eager', False)] + [(backend, quantize)
+                                 for backend in HANDWRITING_BACKENDS if backend != 'eager'
+                                 for quantize in (False, True)]
+
+
+def variant_name(backend, quantize):
+    return f"{backend}-int8" if quantize else backend
+
+
+def run_variant(backend, quantize, files, batch_size):
+    """
+    Load one backend in a fresh process and classify every image.
+    Returns predictions, timings and the process's peak RSS.
+    """
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    model = load_handwriting_model(backend=backend, quantize=quantize)
+    load_seconds = time.perf_counter() - start
+
+    images = [load_image(path) for path in files]
+    classify_batch(model, images[:1])  # warm-up
+
+    single = []
+    predictions = []
+    for image in images:
+        t = time.perf_counter()
+        result = classify_batch(model, [image])[0]
+        single.append((time.perf_counter() - t) * 1000)
+        predictions.append({item['label']: item['score'] for item in result})
+
+    batched = []
+    for i in range(0, len(images), batch_size):
+        t = time.perf_counter()
+        classify_batch(model, images[i:i + batch_size])
+        batched.append((time.perf_counter() - t) * 1000 / len(images[i:i + batch_size]))
+
+    return {
+        'variant': variant_name(backend, quantize),
+        'load_seconds': load_seconds,
+        'latency_ms_p50': float(np.median(single)),
+        'latency_ms_p95': float(np.percentile(single, 95)),
+        'batched_ms_per_image': float(np.mean(batched)),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'model_rss_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024,
+        'predictions': predictions,
+    }
+
+
+def agreement(reference, candidate):
+    """Top-1 agreement and largest per-label score difference between two prediction lists."""
+    same_top1 = 0
+    max_diff = 0.0
+    for ref, cand in zip(reference, candidate):
+        same_top1 += max(ref, key=ref.get) == max(cand, key=cand.get)
+        max_diff = max(max_diff, max(abs(ref[label] - cand.get(label, 0.0)) for label in ref))
+    return same_top1 / len(reference), max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check optimized handwriting backends against the eager model and compare speed/memory.")
+    parser.add_argument('--data-dir', default=os.path.join('data', 'image_data'))
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--min-agreement', type=float, default=1.0,
+                        help="Fail if any backend's top-1 agreement with eager is below this")
+    parser.add_argument('--output-json', default='handwriting_backend_report.json')
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.data_dir, '**', '*.png'), recursive=True) +
+                   glob.glob(os.path.join(args.data_dir, '**', '*.jp*g'), recursive=True))
+    if not files:
+        raise FileNotFoundError(f"No images found under {args.data_dir}")
+
+    # Each variant gets its own process so peak RSS is measured in isolation
+    context = multiprocessing.get_context('spawn')
+    reports = []
+    for backend, quantize in VARIANTS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                reports.append(executor.submit(run_variant, backend, quantize, files,
+                                               args.batch_size).result())
+            except Exception as e:
+                print(f"Skipping {variant_name(backend, quantize)}: {str(e)}")
+
+    reference = next(r for r in reports if r['variant'] == 'eager')
+    print(f"\nHandwriting backends on {len(files)} images:")
+    print("-" * 100)
+    print(f"{'variant':<18}{'agree':>8}{'max|dp|':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'batch ms/img':>14}{'load s':>9}{'model MB':>10}{'peak MB':>10}")
+    failed = []
+    for report in reports:
+        report['top1_agreement'], report['max_score_diff'] = agreement(reference['predictions'],
+                                                                       report['predictions'])
+        if report['top1_agreement'] < args.min_agreement:
+            failed.append(report['variant'])
+        print(f"{report['variant']:<18}{report['top1_agreement']:>8.3f}{report['max_score_diff']:>10.4f}"
+              f"{report['latency_ms_p50']:>10.1f}{report['latency_ms_p95']:>10.1f}"
+              f"{report['batched_ms_per_image']:>14.1f}{report['load_seconds']:>9.1f}"
+              f"{report['model_rss_mb']:>10.0f}{report['peak_rss_mb']:>10.0f}")
+
+    with open(args.output_json, 'w') as f:
+        json.dump([{k: v for k, v in r.items() if k != 'predictions'} for r in reports], f, indent=2)
+    print(f"\nReport saved to {args.output_json}")
+
+    if failed:
+        raise SystemExit(f"Top-1 agreement below {args.min_agreement} for: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
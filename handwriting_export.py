@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# Optimized CPU backends for the handwriting classifier, besides the eager transformers pipeline
+EXPORT_BACKENDS = ('torchscript', 'onnx')
+EXPORT_FORMAT_VERSION = "1"
+ONNX_OPSET = 17
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "parkinson_detector", "handwriting")
+
+
+def artifact_dir(model_id, backend, quantize, cache_dir=None):
+    """Directory holding one exported model variant."""
+    slug = model_id.replace('/', '--')
+    variant = f"{backend}-int8" if quantize else backend
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, slug, f"{variant}-v{EXPORT_FORMAT_VERSION}")
+
+
+def _import_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("The 'onnx' handwriting backend needs the onnx and onnxruntime packages "
+                          "(pip install -r requirements.txt)") from e
+    return onnxruntime
+
+
+def _model_file(backend):
+    return 'model.pt' if backend == 'torchscript' else 'model.onnx'
+
+
+def export_model(model_id, backend, quantize=False, cache_dir=None):
+    """
+    Convert the eager model once to TorchScript or ONNX, optionally with int8
+    dynamic quantization of the Linear layers, and store it with its image
+    processor and label map. Returns the artifact directory.
+    """
+    import torch
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    if backend not in EXPORT_BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {EXPORT_BACKENDS}")
+
+    out_dir = artifact_dir(model_id, backend, quantize, cache_dir)
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    processor = AutoImageProcessor.from_pretrained(model_id)
+    model = AutoModelForImageClassification.from_pretrained(model_id, torchscript=True)
+    model.eval()
+    id2label = {str(k): v for k, v in model.config.id2label.items()}
+    size = processor.size.get('height', 224) if isinstance(processor.size, dict) else 224
+    dummy = torch.zeros(1, 3, size, size)
+
+    start = time.perf_counter()
+    if backend == 'torchscript':
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        with torch.no_grad():
+            traced = torch.jit.trace(model, dummy)
+            traced = torch.jit.freeze(traced)
+        torch.jit.save(traced, os.path.join(tmp_dir, _model_file(backend)))
+    else:
+        _import_onnxruntime()
+        onnx_path = os.path.join(tmp_dir, _model_file(backend))
+        float_path = onnx_path + '.float' if quantize else onnx_path
+        with torch.no_grad():
+            torch.onnx.export(model, (dummy,), float_path,
+                              input_names=['pixel_values'], output_names=['logits'],
+                              dynamic_axes={'pixel_values': {0: 'batch'}, 'logits': {0: 'batch'}},
+                              opset_version=ONNX_OPSET)
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(float_path, onnx_path, weight_type=QuantType.QInt8)
+            os.remove(float_path)
+
+    processor.save_pretrained(tmp_dir)
+    with open(os.path.join(tmp_dir, 'labels.json'), 'w') as f:
+        json.dump({
+            'model_id': model_id,
+            'backend': backend,
+            'quantize': quantize,
+            'id2label': id2label,
+            'export_seconds': time.perf_counter() - start,
+        }, f, indent=2)
+
+    if os.path.isdir(out_dir):
+        # Another process finished the same export first; keep theirs
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+class ExportedClassifier:
+    """
+    Drop-in replacement for the transformers image-classification pipeline
+    that runs an exported TorchScript or ONNX Runtime model.
+
+    Called with one image it returns a list of {'label', 'score'} dicts sorted
+    by score; called with a list of images it returns one such list per image.
+    """
+
+    def __init__(self, model_dir, num_threads=None):
+        from transformers import AutoImageProcessor
+
+        with open(os.path.join(model_dir, 'labels.json')) as f:
+            labels = json.load(f)
+        self.backend = labels['backend']
+        self.id2label = {int(k): v for k, v in labels['id2label'].items()}
+        self.processor = AutoImageProcessor.from_pretrained(model_dir)
+        model_path = os.path.join(model_dir, _model_file(self.backend))
+
+        if self.backend == 'torchscript':
+            import torch
+            if num_threads:
+                torch.set_num_threads(num_threads)
+            self._torch = torch
+            self._module = torch.jit.load(model_path, map_location='cpu')
+            self._module.eval()
+        else:
+            ort = _import_onnxruntime()
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if num_threads:
+                options.intra_op_num_threads = num_threads
+            self._session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+
+    def logits(self, images):
+        pixel_values = self.processor(images=images, return_tensors='np')['pixel_values'].astype(np.float32)
+        return self.logits_from_pixels(pixel_values)
+
+    def logits_from_pixels(self, pixel_values):
+        if self.backend == 'torchscript':
+            with self._torch.inference_mode():
+                output = self._module(self._torch.from_numpy(pixel_values))
+            return (output[0] if isinstance(output, (tuple, list)) else output).numpy()
+        return self._session.run(['logits'], {'pixel_values': pixel_values})[0]
+
+    def __call__(self, inputs, batch_size=None, top_k=5):
+        single = not isinstance(inputs, list)
+        images = [inputs] if single else inputs
+        results = []
+        step = batch_size or len(images)
+        for i in range(0, len(images), step):
+            results.extend(rank_labels(self.logits(images[i:i + step]), self.id2label, top_k))
+        return results[0] if single else results
+
+    def classify_pixels(self, pixel_values, top_k=5):
+        """Ranked labels for an already preprocessed (N, 3, H, W) float32 batch."""
+        return rank_labels(self.logits_from_pixels(pixel_values), self.id2label, top_k)
+
+
+def rank_labels(logits, id2label, top_k=5):
+    """Softmax each row of logits into the pipeline's sorted [{'label', 'score'}, ...] lists."""
+    logits = logits - logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    probs /= probs.sum(axis=1, keepdims=True)
+    results = []
+    for row in probs:
+        order = np.argsort(row)[::-1][:top_k]
+        results.append([{'label': id2label[int(j)], 'score': float(row[j])} for j in order])
+    return results
+
+
+def load_exported_model(model_id, backend, quantize=False, cache_dir=None, num_threads=None):
+    """Load a cached export, converting the eager model first if it is not cached yet."""
+    model_dir = artifact_dir(model_id, backend, quantize, cache_dir)
+    if not os.path.exists(os.path.join(model_dir, 'labels.json')):
+        print(f"Exporting {model_id} to {backend}{' (int8)' if quantize else ''} in {model_dir}")
+        model_dir = export_model(model_id, backend, quantize=quantize, cache_dir=cache_dir)
+    return ExportedClassifier(model_dir, num_threads=num_threads)
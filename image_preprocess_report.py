@@ -0,0 +1,99 @@
+import argparse
+import glob
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from handwriting import load_image, preprocess_image, preprocess_images
+
+# Full-resolution scans are simulated by upscaling the bundled images (256x256) to this many pixels wide
+SCAN_WIDTHS = [1024, 3000]
+DEFAULT_WORKERS = [1, 2, 4, 8]
+
+
+def legacy_preprocess(data):
+    """What the pipeline did per request: decode the whole image, then resize and normalize it."""
+    return preprocess_image(load_image(data), fast=False)
+
+
+def encode(image, fmt, width=None):
+    if width:
+        image = image.resize((width, int(width * image.height / image.width)), Image.Resampling.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **({'quality': 90} if fmt == 'JPEG' else {}))
+    return buffer.getvalue()
+
+
+def build_inputs(files):
+    """Encoded uploads per variant: the files as they are, plus upscaled PNG and JPEG 'scans'."""
+    variants = {'original': []}
+    for path in files:
+        with open(path, 'rb') as f:
+            variants['original'].append(f.read())
+        image = load_image(path)
+        for width in SCAN_WIDTHS:
+            for fmt in ('PNG', 'JPEG'):
+                variants.setdefault(f"{fmt.lower()} {width}px", []).append(encode(image, fmt, width))
+    return variants
+
+
+def time_each(func, uploads, repeat):
+    samples = []
+    for _ in range(repeat):
+        for data in uploads:
+            start = time.perf_counter()
+            func(data)
+            samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples)), float(np.percentile(samples, 95))
+
+
+def max_deviation(uploads):
+    """Largest per-pixel difference (in normalized units) between the fast and the exact path."""
+    return max(float(np.abs(preprocess_image(data) - preprocess_image(data, fast=False)).max()) for data in uploads)
+
+
+def throughput(uploads, workers, repeat):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        preprocess_images(uploads[:workers], executor=executor)  # start the threads
+        start = time.perf_counter()
+        for _ in range(repeat):
+            preprocess_images(uploads, executor=executor)
+        return repeat * len(uploads) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Handwriting decode + preprocess time: full decode vs the fast path.")
+    parser.add_argument('--image-dir', default=os.path.join('data', 'image_data'))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', default=','.join(map(str, DEFAULT_WORKERS)))
+    args = parser.parse_args()
+
+    files = sorted(f for pattern in ('*.png', '*.jpg', '*.jpeg')
+                   for f in glob.glob(os.path.join(args.image_dir, '**', pattern), recursive=True))
+    if not files:
+        raise FileNotFoundError(f"No images found under {args.image_dir}")
+    variants = build_inputs(files)
+    levels = [int(level) for level in args.workers.split(',') if level]
+
+    print(f"{len(files)} images, {args.repeat} repeats; times are decode + resize + normalize per image")
+    print("-" * 78)
+    print(f"{'input':<16}{'full p50':>10}{'full p95':>10}{'fast p50':>10}{'fast p95':>10}{'speedup':>9}{'max dev':>10}")
+    for name, uploads in variants.items():
+        legacy_p50, legacy_p95 = time_each(legacy_preprocess, uploads, args.repeat)
+        fast_p50, fast_p95 = time_each(preprocess_image, uploads, args.repeat)
+        print(f"{name:<16}{legacy_p50:>9.2f}ms{legacy_p95:>8.2f}ms{fast_p50:>8.2f}ms{fast_p95:>8.2f}ms"
+              f"{legacy_p50 / fast_p50:>8.1f}x{max_deviation(uploads):>10.3f}")
+
+    print(f"\nFast path throughput on a thread pool (images/s, {os.cpu_count()} CPUs)")
+    print("-" * 78)
+    print(f"{'input':<16}" + ''.join(f"{str(level) + ' threads':>12}" for level in levels))
+    for name, uploads in variants.items():
+        print(f"{name:<16}" + ''.join(f"{throughput(uploads, level, args.repeat):>12.0f}" for level in levels))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobStoreFull(Exception):
+    """Raised when max_jobs jobs are still queued or running."""
+
+
+class JobManager:
+    """
+    Run analyses as background jobs on a bounded worker pool.
+
+    A job is a set of named tasks (one per modality). Each task runs on the
+    pool and its result becomes visible as soon as it finishes, so clients
+    polling the job see partial results. When every task is done the optional
+    on_complete callback adds derived results (e.g. the late fusion).
+
+    Finished jobs are kept for ttl_seconds; at most max_jobs are held in memory.
+    When the store is full the oldest finished jobs are evicted early to make
+    room, so only unfinished jobs can make submit() refuse new work.
+    """
+
+    def __init__(self, max_workers=2, max_jobs=256, ttl_seconds=600):
+        self.max_jobs = int(max_jobs)
+        self.ttl = float(ttl_seconds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._jobs = {}
+        self._evicted = 0
+        self._cond = threading.Condition()
+
+    def submit(self, tasks, on_complete=None):
+        """
+        Queue a job and return its id immediately.
+
+        Parameters:
+            tasks (dict): Result name -> zero-argument callable.
+            on_complete (callable): Takes the results dict, returns extra results to merge in.
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'status': 'queued',
+            'created': now,
+            'updated': now,
+            'results': {name: None for name in tasks},
+            'errors': {},
+            'pending': set(tasks),
+            'on_complete': on_complete,
+        }
+        with self._cond:
+            self._prune(now)
+            if len(self._jobs) >= self.max_jobs:
+                self._evict(len(self._jobs) - self.max_jobs + 1)
+            if len(self._jobs) >= self.max_jobs:
+                raise JobStoreFull(f"{len(self._jobs)} jobs queued or running")
+            self._jobs[job_id] = job
+
+        if not tasks:
+            self._finish(job)
+        for name, task in tasks.items():
+            self._executor.submit(self._run_task, job, name, task)
+        return job_id
+
+    def get(self, job_id, wait=0.0, since=None):
+        """
+        Return a snapshot of the job, or None if it is unknown or expired.
+
+        With wait > 0 this long-polls: it blocks until the job finishes, or has
+        changed after the `updated` timestamp given as since, or until wait
+        seconds have passed.
+        """
+        deadline = time.time() + max(float(wait), 0.0)
+        with self._cond:
+            self._prune(time.time())
+            job = self._jobs.get(job_id)
+            while job is not None and job['status'] not in ('done', 'error'):
+                if since is not None and job['updated'] > since:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+                job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def stats(self):
+        with self._cond:
+            statuses = [job['status'] for job in self._jobs.values()]
+            evicted = self._evicted
+        return {
+            'jobs': len(statuses),
+            'max_jobs': self.max_jobs,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'finished': statuses.count('done') + statuses.count('error'),
+            'evicted': evicted,
+        }
+
+    def _run_task(self, job, name, task):
+        with self._cond:
+            if job['status'] == 'queued':
+                job['status'] = 'running'
+                job['updated'] = time.time()
+        try:
+            result, error = task(), None
+        except Exception as e:
+            result, error = None, str(e)
+
+        with self._cond:
+            job['results'][name] = result
+            if error is not None:
+                job['errors'][name] = error
+            job['pending'].discard(name)
+            job['updated'] = time.time()
+            finished = not job['pending']
+            self._cond.notify_all()
+        if finished:
+            self._finish(job)
+
+    def _finish(self, job):
+        extra, error = {}, None
+        if job['on_complete'] is not None and not job['errors']:
+            try:
+                extra = job['on_complete'](dict(job['results'])) or {}
+            except Exception as e:
+                error = str(e)
+        with self._cond:
+            job['results'].update(extra)
+            if error is not None:
+                job['errors']['on_complete'] = error
+            job['status'] = 'error' if job['errors'] else 'done'
+            job['updated'] = time.time()
+            self._cond.notify_all()
+
+    def _prune(self, now):
+        """Drop finished jobs past their TTL; caller holds the lock."""
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['status'] in ('done', 'error') and now - job['updated'] > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _evict(self, count):
+        """Drop up to count finished jobs, least recently updated first; caller holds the lock."""
+        finished = sorted((job for job in self._jobs.values() if job['status'] in ('done', 'error')),
+                          key=lambda job: job['updated'])
+        for job in finished[:count]:
+            del self._jobs[job['id']]
+            self._evicted += 1
+
+    @staticmethod
+    def _snapshot(job):
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'updated': job['updated'],
+            'pending': sorted(job['pending']),
+            'results': dict(job['results']),
+            'errors': dict(job['errors']),
+        }
@@ -1,16 +1,20 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash
-import sqlite3
+import os
+from db import UserStore
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
+app.config['DATABASE'] = os.environ.get('LOGIN_DB_PATH', 'users.db')
+# Connections shared by the request threads, and how long a successful login is remembered
+app.config['DB_POOL_SIZE'] = int(os.environ.get('LOGIN_DB_POOL_SIZE', 8))
+app.config['AUTH_CACHE_TTL_SECONDS'] = float(os.environ.get('LOGIN_AUTH_CACHE_TTL_SECONDS', 60))
+
+users = UserStore(app.config['DATABASE'], pool_size=app.config['DB_POOL_SIZE'],
+                  auth_cache_ttl=app.config['AUTH_CACHE_TTL_SECONDS'])
 
 # Create user table if it doesn't exist
 def init_db():
-    with sqlite3.connect('users.db') as conn:
-        conn.execute('''CREATE TABLE IF NOT EXISTS users (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            username TEXT UNIQUE NOT NULL,
-                            password TEXT NOT NULL)''')
+    users.init_schema()
 
 @app.route('/')
 def home():
@@ -23,11 +27,7 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        with sqlite3.connect('users.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
-            user = cursor.fetchone()
-        if user:
+        if users.authenticate(username, password):
             session['username'] = username
             flash('Login successful!', 'success')
             return redirect("http://127.0.0.1:5000/")  # Redirect to your main app
@@ -40,14 +40,10 @@ def register():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        try:
-            with sqlite3.connect('users.db') as conn:
-                conn.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
-                conn.commit()
+        if users.register(username, password):
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('login'))
-        except sqlite3.IntegrityError:
-            flash('Username already exists!', 'danger')
+        flash('Username already exists!', 'danger')
     return render_template('register.html')
 
 if __name__ == '__main__':
@@ -0,0 +1,145 @@
+import hashlib
+import hmac
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Applied to every pooled connection. WAL lets logins (readers) proceed while a
+# registration (writer) commits; NORMAL sync is durable across application crashes in WAL mode.
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),        # ms to wait for a lock instead of failing with "database is locked"
+    ('cache_size', -8192),         # KiB of page cache per connection
+    ('temp_store', 'MEMORY'),
+    ('mmap_size', 64 * 1024 * 1024),
+)
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL)'''
+
+
+class ConnectionPool:
+    """
+    A fixed-size pool of SQLite connections shared by the request threads.
+
+    Connections are opened lazily, configured with PRAGMAS once, and handed
+    back after each use, so a request never pays for connect + pragma setup
+    and thread-per-request servers reuse the same few connections.
+    """
+
+    def __init__(self, path, size=8):
+        self.path = path
+        self.size = int(size)
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for one unit of work; waits if every connection is busy."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    conn = self._open()
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class UserStore:
+    """
+    User accounts on a pooled WAL-mode SQLite database.
+
+    Logins look the user up by username (served by the UNIQUE index on
+    users.username) and successful authentications are remembered for
+    auth_cache_ttl seconds, so repeated logins skip the database. Only a hash
+    of the credentials is kept in the cache, and failed logins are never cached.
+    """
+
+    def __init__(self, path, pool_size=8, auth_cache_ttl=60.0, auth_cache_size=1024):
+        self.pool = ConnectionPool(path, size=pool_size)
+        self.auth_cache_ttl = float(auth_cache_ttl)
+        self.auth_cache_size = int(auth_cache_size)
+        self._auth_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def init_schema(self):
+        with self.pool.connection() as conn:
+            conn.execute(SCHEMA)
+            conn.commit()
+
+    def find_user(self, username):
+        """Return (id, password) for username, or None."""
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT id, password FROM users WHERE username = ?', (username,)).fetchone()
+
+    def authenticate(self, username, password):
+        key = self._cache_key(username, password)
+        now = time.monotonic()
+        with self._cache_lock:
+            expires = self._auth_cache.get(key)
+            if expires is not None:
+                if expires > now:
+                    self._auth_cache.move_to_end(key)
+                    return True
+                del self._auth_cache[key]
+
+        user = self.find_user(username)
+        if user is None or not hmac.compare_digest(user[1].encode('utf-8'), password.encode('utf-8')):
+            return False
+
+        if self.auth_cache_ttl > 0:
+            with self._cache_lock:
+                self._auth_cache[key] = now + self.auth_cache_ttl
+                self._auth_cache.move_to_end(key)
+                while len(self._auth_cache) > self.auth_cache_size:
+                    self._auth_cache.popitem(last=False)
+        return True
+
+    def register(self, username, password):
+        """Create a user; returns False if the username is taken."""
+        try:
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def clear_auth_cache(self):
+        """Drop every cached authentication, e.g. after a password change."""
+        with self._cache_lock:
+            self._auth_cache.clear()
+
+    @staticmethod
+    def _cache_key(username, password):
+        return hashlib.sha256(f"{username}\0{password}".encode('utf-8')).digest()
@@ -0,0 +1,123 @@
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from db import SCHEMA, UserStore
+
+DEFAULT_CONCURRENCY = [1, 4, 16]
+
+
+def legacy_authenticate(path, username, password):
+    """The original login query: a fresh rollback-journal connection per request."""
+    with sqlite3.connect(path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
+        return cursor.fetchone() is not None
+
+
+def legacy_register(path, username, password):
+    try:
+        with sqlite3.connect(path) as conn:
+            conn.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
+            conn.commit()
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+def create_database(path, n_users):
+    with sqlite3.connect(path) as conn:
+        conn.execute(SCHEMA)
+        conn.executemany('INSERT INTO users (username, password) VALUES (?, ?)',
+                         [(f"user{i}", f"password{i}") for i in range(n_users)])
+        conn.commit()
+
+
+def run_load(operation, n_users, concurrency, n_requests, write_every):
+    """
+    Run n_requests logins of random existing users from `concurrency` threads;
+    every write_every-th request registers a new user instead. Returns requests/s
+    and the number of failed requests.
+    """
+    def one(i):
+        try:
+            if write_every and i % write_every == 0:
+                return operation('register', f"new-{uuid.uuid4().hex}", "secret")
+            user = (i * 7919) % n_users
+            return operation('login', f"user{user}", f"password{user}")
+        except sqlite3.OperationalError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(one, range(n_requests)))
+        elapsed = time.perf_counter() - start
+    return n_requests / elapsed, results.count(False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput: per-request connections vs the pooled WAL store.")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per scenario and concurrency level")
+    parser.add_argument('--concurrency', default=','.join(map(str, DEFAULT_CONCURRENCY)))
+    parser.add_argument('--write-every', type=int, default=20,
+                        help="Every Nth request is a registration (0 for logins only)")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        pooled_path = os.path.join(tmp, 'pooled.db')
+        create_database(legacy_path, args.users)
+        create_database(pooled_path, args.users)
+
+        stores = {
+            'pooled': UserStore(pooled_path, auth_cache_ttl=0),
+            'pooled+cache': UserStore(pooled_path, auth_cache_ttl=60),
+        }
+
+        def legacy(kind, username, password):
+            fn = legacy_register if kind == 'register' else legacy_authenticate
+            return fn(legacy_path, username, password)
+
+        scenarios = {'per-request connect': legacy}
+        for name, store in stores.items():
+            scenarios[name] = (lambda s: lambda kind, u, p: s.register(u, p) if kind == 'register'
+                               else s.authenticate(u, p))(store)
+
+        # The same flows through the Flask login app's test client
+        os.environ['LOGIN_DB_PATH'] = pooled_path
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import app1
+
+        def http(kind, username, password):
+            client = app1.app.test_client()
+            response = client.post(f"/{kind}", data={'username': username, 'password': password})
+            # Both successful flows redirect; failures re-render the form
+            return response.status_code == 302
+
+        scenarios['flask /login (pooled+cache)'] = http
+
+        print(f"{args.users} users, {args.requests} requests per run, 1 in {args.write_every or 'no'} registers")
+        print("-" * 72)
+        print(f"{'scenario':<30}" + ''.join(f"{str(level) + ' clients':>14}" for level in levels))
+        for name, operation in scenarios.items():
+            row = f"{name:<30}"
+            for level in levels:
+                # Silence the login route's debug print during the HTTP runs
+                with contextlib.redirect_stdout(io.StringIO()):
+                    rate, failed = run_load(operation, args.users, level, args.requests, args.write_every)
+                row += f"{rate:>10.0f}/s" + (f"({failed}!)" if failed else "   ")
+            print(row)
+        print("\n(n!) marks requests that failed, e.g. with 'database is locked'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond fusion up to multi-second pyin runs
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(2 ** i * 1024 for i in range(0, 15, 2))  # 1 KiB .. 16 MiB
+DURATION_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, self._copy(value)) for key, value in self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. errors per stage."""
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight."""
+    kind = 'gauge'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, rendered as _bucket/_sum/_count series."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, state):
+        return [state[0][:], state[1], state[2]]
+
+    def _samples(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} "
+                         f"{cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'parkinson_stage_duration_seconds', "Time spent in each analysis stage.", ['stage']))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    'parkinson_stage_errors_total', "Analysis stages that raised an exception.", ['stage']))
+UPLOAD_BYTES = REGISTRY.register(Histogram(
+    'parkinson_upload_bytes', "Size of accepted uploads.", ['modality'], buckets=SIZE_BUCKETS))
+AUDIO_SECONDS = REGISTRY.register(Histogram(
+    'parkinson_audio_duration_seconds', "Duration of analyzed voice recordings.", buckets=DURATION_BUCKETS))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'parkinson_http_request_duration_seconds', "HTTP request latency.", ['endpoint']))
+REQUESTS = REGISTRY.register(Counter(
+    'parkinson_http_requests_total', "HTTP requests handled.", ['endpoint', 'status']))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    'parkinson_http_requests_in_flight', "HTTP requests currently being handled."))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    'parkinson_admission_in_flight', "Admitted analyses currently running.", ['modality']))
+ADMISSION_QUEUED = REGISTRY.register(Gauge(
+    'parkinson_admission_queue_depth', "Analyses waiting for an admission slot.", ['modality']))
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'parkinson_admission_wait_seconds', "Time spent waiting for an admission slot.", ['modality']))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    'parkinson_admission_rejected_total', "Analyses turned away with 503.", ['modality', 'reason']))
+DEADLINE_EXCEEDED = REGISTRY.register(Counter(
+    'parkinson_deadline_exceeded_total', "Requests aborted at a stage after their deadline.", ['stage']))
+
+# Called with the stage name whenever a stage() starts; a hook may raise to abort the work
+# (admission.check_deadline does for expired requests)
+STAGE_HOOKS = []
+
+# Stage breakdown of the current request when profiling is on; None otherwise
+_profile = contextvars.ContextVar('profile', default=None)
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profiling():
+    """
+    Collect a per-stage breakdown (stage -> total ms) of everything timed with
+    stage() in this context. Threads only see it if they run in a copy of this
+    context (see AnalysisEngine.run).
+    """
+    stages = {}
+    token = _profile.set(stages)
+    try:
+        yield stages
+    finally:
+        _profile.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a block (or, used as a decorator, a function) as analysis stage `name`.
+    Exceptions are counted per stage and re-raised.
+    """
+    checkpoint(name)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stages = _profile.get()
+        if stages is not None:
+            with _profile_lock:
+                stages[name] = stages.get(name, 0.0) + elapsed * 1000
+
+
+def checkpoint(name):
+    """Run the STAGE_HOOKS for `name`; long stages call this between steps of their own."""
+    for hook in STAGE_HOOKS:
+        hook(name)
@@ -0,0 +1,366 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from metrics import stage
+from voice_extraction import FEATURE_EXTRACTOR_VERSION, FEATURE_NAMES, features_to_vector
+
+INDEX_DIR = 'voice_index'
+META_FILE = 'meta.json'
+# Data files carry the generation number of the full build that created them; meta.json names the
+# generation to read, so a rebuild never rewrites a file that an open index has mapped
+ROWS_FILE = 'rows-{}.tsv'        # path, size and mtime_ns of each reference, in row order
+VECTORS_FILE = 'vectors-{}.f32'  # N x 22 standardized features, raw float32
+LABELS_FILE = 'labels-{}.i8'     # N labels (batch_extract.LABELS), raw int8
+LISTS_FILE = 'lists-{}.i32'      # N partition (IVF list) numbers, raw int32
+DATA_FILES = (ROWS_FILE, VECTORS_FILE, LABELS_FILE, LISTS_FILE)
+
+LABEL_NAMES = {0: 'HC', 1: 'PD'}
+DEFAULT_K = 5
+SEARCH_METHODS = ('auto', 'exact', 'ivf')
+# Approximate search partitions the references into about sqrt(N) k-means cells and
+# only scans the NPROBE cells closest to the query; smaller corpora are searched exactly
+IVF_MIN_ROWS = 1000
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 20
+KMEANS_SAMPLE_PER_LIST = 256
+# 'auto' switches to the partition from this many references on; exact search takes under 1 ms up to here
+AUTO_IVF_ROWS = 50000
+# Incremental builds keep the standardization and partition until the corpus has doubled since they were fit
+REFIT_GROWTH = 2.0
+
+
+def _row_key(path, size, mtime_ns):
+    return f"{path}\t{int(size)}\t{int(mtime_ns)}"
+
+
+def kmeans(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Lloyd's k-means on a sample of the rows; returns n_lists x d float32 centroids."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), n_lists * KMEANS_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_lists(sample, centroids)
+        counts = np.bincount(assignment, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+        # Restart empty cells from random rows
+        centroids[~filled] = sample[rng.choice(len(sample), int((~filled).sum()))]
+    return centroids
+
+
+def assign_lists(vectors, centroids, block=65536):
+    """Number of the nearest centroid for every row, in blocks to bound the distance matrix."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    for start in range(0, len(vectors), block):
+        chunk = np.asarray(vectors[start:start + block], dtype=np.float32)
+        out[start:start + block] = np.argmin(centroid_norms - 2 * chunk @ centroids.T, axis=1)
+    return out
+
+
+def _read_meta(index_dir):
+    try:
+        with open(os.path.join(index_dir, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def data_path(index_dir, meta, name):
+    """Path of one of the DATA_FILES in the generation meta refers to."""
+    return os.path.join(index_dir, name.format(meta['generation']))
+
+
+def _write_atomic(path, write):
+    with open(path + '.tmp', 'wb') as f:
+        write(f)
+    os.replace(path + '.tmp', path)
+
+
+def _reference_rows(store_dir):
+    """Labelled, finite rows of a batch_extract store: (keys, features, labels, f0_method)."""
+    from batch_extract import UNKNOWN_LABEL, load_store
+
+    index, features = load_store(store_dir)
+    keep = ((index['label'].to_numpy() != UNKNOWN_LABEL)
+            & (index['version'].astype(str).to_numpy() == FEATURE_EXTRACTOR_VERSION)
+            & np.isfinite(features).all(axis=1))
+    index, features = index[keep], features[keep]
+    methods = sorted(set(index['f0_method']))
+    if len(methods) > 1:
+        raise ValueError(f"{store_dir} mixes F0 methods {methods}; rebuild it with one --f0-method")
+    keys = [_row_key(row.path, row.size, row.mtime_ns) for row in index.itertuples(index=False)]
+    return keys, features.astype(np.float64), index['label'].to_numpy().astype(np.int8), (methods or [None])[0]
+
+
+def build_reference_index(store_dir, index_dir=INDEX_DIR, refit=False):
+    """
+    Build or update the reference index from a batch_extract store.
+
+    New references are standardized with the stored mean/scale, assigned to
+    the stored partition and appended. The whole index is rebuilt (and
+    refit) when stored references changed or disappeared, the feature version
+    or F0 method differs, the corpus has grown REFIT_GROWTH-fold since the last
+    fit, or refit is set.
+
+    Returns:
+        dict: The index metadata.
+    """
+    keys, features, labels, f0_method = _reference_rows(store_dir)
+    if not keys:
+        raise ValueError(f"No labelled recordings in {store_dir}; run batch_extract.py first")
+    meta = _read_meta(index_dir)
+    positions = {key: i for i, key in enumerate(keys)}
+
+    if meta is not None and 'generation' not in meta:
+        meta = None  # written before data files were versioned
+    indexed = []
+    if meta is not None:
+        with open(data_path(index_dir, meta, ROWS_FILE)) as f:
+            indexed = f.read().splitlines()[:meta['count']]
+    reusable = (
+        not refit and meta is not None
+        and meta['version'] == FEATURE_EXTRACTOR_VERSION and meta['feature_names'] == list(FEATURE_NAMES)
+        and meta['f0_method'] == f0_method and all(key in positions for key in indexed)
+        and len(keys) < REFIT_GROWTH * meta['fit_count']
+        and (meta['centroids'] is not None or len(keys) < IVF_MIN_ROWS)
+    )
+    os.makedirs(index_dir, exist_ok=True)
+    if reusable:
+        seen = set(indexed)
+        new = [positions[key] for key in keys if key not in seen]
+        print(f"{len(indexed)} references indexed, {len(new)} to add")
+        meta = _append_rows(index_dir, meta, [keys[i] for i in new], features[new], labels[new])
+    else:
+        print(f"Indexing {len(keys)} references from scratch")
+        generation = 1 if meta is None else meta['generation'] + 1
+        meta = _write_index(index_dir, generation, keys, features, labels, f0_method)
+    return meta
+
+
+def _write_index(index_dir, generation, keys, features, labels, f0_method):
+    mean = features.mean(axis=0)
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1.0
+    vectors = ((features - mean) / scale).astype(np.float32)
+    centroids = None
+    lists = np.zeros(len(vectors), dtype=np.int32)
+    if len(vectors) >= IVF_MIN_ROWS:
+        centroids = kmeans(vectors, int(round(np.sqrt(len(vectors)))))
+        lists = assign_lists(vectors, centroids)
+
+    meta = {
+        'generation': generation,
+        'version': FEATURE_EXTRACTOR_VERSION,
+        'feature_names': list(FEATURE_NAMES),
+        'f0_method': f0_method,
+        'count': len(vectors),
+        'fit_count': len(vectors),
+        'mean': mean.tolist(),
+        'scale': scale.tolist(),
+        'centroids': None if centroids is None else centroids.tolist(),
+    }
+    _write_atomic(data_path(index_dir, meta, VECTORS_FILE), lambda f: f.write(vectors.tobytes()))
+    _write_atomic(data_path(index_dir, meta, LABELS_FILE), lambda f: f.write(labels.astype(np.int8).tobytes()))
+    _write_atomic(data_path(index_dir, meta, LISTS_FILE), lambda f: f.write(lists.tobytes()))
+    previous = _read_meta(index_dir)
+    meta = _commit(index_dir, meta, keys)
+    _remove_old_generations(index_dir, keep={generation, previous and previous.get('generation')})
+    return meta
+
+
+def _remove_old_generations(index_dir, keep):
+    """
+    Delete the data files of every generation not in keep: the new one and the one meta.json
+    named until now, whose files a reader may still be opening. Mapped files stay readable.
+    """
+    names = {name.format(generation) for name in DATA_FILES for generation in keep if generation is not None}
+    # Also matches the unversioned rows.tsv, vectors.f32, ... of indexes built before generations
+    prefixes = tuple(name.split('-')[0] for name in DATA_FILES)
+    for name in os.listdir(index_dir):
+        if name.startswith(prefixes) and name not in names:
+            os.remove(os.path.join(index_dir, name))
+
+
+def _append_rows(index_dir, meta, keys, features, labels):
+    count = meta['count']
+    if keys:
+        vectors = ((features - np.array(meta['mean'])) / np.array(meta['scale'])).astype(np.float32)
+        lists = (np.zeros(len(vectors), dtype=np.int32) if meta['centroids'] is None
+                 else assign_lists(vectors, np.array(meta['centroids'], dtype=np.float32)))
+        # Bytes past `count` rows are left over from an interrupted build; readers never map them
+        for name, rows, row_bytes in ((VECTORS_FILE, vectors, 4 * len(FEATURE_NAMES)),
+                                      (LABELS_FILE, labels.astype(np.int8), 1), (LISTS_FILE, lists, 4)):
+            with open(data_path(index_dir, meta, name), 'r+b') as f:
+                f.truncate(count * row_bytes)
+                f.seek(0, os.SEEK_END)
+                f.write(rows.tobytes())
+    with open(data_path(index_dir, meta, ROWS_FILE)) as f:
+        indexed = f.read().splitlines()[:count]
+    meta = dict(meta, count=count + len(keys))
+    return _commit(index_dir, meta, indexed + keys)
+
+
+def _commit(index_dir, meta, keys):
+    # meta.json is replaced last: readers only map the rows it counts, so the rows file of an
+    # append (the same rows plus new ones) is safe to replace first
+    _write_atomic(data_path(index_dir, meta, ROWS_FILE),
+                  lambda f: f.write(''.join(k + '\n' for k in keys).encode()))
+    _write_atomic(os.path.join(index_dir, META_FILE), lambda f: f.write(json.dumps(meta).encode()))
+    return meta
+
+
+class ReferenceIndex:
+    """
+    k-nearest-neighbour search over the standardized features of labelled recordings.
+
+    The vectors are memory-mapped, so opening is cheap and pre-forked server
+    workers share one copy through the page cache. Exact search is a single
+    matrix-vector product over all references; 'ivf' only scans the partition
+    cells closest to the query.
+
+    Parameters:
+        index_dir (str): Directory written by build_reference_index.
+        k (int): Neighbours reported by assess().
+        method (str): Search used by assess(), one of SEARCH_METHODS.
+        nprobe (int): Partition cells scanned by 'ivf' search.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR, k=DEFAULT_K, method='auto', nprobe=DEFAULT_NPROBE):
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search method '{method}', expected one of {SEARCH_METHODS}")
+        self.k = k
+        self.method = method
+        self.nprobe = nprobe
+        meta = _read_meta(index_dir)
+        if meta is None or 'generation' not in meta:
+            raise FileNotFoundError(f"No reference index in {index_dir}")
+        self.meta = meta
+        self.count = meta['count']
+        self.f0_method = meta['f0_method']
+        self.mean = np.array(meta['mean'], dtype=np.float32)
+        self.scale = np.array(meta['scale'], dtype=np.float32)
+        self.centroids = None if meta['centroids'] is None else np.array(meta['centroids'], dtype=np.float32)
+        n_features = len(meta['feature_names'])
+        self.vectors = np.memmap(data_path(index_dir, meta, VECTORS_FILE), dtype=np.float32, mode='r',
+                                 shape=(self.count, n_features))
+        self.labels = np.memmap(data_path(index_dir, meta, LABELS_FILE), dtype=np.int8, mode='r',
+                                shape=(self.count,))
+        self.lists = np.memmap(data_path(index_dir, meta, LISTS_FILE), dtype=np.int32, mode='r',
+                               shape=(self.count,))
+        with open(data_path(index_dir, meta, ROWS_FILE)) as f:
+            self.paths = [line.split('\t', 1)[0] for line in f.read().splitlines()[:self.count]]
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self._cells = None
+
+    def __len__(self):
+        return self.count
+
+    def standardize(self, features):
+        """Feature dict, vector or N x 22 matrix -> standardized float32 rows."""
+        if isinstance(features, dict):
+            features = features_to_vector(features)
+        return ((np.asarray(features, dtype=np.float32) - self.mean) / self.scale).astype(np.float32)
+
+    def search(self, features, k=DEFAULT_K, method='auto', nprobe=DEFAULT_NPROBE):
+        """
+        The k references closest to one recording's features.
+
+        Returns:
+            tuple: (row numbers, Euclidean distances in standardized units), nearest first.
+        """
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search method '{method}', expected one of {SEARCH_METHODS}")
+        query = self.standardize(features).ravel()
+        if method == 'auto':
+            method = 'ivf' if self.centroids is not None and self.count >= AUTO_IVF_ROWS else 'exact'
+        if method == 'ivf' and self.centroids is not None:
+            rows = self._candidates(query, nprobe)
+            distances = self.norms[rows] - 2 * (self.vectors[rows] @ query)
+        else:
+            rows = None
+            distances = self.norms - 2 * (self.vectors @ query)
+        # Ranking by |v|^2 - 2 v.q (|q|^2 is the same for every row) is one product over the references;
+        # the winners' distances are then recomputed directly, free of the expansion's rounding
+        k = min(k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(k)
+        if rows is not None:
+            nearest = rows[nearest]
+        exact = np.linalg.norm(self.vectors[nearest] - query, axis=1)
+        order = np.argsort(exact, kind='stable')
+        return nearest[order], exact[order]
+
+    def _candidates(self, query, nprobe):
+        if self._cells is None:
+            # Rows grouped by cell, and where each cell's rows start
+            order = np.argsort(self.lists, kind='stable')
+            self._cells = order, np.searchsorted(self.lists[order], np.arange(len(self.centroids) + 1))
+        order, offsets = self._cells
+        distances = np.einsum('ij,ij->i', self.centroids, self.centroids) - 2 * self.centroids @ query
+        probe = np.argsort(distances)[:nprobe]
+        return np.concatenate([order[offsets[cell]:offsets[cell + 1]] for cell in probe])
+
+    def assess(self, features):
+        """
+        The k nearest labelled recordings and the share of them with Parkinson's, for voice results;
+        None when a feature is NaN or infinite, since every distance would be NaN.
+        """
+        if not np.isfinite(self.standardize(features)).all():
+            return None
+        with stage('voice.reference_knn'):
+            rows, distances = self.search(features, k=self.k, method=self.method, nprobe=self.nprobe)
+        labels = [int(self.labels[row]) for row in rows]
+        pd_fraction = float(np.mean([label == 1 for label in labels])) if labels else 0.0
+        return {
+            'prediction': "Yes" if pd_fraction > 0.5 else "No",
+            'pd_fraction': pd_fraction,
+            'neighbours': [
+                {'recording': os.path.basename(self.paths[row]), 'label': LABEL_NAMES.get(label, str(label)),
+                 'distance': float(distance)}
+                for row, label, distance in zip(rows, labels, distances)
+            ],
+        }
+
+
+def load_reference_index(index_dir=INDEX_DIR, f0_method=None, **search):
+    """
+    Open the index for queries, or return None (with a warning) when it is missing or stale.
+    search holds ReferenceIndex's k, method and nprobe.
+    """
+    meta = _read_meta(index_dir) if index_dir else None
+    if meta is None:
+        return None
+    if 'generation' not in meta:
+        print(f"Warning: reference index in {index_dir} has an old layout, ignoring it; rerun reference_index.py")
+        return None
+    index = ReferenceIndex(index_dir, **search)
+    if index.meta['version'] != FEATURE_EXTRACTOR_VERSION or index.meta['feature_names'] != list(FEATURE_NAMES):
+        print(f"Warning: reference index in {index_dir} was built by another feature version, ignoring it; "
+              f"rerun batch_extract.py and reference_index.py")
+        return None
+    if f0_method and index.f0_method != f0_method:
+        print(f"Warning: reference index uses {index.f0_method} pitch tracking, queries use {f0_method}")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the voice reference index from a batch_extract store.")
+    parser.add_argument('--store', default='voice_features', help="Feature store written by batch_extract.py")
+    parser.add_argument('--index', default=INDEX_DIR, help="Output directory for the index")
+    parser.add_argument('--refit', action='store_true', help="Rebuild and refit even if rows could be appended")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    meta = build_reference_index(args.store, args.index, refit=args.refit)
+    cells = 'exact search only' if meta['centroids'] is None else f"{len(meta['centroids'])} partition cells"
+    print(f"{meta['count']} references in {args.index} ({cells}) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_extract import INDEX_COLUMNS, assess_store, load_store, save_store
+from reference_index import DEFAULT_K, DEFAULT_NPROBE, ReferenceIndex, build_reference_index
+from voice_extraction import FEATURE_DTYPE, FEATURE_EXTRACTOR_VERSION
+
+
+def leave_one_out(store_dir, index_dir, k):
+    """Accuracy of the k-NN vote over the labelled corpus, each recording left out of its own neighbours."""
+    index, features = load_store(store_dir)
+    reference = ReferenceIndex(index_dir)
+    correct = 0
+    for i in range(len(features)):
+        rows, _ = reference.search(features[i], k=k + 1, method='exact')
+        neighbours = [r for r in rows if reference.paths[r] != index['path'].iloc[i]][:k]
+        correct += (reference.labels[neighbours].mean() > 0.5) == (index['label'].iloc[i] == 1)
+    return correct / len(features)
+
+
+def synthetic_references(features, labels, n):
+    """Store index and features of n references drawn around the real ones, standing in for a grown corpus."""
+    rng = np.random.default_rng(n)
+    picks = rng.integers(len(features), size=n)
+    noise = rng.standard_normal((n, features.shape[1])) * 0.25 * features.std(axis=0)
+    matrix = (features[picks] + noise).astype(FEATURE_DTYPE)
+    index = pd.DataFrame({
+        'path': [f'synthetic/{i:07d}.wav' for i in range(n)], 'size': 0, 'mtime_ns': 0, 'sha256': '',
+        'label': labels[picks], 'f0_method': 'pyin', 'version': FEATURE_EXTRACTOR_VERSION,
+    }, columns=INDEX_COLUMNS)
+    return index, matrix
+
+
+def time_queries(reference, queries, method, nprobe, k):
+    start = time.perf_counter()
+    found = [set(reference.search(query, k=k, method=method, nprobe=nprobe)[0]) for query in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reference index accuracy, query latency and approximate recall.")
+    parser.add_argument('--store', default='voice_features', help="Feature store written by batch_extract.py")
+    parser.add_argument('--sizes', default='1000,10000,50000,200000', help="Synthetic corpus sizes")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE)
+    args = parser.parse_args()
+
+    index, features = load_store(args.store)
+    labelled = index['label'].to_numpy() >= 0
+    if not labelled.any():
+        raise SystemExit(f"No labelled recordings in {args.store}; run batch_extract.py first")
+    with tempfile.TemporaryDirectory() as tmp:
+        build_reference_index(args.store, os.path.join(tmp, 'index'))
+        rules = assess_store(args.store)
+        rules_accuracy = ((rules['prediction'] == "Yes") == (rules['label'] == 1))[labelled].mean()
+        print(f"{labelled.sum()} labelled recordings: leave-one-out {args.k}-NN accuracy "
+              f"{leave_one_out(args.store, os.path.join(tmp, 'index'), args.k):.3f}, risk rules {rules_accuracy:.3f}")
+        print("-" * 72)
+        print(f"{'references':>11}{'build s':>9}{'exact ms':>10}{'ivf ms':>9}{'recall@k':>10}{'append 1% s':>13}")
+
+        for n in [int(size) for size in args.sizes.split(',') if size]:
+            store_dir, index_dir = os.path.join(tmp, f'store{n}'), os.path.join(tmp, f'index{n}')
+            grown_index, grown = synthetic_references(features[labelled], index['label'].to_numpy()[labelled],
+                                                      n + n // 100)
+            matrix = grown[:n]
+            save_store(store_dir, grown_index.iloc[:n], matrix)
+            start = time.perf_counter()
+            build_reference_index(store_dir, index_dir)
+            build_seconds = time.perf_counter() - start
+            reference = ReferenceIndex(index_dir)
+            queries = matrix[np.random.default_rng(0).integers(n, size=args.queries)] * 1.01
+            exact_ms, exact = time_queries(reference, queries, 'exact', args.nprobe, args.k)
+            ivf_ms, approximate = time_queries(reference, queries, 'ivf', args.nprobe, args.k)
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(approximate, exact)])
+
+            # Incremental update: 1% more references are appended without a refit
+            save_store(store_dir, grown_index, grown)
+            start = time.perf_counter()
+            build_reference_index(store_dir, index_dir)
+            append_seconds = time.perf_counter() - start
+            assert len(ReferenceIndex(index_dir)) == len(grown)
+            print(f"{n:>11}{build_seconds:>9.2f}{exact_ms:>10.3f}{ivf_ms:>9.3f}{recall:>10.3f}{append_seconds:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(data, version):
+    """Hash uploaded bytes together with the version of whatever produced the result."""
+    digest = hashlib.sha256()
+    digest.update(version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for per-modality analysis results.
+
+    The memory tier is an LRU bounded by max_entries. The optional disk tier
+    stores one JSON file per key under disk_dir so results survive restarts.
+    Both tiers drop entries older than ttl_seconds. Values must be JSON
+    serializable.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_dir=None):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl_seconds)
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    def get(self, key):
+        """Return the cached value for key, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return value
+                del self._entries[key]
+                self._counters['expirations'] += 1
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._store(key, entry)
+        return entry[1]
+
+    def __contains__(self, key):
+        """Whether get(key) would hit, without counting a lookup or reading the disk entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                return True
+        if not self.disk_dir:
+            return False
+        try:
+            return now - os.path.getmtime(self._disk_path(key)) <= self.ttl
+        except OSError:
+            return False
+
+    def set(self, key, value):
+        entry = (time.time(), value)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl
+        stats['disk_enabled'] = bool(self.disk_dir)
+        return stats
+
+    def _store(self, key, entry):
+        """Insert into the memory tier; caller holds the lock."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                record = json.load(f)
+            stored_at, value = float(record['stored_at']), record['value']
+        except OSError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            # Truncated or foreign file: treat as a miss and let the next set() replace it
+            return None
+        if now - stored_at > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self._counters['expirations'] += 1
+            return None
+        return stored_at, value
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'stored_at': entry[0], 'value': entry[1]}, f)
+            # The mtime mirrors stored_at so membership checks need not parse the file
+            os.utime(tmp_path, (entry[0], entry[0]))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing cache entry {key}: {str(e)}")
@@ -0,0 +1,84 @@
+import os
+import sys
+
+# Thread-pool sizes that native libraries read once, when they are first loaded
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                   'NUMEXPR_NUM_THREADS', 'NUMBA_NUM_THREADS', 'HANDWRITING_NUM_THREADS')
+# Each worker serves this many requests at once (gthread); the analysis itself is bounded by the native threads
+DEFAULT_REQUEST_THREADS = 4
+
+
+def available_cpus():
+    """CPUs this process may run on: the affinity mask, capped by a cgroup v2 CPU quota (containers)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def worker_plan(cpus=None):
+    """
+    Default process/thread layout of the production server, sized so that
+    workers x native threads per worker equals the available cores.
+
+    One native thread per worker on small machines, where parallel requests
+    scale better than wider forward passes; two per worker from 8 cores on,
+    which halves the memory spent on worker processes. WEB_CONCURRENCY,
+    SERVING_THREADS_PER_WORKER and SERVING_REQUEST_THREADS override each part.
+
+    Returns:
+        dict: cpus, workers, threads_per_worker (native intra-op threads) and request_threads.
+    """
+    cpus = cpus or available_cpus()
+    threads = _env_int('SERVING_THREADS_PER_WORKER') or (2 if cpus >= 8 else 1)
+    return {
+        'cpus': cpus,
+        'workers': _env_int('WEB_CONCURRENCY') or max(1, cpus // threads),
+        'threads_per_worker': threads,
+        'request_threads': _env_int('SERVING_REQUEST_THREADS') or DEFAULT_REQUEST_THREADS,
+    }
+
+
+def set_thread_env(threads):
+    """Size native thread pools that are not created yet; explicit settings in the environment win."""
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(threads))
+
+
+def limit_threads(threads):
+    """
+    Cap the thread pools of libraries already loaded in this process (BLAS,
+    OpenMP, torch, numba); meant for each worker right after fork.
+    """
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(threads)
+    if 'torch' in sys.modules:
+        import torch
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(threads)
+        except RuntimeError:
+            # Only settable before the first inter-op parallel work in this process
+            pass
+    if 'numba' in sys.modules:
+        import numba
+        numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+
+
+if __name__ == "__main__":
+    plan = worker_plan()
+    print(f"{plan['cpus']} CPUs available: {plan['workers']} workers x {plan['threads_per_worker']} native "
+          f"thread(s), {plan['request_threads']} request threads each")
@@ -0,0 +1,141 @@
+import argparse
+import glob
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from serving import worker_plan
+
+READY_TIMEOUT_SECONDS = 300
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, port, env_overrides):
+    """Start gunicorn with gunicorn.conf.py and `workers` workers; returns the process once it serves."""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), RESULT_CACHE_MAX_ENTRIES='0', **env_overrides)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    # /ready is answered by whichever worker accepts; require a run of ready answers
+    deadline = time.time() + READY_TIMEOUT_SECONDS
+    streak = 0
+    while time.time() < deadline and streak < 2 * workers:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during start-up")
+        try:
+            state = requests.get(f'http://127.0.0.1:{port}/ready', timeout=5).json()['state']
+            # A failed model load still serves voice analysis
+            streak = streak + 1 if state in ('ready', 'failed') else 0
+        except requests.RequestException:
+            streak = 0
+        time.sleep(0.2)
+    if streak < 2 * workers:
+        stop_server(process)
+        raise TimeoutError(f"Server with {workers} workers did not become ready")
+    return process
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_load(port, uploads, concurrency, n_requests):
+    """Send n_requests /analyze requests from `concurrency` clients; returns req/s, latencies and errors."""
+    url = f'http://127.0.0.1:{port}/analyze'
+
+    def send(i):
+        files = {name: (os.path.basename(path), data) for name, (path, data) in uploads[i % len(uploads)].items()}
+        start = time.perf_counter()
+        try:
+            ok = requests.post(url, files=files, timeout=300).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(concurrency)))  # let every worker finish its warm-up
+        start = time.perf_counter()
+        results = list(executor.map(send, range(n_requests)))
+        elapsed = time.perf_counter() - start
+    latencies = [ms for ms, _ in results]
+    return {
+        'requests_per_s': n_requests / elapsed,
+        'p50_ms': float(np.median(latencies)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'errors': sum(not ok for _, ok in results),
+    }
+
+
+def load_uploads(voice_dir, image_dir, with_handwriting, limit):
+    def read(path):
+        with open(path, 'rb') as f:
+            return path, f.read()
+
+    voices = sorted(glob.glob(os.path.join(voice_dir, '*', '*.wav')))[:limit]
+    images = sorted(glob.glob(os.path.join(image_dir, '**', '*.png'), recursive=True))[:limit]
+    if not voices:
+        raise FileNotFoundError(f"No WAV files found under {voice_dir}")
+    uploads = []
+    for i, voice in enumerate(voices):
+        upload = {'voice': read(voice)}
+        if with_handwriting and images:
+            upload['handwriting'] = read(images[i % len(images)])
+        uploads.append(upload)
+    return uploads
+
+
+def main():
+    plan = worker_plan()
+    default_levels = sorted({1} | {2 ** i for i in range(8) if 2 ** i <= plan['workers']} | {plan['workers']})
+    parser = argparse.ArgumentParser(description="/analyze throughput of the gunicorn server with 1..N workers.")
+    parser.add_argument('--workers', default=','.join(map(str, default_levels)))
+    parser.add_argument('--requests', type=int, default=48, help="Requests per worker count")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help="Concurrent clients (default: twice the largest worker count)")
+    parser.add_argument('--handwriting', action='store_true', help="Send a handwriting image with every voice file")
+    parser.add_argument('--f0-method', default='yin', help="VOICE_F0_METHOD of the server")
+    parser.add_argument('--voice-dir', default=os.path.join('data', 'voice_data'))
+    parser.add_argument('--image-dir', default=os.path.join('data', 'image_data'))
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.workers.split(',') if level]
+    concurrency = args.concurrency or 2 * max(levels)
+    uploads = load_uploads(args.voice_dir, args.image_dir, args.handwriting, limit=args.requests)
+
+    print(f"{plan['cpus']} CPUs, {plan['threads_per_worker']} native thread(s) per worker, "
+          f"{concurrency} clients, {args.requests} requests per run")
+    print("-" * 72)
+    print(f"{'workers':>8}{'req/s':>10}{'speedup':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    base = None
+    for level in levels:
+        port = free_port()
+        process = start_server(level, port, {'VOICE_F0_METHOD': args.f0_method})
+        try:
+            stats = run_load(port, uploads, concurrency, args.requests)
+        finally:
+            stop_server(process)
+        base = base or stats['requests_per_s']
+        print(f"{level:>8}{stats['requests_per_s']:>10.2f}{stats['requests_per_s'] / base:>9.2f}x"
+              f"{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}{stats['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,14 @@ document.addEventListener('DOMContentLoaded', function() {
     let isRecording = false;
     let voiceFile = null;
     let handwritingFile = null;
+    // Id of the server-side stream that already analyzed the recorded voiceFile
+    let voiceStreamId = null;
 
     // File upload handling
     function handleFileUpload(file, type) {
         if (type === 'voice') {
             voiceFile = file;
+            voiceStreamId = null;
             voiceFileName.textContent = file.name;
         } else {
             handwritingFile = file;
@@ -61,64 +64,179 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
-    // Record functionality
+    // Record functionality: the microphone is streamed to the server while recording,
+    // so the voice analysis is ready right after the last chunk
     recordBtn.addEventListener('click', async () => {
         if (isRecording) return;
     
+        let stream;
         try {
-            const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-            const mediaRecorder = new MediaRecorder(stream, {
-                mimeType: 'audio/webm' // Change to WebM format
-            });
-            const chunks = [];
-    
-            mediaRecorder.ondataavailable = (e) => chunks.push(e.data);
-            mediaRecorder.onstop = async () => {
-                // Create WebM blob
-                const webmBlob = new Blob(chunks, { type: 'audio/webm' });
-                
-                // Convert WebM to WAV using FFmpeg.wasm or audio context
-                const audioContext = new (window.AudioContext || window.webkitAudioContext)();
-                const audioBuffer = await audioContext.decodeAudioData(await webmBlob.arrayBuffer());
-                
-                // Create WAV file
-                const wavBlob = await convertToWav(audioBuffer);
-                const file = new File([wavBlob], 'recorded_audio.wav', { type: 'audio/wav' });
-                handleFileUpload(file, 'voice');
-                isRecording = false;
-                recordBtn.textContent = 'Record Voice (5s)';
-            };
-    
-            mediaRecorder.start();
-            isRecording = true;
-            recordBtn.textContent = 'Recording...';
-    
-            setTimeout(() => {
-                mediaRecorder.stop();
-                stream.getTracks().forEach(track => track.stop());
-            }, 5000);
+            stream = await navigator.mediaDevices.getUserMedia({ audio: true });
         } catch (err) {
             console.error('Error accessing microphone:', err);
             alert('Unable to access microphone. Please ensure you have granted permission.');
+            return;
         }
+
+        const audioContext = new (window.AudioContext || window.webkitAudioContext)();
+        const source = audioContext.createMediaStreamSource(stream);
+        const processor = audioContext.createScriptProcessor(4096, 1, 1);
+        const recorded = [];
+        // Without a stream the recording is still uploaded as a WAV file
+        const voiceStream = await openVoiceStream(audioContext.sampleRate).catch((err) => {
+            console.error('Voice streaming unavailable:', err);
+            return null;
+        });
+
+        processor.onaudioprocess = (e) => {
+            const samples = new Float32Array(e.inputBuffer.getChannelData(0));
+            recorded.push(samples);
+            if (voiceStream) voiceStream.push(samples);
+        };
+        source.connect(processor);
+        processor.connect(audioContext.destination);
+        isRecording = true;
+        recordBtn.textContent = 'Recording...';
+
+        setTimeout(async () => {
+            processor.disconnect();
+            source.disconnect();
+            stream.getTracks().forEach(track => track.stop());
+
+            // Keep a WAV copy of the recording
+            const length = recorded.reduce((total, samples) => total + samples.length, 0);
+            const audioBuffer = audioContext.createBuffer(1, length, audioContext.sampleRate);
+            let offset = 0;
+            recorded.forEach(samples => {
+                audioBuffer.copyToChannel(samples, 0, offset);
+                offset += samples.length;
+            });
+            const wavBlob = await convertToWav(audioBuffer);
+            audioContext.close();
+            handleFileUpload(new File([wavBlob], 'recorded_audio.wav', { type: 'audio/wav' }), 'voice');
+
+            if (voiceStream) {
+                try {
+                    const result = await voiceStream.finish();
+                    voiceStreamId = voiceStream.id;
+                    displayResults(result);
+                } catch (err) {
+                    console.error('Streaming analysis failed, the file will be uploaded instead:', err);
+                }
+            }
+            isRecording = false;
+            recordBtn.textContent = 'Record Voice (5s)';
+        }, 5000);
     });
 
+    // Open a streaming voice analysis; chunks are sent in order, coalescing whatever
+    // was captured while the previous request was in flight
+    async function openVoiceStream(sampleRate) {
+        const response = await fetch('/stream/voice', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ sample_rate: sampleRate })
+        });
+        if (!response.ok) {
+            throw new Error(`Stream creation failed with status ${response.status}`);
+        }
+        const info = await response.json();
+
+        let pending = [];
+        let seq = 0;
+        let sending = Promise.resolve();
+        let failed = null;
+
+        async function sendPending() {
+            if (pending.length === 0 || failed) return;
+            const length = pending.reduce((total, samples) => total + samples.length, 0);
+            const body = new Float32Array(length);
+            let offset = 0;
+            pending.forEach(samples => {
+                body.set(samples, offset);
+                offset += samples.length;
+            });
+            pending = [];
+
+            const chunkResponse = await fetch(`${info.chunk_url}?seq=${seq++}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: body.buffer
+            });
+            if (!chunkResponse.ok) {
+                failed = new Error(`Chunk upload failed with status ${chunkResponse.status}`);
+                return;
+            }
+            const stats = await chunkResponse.json();
+            if (stats.f0_hz) {
+                voiceFileName.textContent = `Listening... ${stats.seconds.toFixed(1)}s, F0 ${stats.f0_hz.toFixed(0)} Hz`;
+            }
+        }
+
+        return {
+            id: info.stream_id,
+            push(samples) {
+                pending.push(samples);
+                sending = sending.then(sendPending);
+            },
+            async finish() {
+                await sending;
+                await sendPending();
+                if (failed) throw failed;
+                const finishResponse = await fetch(info.finish_url, { method: 'POST' });
+                if (!finishResponse.ok) {
+                    throw new Error(`Stream finish failed with status ${finishResponse.status}`);
+                }
+                return finishResponse.json();
+            }
+        };
+    }
+
     // Analysis handling
-    analyzeBtn.addEventListener('click', async () => {
+    // Job error for a voice_stream the server no longer holds (idle past its TTL, or another worker)
+    const EXPIRED_STREAM_ERROR = 'Unknown or expired voice stream';
+
+    function analysisForm(useStream) {
         const formData = new FormData();
-        if (voiceFile) formData.append('voice', voiceFile);
+        if (useStream) {
+            // The recording was already analyzed while it was being captured
+            formData.append('voice_stream', voiceStreamId);
+        } else if (voiceFile) {
+            formData.append('voice', voiceFile);
+        }
         if (handwritingFile) formData.append('handwriting', handwritingFile);
+        return formData;
+    }
 
+    async function runJob(formData) {
+        const response = await fetch('/jobs', {
+            method: 'POST',
+            body: formData
+        });
+        if (!response.ok) {
+            throw new Error(`Job submission failed with status ${response.status}`);
+        }
+
+        const job = await response.json();
+        return pollJob(job.status_url);
+    }
+
+    analyzeBtn.addEventListener('click', async () => {
         try {
             analyzeBtn.disabled = true;
             analyzeBtn.textContent = 'Analyzing...';
 
-            const response = await fetch('/analyze', {
-                method: 'POST',
-                body: formData
-            });
-
-            const results = await response.json();
+            let results;
+            try {
+                results = await runJob(analysisForm(Boolean(voiceStreamId)));
+            } catch (err) {
+                const streamLost = voiceStreamId && voiceFile && err.jobErrors
+                    && err.jobErrors.voice_analysis === EXPIRED_STREAM_ERROR;
+                if (!streamLost) throw err;
+                // Fall back to uploading the WAV copy of the recording
+                voiceStreamId = null;
+                results = await runJob(analysisForm(false));
+            }
             displayResults(results);
         } catch (err) {
             console.error('Analysis error:', err);
@@ -129,6 +247,31 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // Long-poll a job, showing each modality's result as soon as it is ready
+    async function pollJob(statusUrl) {
+        let since = 0;
+        while (true) {
+            const params = new URLSearchParams({ wait: 20, since: since });
+
+            const response = await fetch(`${statusUrl}?${params}`);
+            if (!response.ok) {
+                throw new Error(`Job status request failed with status ${response.status}`);
+            }
+
+            const job = await response.json();
+            since = job.updated;
+            if (job.status === 'done') {
+                return job.results;
+            }
+            if (job.status === 'error') {
+                const error = new Error(Object.values(job.errors).join('; '));
+                error.jobErrors = job.errors;
+                throw error;
+            }
+            displayResults(job.results);
+        }
+    }
+
     function displayResults(results) {
         const resultsSection = document.getElementById('results');
         resultsSection.innerHTML = '';
@@ -174,6 +317,14 @@ document.addEventListener('DOMContentLoaded', function() {
                     </ul>
                 </div>
             `;
+            if (data.reference) {
+                const pd = data.reference.neighbours.filter(n => n.label === 'PD').length;
+                content += `
+                <div class="reference">
+                    Most similar recordings: ${pd}/${data.reference.neighbours.length} with Parkinson's
+                </div>
+            `;
+            }
         } else {
             content += `
                 <div class="prediction ${data.prediction === 'Yes' ? 'positive' : 'negative'}">
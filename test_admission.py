@@ -0,0 +1,170 @@
+import glob
+import importlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from admission import AdmissionController, DeadlineExceeded, Overloaded, deadline
+from analysis_engine import AnalysisEngine
+from batching import MicroBatcher
+from metrics import stage
+from result_cache import ResultCache
+from voice_extraction import AudioDecodeError, extract_features
+
+VOICE_FILES = sorted(glob.glob(os.path.join("data", "voice_data", "*", "*.wav")))
+
+
+def hold_slot(controller, release):
+    entered = threading.Event()
+
+    def run():
+        with controller.admit():
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert entered.wait(5)
+    return thread
+
+
+def test_rejects_when_queue_is_full():
+    controller = AdmissionController('test', max_in_flight=1, max_queue=0)
+    release = threading.Event()
+    thread = hold_slot(controller, release)
+    with pytest.raises(Overloaded) as e:
+        with controller.admit():
+            pass
+    release.set()
+    thread.join()
+    assert e.value.reason == 'queue_full' and 1 <= e.value.retry_after <= 60
+    assert controller.stats()['rejected_queue_full'] == 1
+    with controller.admit():
+        assert controller.stats()['in_flight'] == 1
+
+
+def test_queued_request_times_out():
+    controller = AdmissionController('test', max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    release = threading.Event()
+    thread = hold_slot(controller, release)
+    start = time.monotonic()
+    with pytest.raises(Overloaded) as e:
+        with controller.admit():
+            pass
+    release.set()
+    thread.join()
+    assert e.value.reason == 'timeout' and time.monotonic() - start < 1
+    assert controller.stats()['queued'] == 0
+
+
+def test_expired_deadline_stops_engine_stages():
+    started = []
+
+    def analyze_voice(value):
+        time.sleep(0.05)
+        with stage('test.late_stage'):
+            started.append(value)
+
+    engine = AnalysisEngine(analyze_voice, lambda value: None)
+    with deadline(0.01):
+        with pytest.raises(DeadlineExceeded) as e:
+            engine.run(voice_input='clip')
+    assert e.value.stage == 'test.late_stage' and not started
+    # Outside the deadline's context the stage runs normally
+    engine.run(voice_input='clip')
+    assert started == ['clip']
+
+
+def test_batcher_drops_items_of_callers_that_gave_up():
+    release = threading.Event()
+    batches = []
+
+    def predict(items):
+        release.wait(5)
+        batches.append(items)
+        return items
+
+    batcher = MicroBatcher(predict, max_batch_size=1, max_wait_ms=0)
+    first = threading.Thread(target=batcher.submit, args=('running',))
+    first.start()
+    time.sleep(0.05)
+    with pytest.raises(FutureTimeoutError):
+        batcher.submit('abandoned', timeout=0.05)
+    release.set()
+    first.join()
+    assert batcher.submit('next', timeout=5) == 'next'
+    assert batches == [['running'], ['next']]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('WARMUP_ON_STARTUP', '0')
+    monkeypatch.setenv('REFERENCE_INDEX_DIR', '')
+    app = importlib.import_module('app')
+    monkeypatch.setattr(app, 'result_cache', ResultCache())
+    return app.app.test_client()
+
+
+def post_voice(client, data, **headers):
+    return client.post('/analyze', data={'voice': (io.BytesIO(data), 'clip.wav')},
+                       content_type='multipart/form-data', headers=headers)
+
+
+def test_expired_deadline_is_not_mistaken_for_a_decoding_failure():
+    with deadline(1e-9):
+        time.sleep(0.001)
+        with pytest.raises(DeadlineExceeded):
+            extract_features(VOICE_FILES[0])
+    with pytest.raises(AudioDecodeError):
+        extract_features(b'not audio', strict=True)
+    assert set(extract_features(b'not audio').values()) == {0.0}
+
+
+@pytest.mark.skipif(not VOICE_FILES, reason="voice recordings not available")
+def test_retry_after_an_expired_deadline_is_analysed_afresh(client):
+    with open(VOICE_FILES[0], 'rb') as f:
+        data = f.read()
+    assert post_voice(client, data, **{'X-Request-Timeout': '0.000001'}).status_code == 504
+    retry = post_voice(client, data)
+    assert retry.status_code == 200
+    expected = importlib.import_module('app').assess_voice(extract_features(data))
+    assert retry.get_json()['voice_analysis']['risk_details'] == expected['risk_details']
+    # An undecodable upload is rejected rather than scored (and cached) as all-zero features
+    assert post_voice(client, b'not audio').status_code == 400
+
+
+@pytest.mark.skipif(not VOICE_FILES, reason="voice recordings not available")
+def test_analyze_waits_for_a_slot_before_using_engine_threads(client, monkeypatch):
+    app = importlib.import_module('app')
+    with open(VOICE_FILES[0], 'rb') as f:
+        data = f.read()
+    assert post_voice(client, data).status_code == 200
+    controller = AdmissionController('voice', max_in_flight=1, max_queue=1, queue_timeout=5)
+    monkeypatch.setattr(app, 'voice_admission', controller)
+    submitted = []
+    run = app.analysis_engine.run
+    monkeypatch.setattr(app.analysis_engine, 'run', lambda *args: submitted.append(args) or run(*args))
+
+    release = threading.Event()
+    holder = hold_slot(controller, release)
+    # A cached upload needs no slot
+    assert post_voice(client, data).status_code == 200
+    assert len(submitted) == 1
+
+    waiting = threading.Thread(target=post_voice, args=(app.app.test_client(), data[:-2]))
+    waiting.start()
+    deadline_at = time.monotonic() + 5
+    while controller.stats()['queued'] == 0 and time.monotonic() < deadline_at:
+        time.sleep(0.01)
+    assert controller.stats()['queued'] == 1
+    # The queued request holds no engine thread yet, and the queue limit still applies
+    assert len(submitted) == 1
+    assert post_voice(client, data[:-4]).status_code == 503
+    release.set()
+    holder.join()
+    waiting.join(30)
+    assert len(submitted) == 2
@@ -0,0 +1,102 @@
+import glob
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_extract
+from batch_extract import (FEATURES_FILE, INDEX_COLUMNS, INDEX_FILE, STORE_FILE, build_store, file_sha256,
+                           load_store, plan_work, save_store)
+from voice_extraction import FEATURE_EXTRACTOR_VERSION, FEATURE_NAMES, extract_features, features_to_vector
+
+VOICE_FILES = sorted(glob.glob(os.path.join("data", "voice_data", "*", "*.wav")))
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """Run extraction in-process and record which files were actually extracted."""
+    calls = []
+
+    def extract_row(file_path, f0_method):
+        calls.append(os.path.basename(file_path))
+        return features_to_vector(extract_features(file_path, f0_method=f0_method))
+
+    monkeypatch.setattr(batch_extract, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(batch_extract, '_extract_row', extract_row)
+    return calls
+
+
+@pytest.mark.skipif(len(VOICE_FILES) < 3, reason="voice recordings not available")
+def test_rerun_only_extracts_new_or_modified_files(tmp_path, extracted):
+    data_dir, store_dir = tmp_path / 'data' / 'PD_AH', str(tmp_path / 'store')
+    data_dir.mkdir(parents=True)
+    shutil.copy(VOICE_FILES[0], data_dir / 'a.wav')
+    shutil.copy(VOICE_FILES[1], data_dir / 'b.wav')
+
+    index, features = build_store(str(tmp_path / 'data'), store_dir, f0_method='yin', workers=1)
+    assert sorted(extracted) == ['a.wav', 'b.wav']
+    assert list(index['label']) == [1, 1]
+
+    extracted.clear()
+    build_store(str(tmp_path / 'data'), store_dir, f0_method='yin', workers=1)
+    assert extracted == []
+
+    # b.wav is replaced by another recording, c.wav is new
+    shutil.copy(VOICE_FILES[2], data_dir / 'b.wav')
+    os.utime(data_dir / 'b.wav', ns=(1, 1))
+    shutil.copy(VOICE_FILES[2], data_dir / 'c.wav')
+    rerun_index, rerun_features = build_store(str(tmp_path / 'data'), store_dir, f0_method='yin', workers=1)
+    assert sorted(extracted) == ['b.wav', 'c.wav']
+    assert [os.path.basename(path) for path in rerun_index['path']] == ['a.wav', 'b.wav', 'c.wav']
+    np.testing.assert_array_equal(rerun_features[0], features[0])
+    np.testing.assert_array_equal(rerun_features[1], rerun_features[2])
+    assert not np.array_equal(rerun_features[1], features[1])
+
+    stored_index, stored_features = load_store(store_dir)
+    assert list(stored_index['path']) == list(rerun_index['path'])
+    np.testing.assert_array_equal(stored_features, rerun_features)
+
+
+@pytest.mark.skipif(len(VOICE_FILES) < 1, reason="voice recordings not available")
+def test_other_f0_method_is_not_reused(tmp_path, extracted):
+    shutil.copy(VOICE_FILES[0], tmp_path / 'a.wav')
+    build_store(str(tmp_path), str(tmp_path / 'store'), f0_method='yin', workers=1)
+    index, _ = load_store(str(tmp_path / 'store'))
+    reuse, pending = plan_work([str(tmp_path / 'a.wav')], index, 'pyin')
+    assert (len(reuse), len(pending)) == (0, 1)
+    reuse, pending = plan_work([str(tmp_path / 'a.wav')], index, 'yin')
+    assert (len(reuse), len(pending)) == (1, 0)
+
+
+def test_touched_file_is_reused_by_content_hash(tmp_path):
+    path = str(tmp_path / 'a.wav')
+    (tmp_path / 'a.wav').write_bytes(b'RIFF')
+    index = pd.DataFrame([{
+        'path': path, 'size': 4, 'mtime_ns': 0, 'sha256': file_sha256(path), 'label': -1,
+        'f0_method': 'yin', 'version': FEATURE_EXTRACTOR_VERSION,
+    }], columns=INDEX_COLUMNS)
+    assert len(plan_work([path], index, 'yin')[1]) == 1
+    assert len(plan_work([path], index, 'yin', use_hash=True)[0]) == 1
+
+
+def test_store_written_in_the_old_layout_is_read_and_replaced(tmp_path):
+    index = pd.DataFrame([{
+        'path': 'a.wav', 'size': 4, 'mtime_ns': 7, 'sha256': '', 'label': 1,
+        'f0_method': 'yin', 'version': FEATURE_EXTRACTOR_VERSION,
+    }], columns=INDEX_COLUMNS)
+    features = np.arange(len(FEATURE_NAMES), dtype=np.float64).reshape(1, -1)
+    index.to_csv(tmp_path / INDEX_FILE, index=False)
+    np.save(tmp_path / FEATURES_FILE, features)
+
+    legacy_index, legacy_features = load_store(str(tmp_path))
+    save_store(str(tmp_path), legacy_index, legacy_features)
+    assert sorted(os.listdir(tmp_path)) == [STORE_FILE]
+
+    # A leftover from an interrupted save is ignored
+    (tmp_path / (STORE_FILE + '.tmp')).write_bytes(b'partial')
+    stored_index, stored_features = load_store(str(tmp_path))
+    assert stored_index.to_dict('records') == index.fillna('').to_dict('records')
+    np.testing.assert_array_equal(stored_features, features)
@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import pytest
+
+from batching import MicroBatcher
+
+
+class FakeClassifier:
+    """Records every batch it is handed and labels each item by its batch number."""
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, items):
+        self.release.wait(5)
+        self.batches.append(list(items))
+        if self.error is not None:
+            raise self.error
+        return [(item, len(self.batches)) for item in items]
+
+
+def submit_all(batcher, items, timeout=5):
+    """Submit every item from its own thread; returns the futures of the submit calls."""
+    executor = ThreadPoolExecutor(max_workers=len(items))
+    futures = [executor.submit(batcher.submit, item, timeout) for item in items]
+    executor.shutdown(wait=False)
+    return futures
+
+
+def test_full_batch_is_flushed_without_waiting():
+    classify = FakeClassifier()
+    batcher = MicroBatcher(classify, max_batch_size=3, max_wait_ms=10000)
+    start = time.perf_counter()
+    futures = submit_all(batcher, ['a', 'b', 'c'])
+    assert sorted(future.result(timeout=5) for future in futures) == [('a', 1), ('b', 1), ('c', 1)]
+    assert time.perf_counter() - start < 5
+    assert sorted(classify.batches[0]) == ['a', 'b', 'c']
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    classify = FakeClassifier()
+    batcher = MicroBatcher(classify, max_batch_size=8, max_wait_ms=50)
+    start = time.perf_counter()
+    assert batcher.submit('a', timeout=5) == ('a', 1)
+    assert time.perf_counter() - start >= 0.05
+    assert batcher.submit('b', timeout=5) == ('b', 2)
+    assert classify.batches == [['a'], ['b']]
+
+
+def test_failure_is_raised_to_every_caller_in_the_batch():
+    classify = FakeClassifier(error=ValueError("bad image"))
+    batcher = MicroBatcher(classify, max_batch_size=2, max_wait_ms=10000)
+    for future in submit_all(batcher, ['a', 'b']):
+        with pytest.raises(ValueError, match="bad image"):
+            future.result(timeout=5)
+    assert len(classify.batches) == 1
+    assert batcher.stats()['errors'] == 1
+
+
+def test_wrong_number_of_results_fails_the_batch():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=1, max_wait_ms=0)
+    with pytest.raises(RuntimeError, match="0 results for 1 items"):
+        batcher.submit('a', timeout=5)
+
+
+def test_timed_out_item_is_never_classified():
+    classify = FakeClassifier()
+    classify.release.clear()
+    batcher = MicroBatcher(classify, max_batch_size=1, max_wait_ms=0)
+    running = submit_all(batcher, ['running'])[0]
+    time.sleep(0.05)
+    with pytest.raises(FutureTimeoutError):
+        batcher.submit('abandoned', timeout=0.05)
+    classify.release.set()
+    assert running.result(timeout=5) == ('running', 1)
+    assert batcher.submit('next', timeout=5) == ('next', 2)
+    assert classify.batches == [['running'], ['next']]
+    assert batcher.stats()['items'] == 2
+
+
+def test_stats_describe_batch_fill_and_queue_wait():
+    classify = FakeClassifier()
+    batcher = MicroBatcher(classify, max_batch_size=2, max_wait_ms=200)
+    assert batcher.stats()['batches'] == 0
+    assert batcher.stats()['avg_batch_size'] == 0.0
+
+    for future in submit_all(batcher, ['a', 'b']):
+        future.result(timeout=5)
+    batcher.submit('c', timeout=5)
+    stats = batcher.stats()
+    assert (stats['batches'], stats['items'], stats['errors'], stats['queued']) == (2, 3, 0, 0)
+    assert (stats['max_batch_size'], stats['max_wait_ms'], stats['last_batch_size']) == (2, 200.0, 1)
+    assert stats['avg_batch_size'] == 1.5
+    assert stats['avg_batch_fill'] == 0.75
+    # 'c' waited out max_wait alone
+    assert stats['max_queue_wait_ms'] >= 200.0
+    assert 0 < stats['avg_queue_wait_ms'] <= stats['max_queue_wait_ms']
+    assert stats['avg_batch_time_ms'] >= 0.0
+
+
+def test_batch_size_must_be_positive():
+    with pytest.raises(ValueError):
+        MicroBatcher(lambda items: items, max_batch_size=0)
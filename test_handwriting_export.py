@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from handwriting import classify_pixel_batch, load_handwriting_model
+from handwriting_export import ExportedClassifier, artifact_dir, rank_labels
+
+ID2LABEL = {0: 'healthy', 1: 'parkinson', 2: 'other'}
+
+
+class FixedLogitsClassifier(ExportedClassifier):
+    """ExportedClassifier whose runtime is replaced by fixed logits, so no torch or onnxruntime is needed."""
+
+    def __init__(self, logits):
+        self.backend = 'onnx'
+        self.id2label = ID2LABEL
+        self.rows = np.asarray(logits, dtype=np.float32)
+        self.batches = []
+
+    def logits(self, images):
+        self.batches.append(list(images))
+        return self.rows[images]
+
+    def logits_from_pixels(self, pixel_values):
+        self.batches.append(pixel_values.shape)
+        return self.rows[:len(pixel_values)]
+
+
+def test_rank_labels_top_k_and_large_logits():
+    results = rank_labels(np.array([[1000.0, 1001.0, 990.0]]), ID2LABEL, top_k=2)
+    assert [item['label'] for item in results[0]] == ['parkinson', 'healthy']
+    assert results[0][0]['score'] == pytest.approx(1 / (1 + np.exp(-1.0) + np.exp(-11.0)))
+    assert all(np.isfinite(item['score']) for item in results[0])
+
+
+def test_exported_classifier_matches_the_pipeline_output_shape():
+    classifier = FixedLogitsClassifier([[0.0, 3.0, 1.0], [2.0, 0.0, 0.0], [0.0, 0.0, 5.0]])
+    single = classifier(0)
+    assert [item['label'] for item in single] == ['parkinson', 'other', 'healthy']
+    assert sum(item['score'] for item in single) == pytest.approx(1.0)
+
+    batched = classifier([0, 1, 2], batch_size=2)
+    assert classifier.batches[1:] == [[0, 1], [2]]
+    assert [result[0]['label'] for result in batched] == ['parkinson', 'healthy', 'other']
+    assert len(classifier([0, 1], top_k=1)[0]) == 1
+
+
+def test_classify_pixel_batch_uses_the_exported_runtime():
+    classifier = FixedLogitsClassifier([[0.0, 3.0, 1.0], [2.0, 0.0, 0.0]])
+    pixels = np.zeros((2, 3, 224, 224), dtype=np.float64)
+    results = classify_pixel_batch(classifier, pixels)
+    assert classifier.batches == [(2, 3, 224, 224)]
+    assert [result[0]['label'] for result in results] == ['parkinson', 'healthy']
+
+
+def test_quantized_eager_model_is_rejected():
+    with pytest.raises(ValueError, match="exported backend"):
+        load_handwriting_model(backend='eager', quantize=True)
+    with pytest.raises(ValueError):
+        load_handwriting_model(backend='tensorrt')
+
+
+def test_artifact_dir_separates_variants(tmp_path):
+    dirs = {artifact_dir('org/model', backend, quantize, str(tmp_path))
+            for backend in ('torchscript', 'onnx') for quantize in (False, True)}
+    assert len(dirs) == 4
+    assert all(d.startswith(str(tmp_path / 'org--model')) for d in dirs)
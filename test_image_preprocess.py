@@ -0,0 +1,108 @@
+import glob
+import io
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from handwriting import (HANDWRITING_MODEL_ID, IMAGE_MEAN, IMAGE_SIZE, IMAGE_STD, image_spec, preprocess_image,
+                         preprocess_images)
+from handwriting_export import rank_labels
+
+IMAGE_FILES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'data', 'image_data', '*', '*', '*.png')))
+
+
+def pipeline_reference(image):
+    """The image processor's steps: RGB, bicubic resize of the full image, rescale, normalize, CHW."""
+    image = image.convert('RGB').resize((IMAGE_SIZE, IMAGE_SIZE), Image.Resampling.BICUBIC)
+    pixels = (np.asarray(image, dtype=np.float32) / 255.0 - IMAGE_MEAN) / IMAGE_STD
+    return pixels.transpose(2, 0, 1)
+
+
+def image_processor(name):
+    """
+    An image processor from transformers: the model's own if its files are cached, else the
+    same ViT processor class configured like it ('model') or left at its defaults ('vit').
+    """
+    transformers = pytest.importorskip('transformers')
+    if not hasattr(transformers, 'ViTImageProcessor'):
+        pytest.skip("transformers image processors unavailable")
+    if name == 'vit':
+        return transformers.ViTImageProcessor()
+    try:
+        return transformers.AutoImageProcessor.from_pretrained(HANDWRITING_MODEL_ID, local_files_only=True)
+    except OSError:
+        return transformers.ViTImageProcessor(size={'height': IMAGE_SIZE, 'width': IMAGE_SIZE},
+                                              resample=Image.Resampling.BICUBIC,
+                                              image_mean=list(IMAGE_MEAN), image_std=list(IMAGE_STD))
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('path', IMAGE_FILES[::10], ids=os.path.basename)
+def test_exact_path_matches_pipeline_preprocessing(path):
+    with Image.open(path) as image:
+        expected = pipeline_reference(image)
+    pixels = preprocess_image(path, fast=False)
+    assert pixels.shape == (3, IMAGE_SIZE, IMAGE_SIZE) and pixels.dtype == np.float32
+    np.testing.assert_allclose(pixels, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize('fmt', ['JPEG', 'PNG'])
+def test_fast_path_stays_close_on_large_scans(fmt):
+    with Image.open(IMAGE_FILES[0]) as image:
+        scan = image.convert('RGB').resize((2000, 1500), Image.Resampling.BICUBIC)
+    data = encode(scan, fmt)
+    fast = preprocess_image(data)
+    exact = preprocess_image(data, fast=False)
+    assert np.abs(fast - exact).mean() < 0.01
+    assert np.abs(fast - exact).max() < 0.25
+
+
+@pytest.mark.parametrize('name', ['model', 'vit'])
+def test_exact_path_matches_the_image_processor(name):
+    processor = image_processor(name)
+    spec = image_spec(SimpleNamespace(image_processor=processor))
+    for path in IMAGE_FILES[::25]:
+        with Image.open(path) as image:
+            expected = processor(images=image.convert('RGB'), return_tensors='np')['pixel_values'][0]
+        np.testing.assert_allclose(preprocess_image(path, fast=False, spec=spec), expected, atol=1e-4)
+
+
+def test_image_spec_follows_the_processor():
+    processor = SimpleNamespace(size={'height': 96, 'width': 128}, resample=Image.Resampling.BILINEAR,
+                                do_rescale=True, rescale_factor=1 / 255.0, do_normalize=True,
+                                image_mean=[0.5, 0.5, 0.5], image_std=[0.5, 0.5, 0.5])
+    spec = image_spec(SimpleNamespace(processor=processor))
+    with Image.open(IMAGE_FILES[0]) as image:
+        resized = image.convert('RGB').resize((128, 96), Image.Resampling.BILINEAR)
+    expected = (np.asarray(resized, dtype=np.float32) / 255.0 - 0.5) / 0.5
+    pixels = preprocess_image(IMAGE_FILES[0], fast=False, spec=spec)
+    assert pixels.shape == (3, 96, 128)
+    np.testing.assert_allclose(pixels, expected.transpose(2, 0, 1), atol=1e-5)
+    # A model without a processor keeps the defaults
+    np.testing.assert_array_equal(preprocess_image(IMAGE_FILES[0], spec=image_spec(object())),
+                                  preprocess_image(IMAGE_FILES[0]))
+
+
+def test_grayscale_and_batched_preprocessing():
+    with Image.open(IMAGE_FILES[0]) as image:
+        gray = image.convert('L')
+    data = encode(gray, 'PNG')
+    np.testing.assert_allclose(preprocess_image(data), preprocess_image(gray.convert('RGB')), atol=1e-6)
+    batch = preprocess_images([data, IMAGE_FILES[1]])
+    assert batch.shape == (2, 3, IMAGE_SIZE, IMAGE_SIZE)
+    np.testing.assert_array_equal(batch[1], preprocess_image(IMAGE_FILES[1]))
+
+
+def test_rank_labels_sorts_softmax_scores():
+    results = rank_labels(np.array([[0.0, 2.0], [1.0, -1.0]]), {0: 'healthy', 1: 'parkinson'})
+    assert [r[0]['label'] for r in results] == ['parkinson', 'healthy']
+    assert results[0][0]['score'] == pytest.approx(1 / (1 + np.exp(-2.0)))
+    assert sum(item['score'] for item in results[1]) == pytest.approx(1.0)
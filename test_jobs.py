@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobManager, JobStoreFull
+
+
+def wait_for(manager, job_id, status=('done', 'error'), timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id, wait=0.1)
+        if job['status'] in status:
+            return job
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_partial_results_are_visible_before_the_job_finishes():
+    manager = JobManager(max_workers=2)
+    release = threading.Event()
+    job_id = manager.submit({'fast': lambda: 1, 'slow': lambda: release.wait(5) and 2},
+                            on_complete=lambda results: {'total': results['fast'] + results['slow']})
+    job = manager.get(job_id, wait=5, since=0)
+    while job['pending'] != ['slow']:
+        job = manager.get(job_id, wait=5, since=job['updated'])
+    assert job['status'] == 'running'
+    assert job['results'] == {'fast': 1, 'slow': None}
+
+    release.set()
+    job = wait_for(manager, job_id)
+    assert job['status'] == 'done'
+    assert job['results'] == {'fast': 1, 'slow': 2, 'total': 3}
+
+
+def test_failed_task_marks_the_job_as_error():
+    manager = JobManager()
+
+    def fail():
+        raise ValueError("bad recording")
+
+    job = wait_for(manager, manager.submit({'voice': fail, 'handwriting': lambda: 1},
+                                           on_complete=lambda results: {'combined': 1}))
+    assert job['status'] == 'error'
+    assert job['errors'] == {'voice': "bad recording"}
+    assert 'combined' not in job['results']
+
+
+def test_long_poll_returns_on_change_or_timeout():
+    manager = JobManager()
+    release = threading.Event()
+    job_id = manager.submit({'slow': lambda: release.wait(5)})
+    job = manager.get(job_id)
+    assert job['status'] in ('queued', 'running')
+
+    # Nothing changes after `since`: the poll waits out its timeout
+    start = time.time()
+    job = manager.get(job_id, wait=0.2, since=time.time() + 1)
+    assert time.time() - start >= 0.2
+    assert job['status'] != 'done'
+
+    threading.Timer(0.1, release.set).start()
+    job = manager.get(job_id, wait=5, since=time.time() + 1)
+    assert job['status'] == 'done'
+    assert manager.get('unknown', wait=0.1) is None
+
+
+def test_finished_jobs_expire_after_ttl(monkeypatch):
+    manager = JobManager(ttl_seconds=60)
+    job_id = manager.submit({'voice': lambda: 1})
+    finished = wait_for(manager, job_id)['updated']
+    monkeypatch.setattr(jobs.time, 'time', lambda: finished + 61)
+    assert manager.get(job_id) is None
+    assert manager.stats()['jobs'] == 0
+
+
+def test_full_store_evicts_the_oldest_finished_jobs():
+    manager = JobManager(max_workers=2, max_jobs=3)
+    first = manager.submit({'a': lambda: 1})
+    wait_for(manager, first)
+    second = manager.submit({'a': lambda: 2})
+    wait_for(manager, second)
+    release = threading.Event()
+    running = manager.submit({'a': lambda: release.wait(5)})
+
+    manager.submit({'a': lambda: release.wait(5)})
+    assert manager.get(first) is None
+    assert manager.get(second)['results'] == {'a': 2}
+    manager.submit({'a': lambda: release.wait(5)})
+    assert manager.get(second) is None
+    assert manager.stats()['evicted'] == 2
+
+    # Every slot is now held by an unfinished job, and those are never evicted
+    with pytest.raises(JobStoreFull):
+        manager.submit({'a': lambda: 3})
+    assert manager.get(running)['status'] in ('queued', 'running')
+    release.set()
+    wait_for(manager, running)
+    assert wait_for(manager, manager.submit({'a': lambda: 4}))['results'] == {'a': 4}
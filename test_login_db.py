@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'login'))
+
+from db import UserStore  # noqa: E402
+
+
+def make_store(tmp_path, **kwargs):
+    store = UserStore(str(tmp_path / 'users.db'), **kwargs)
+    store.init_schema()
+    return store
+
+
+def test_connections_use_wal_and_username_index(tmp_path):
+    store = make_store(tmp_path)
+    with store.pool.connection() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        plan = conn.execute('EXPLAIN QUERY PLAN SELECT id, password FROM users WHERE username = ?',
+                            ('alice',)).fetchall()
+    assert any('USING INDEX' in row[-1] for row in plan)
+
+
+def test_register_and_authenticate(tmp_path):
+    store = make_store(tmp_path)
+    assert store.register('alice', 'pw')
+    assert not store.register('alice', 'other')
+    assert store.authenticate('alice', 'pw')
+    assert not store.authenticate('alice', 'wrong')
+    assert not store.authenticate('bob', 'pw')
+
+
+def test_successful_logins_are_cached_briefly(tmp_path):
+    store = make_store(tmp_path, auth_cache_ttl=60)
+    store.register('alice', 'pw')
+    assert store.authenticate('alice', 'pw')
+    with store.pool.connection() as conn:
+        with conn:
+            conn.execute("UPDATE users SET password = 'changed' WHERE username = 'alice'")
+    # Served from the cache until it is cleared
+    assert store.authenticate('alice', 'pw')
+    store.clear_auth_cache()
+    assert not store.authenticate('alice', 'pw')
+    assert store.authenticate('alice', 'changed')
@@ -0,0 +1,50 @@
+import pytest
+
+from analysis_engine import AnalysisEngine
+from metrics import Counter, Histogram, STAGE_ERRORS, profiling, stage
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('test_latency_seconds', "Test latency.", ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 2.0):
+        histogram.observe(value, stage='a')
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_sum{stage="a"} 3.05' in lines
+    assert 'test_latency_seconds_count{stage="a"} 4' in lines
+
+
+def test_labels_must_match():
+    counter = Counter('test_total', "Test.", ['stage'])
+    with pytest.raises(ValueError):
+        counter.inc(modality='voice')
+
+
+def test_stage_counts_errors():
+    before = STAGE_ERRORS._values.get(('test.failing',), 0.0)
+    with pytest.raises(RuntimeError):
+        with stage('test.failing'):
+            raise RuntimeError("boom")
+    assert STAGE_ERRORS._values[('test.failing',)] == before + 1
+
+
+def test_profile_follows_stages_into_engine_threads():
+    def analyze_voice(value):
+        with stage('test.voice'):
+            return {'prediction': "Yes"}
+
+    def analyze_handwriting(value):
+        with stage('test.handwriting'):
+            return {'prediction': "No", 'confidence': 0.9}
+
+    engine = AnalysisEngine(analyze_voice, analyze_handwriting)
+    with profiling() as stages:
+        engine.run('voice', 'handwriting')
+    assert {'test.voice', 'test.handwriting', 'fusion'} <= set(stages)
+
+    # Outside profiling() nothing more is collected
+    snapshot = dict(stages)
+    engine.run('voice', 'handwriting')
+    assert stages == snapshot
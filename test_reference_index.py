@@ -0,0 +1,144 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import reference_index
+from analysis_engine import assess_voice
+from batch_extract import INDEX_COLUMNS, save_store
+from reference_index import (VECTORS_FILE, ReferenceIndex, build_reference_index, data_path,
+                             load_reference_index)
+from voice_extraction import FEATURE_EXTRACTOR_VERSION, FEATURE_NAMES, vector_to_features
+
+
+def write_store(store_dir, n, seed=0, labels=None):
+    rng = np.random.default_rng(seed)
+    features = (rng.standard_normal((n, len(FEATURE_NAMES))) * np.arange(1, len(FEATURE_NAMES) + 1)
+                + 100).astype(np.float32)
+    index = pd.DataFrame({
+        'path': [f'data/{i:05d}.wav' for i in range(n)], 'size': 1, 'mtime_ns': 1, 'sha256': '',
+        'label': rng.integers(0, 2, n) if labels is None else labels, 'f0_method': 'pyin',
+        'version': FEATURE_EXTRACTOR_VERSION,
+    }, columns=INDEX_COLUMNS)
+    save_store(store_dir, index, features)
+    return index, features
+
+
+def brute_force(features, query, k):
+    mean, scale = features.astype(np.float64).mean(axis=0), features.astype(np.float64).std(axis=0)
+    distances = np.linalg.norm((features - mean) / scale - (query - mean) / scale, axis=1)
+    return np.argsort(distances, kind='stable')[:k], np.sort(distances)[:k]
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    _, features = write_store(tmp_path / 'store', 300)
+    build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    index = ReferenceIndex(tmp_path / 'index')
+    query = features[7] + 0.5
+    rows, distances = index.search(query, k=5, method='exact')
+    expected_rows, expected_distances = brute_force(features, query, 5)
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-4)
+
+
+def test_unlabelled_recordings_are_not_references(tmp_path):
+    write_store(tmp_path / 'store', 10, labels=[0, 1, -1, 0, 1, -1, 0, 1, 0, 1])
+    meta = build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    assert meta['count'] == 8
+
+
+def test_build_appends_new_recordings(tmp_path):
+    index, features = write_store(tmp_path / 'store', 120)
+    save_store(tmp_path / 'store', index.iloc[:100], features[:100])
+    meta = build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    before = np.fromfile(data_path(tmp_path / 'index', meta, VECTORS_FILE), dtype=np.float32)
+
+    save_store(tmp_path / 'store', index, features)
+    meta = build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    assert (meta['count'], meta['fit_count'], meta['generation']) == (120, 100, 1)
+    after = np.fromfile(data_path(tmp_path / 'index', meta, VECTORS_FILE), dtype=np.float32)
+    np.testing.assert_array_equal(after[:before.size], before)
+    rows, distances = ReferenceIndex(tmp_path / 'index').search(features[110], k=1)
+    assert rows[0] == 110 and distances[0] < 1e-5
+
+    # A re-extracted recording invalidates its row: the index is refit from scratch
+    index.loc[3, 'mtime_ns'] = 2
+    save_store(tmp_path / 'store', index, features)
+    assert build_reference_index(tmp_path / 'store', tmp_path / 'index')['fit_count'] == 120
+
+
+def test_ivf_search_finds_the_exact_neighbours(tmp_path, monkeypatch):
+    monkeypatch.setattr(reference_index, 'IVF_MIN_ROWS', 500)
+    rng = np.random.default_rng(1)
+    centers = rng.standard_normal((20, len(FEATURE_NAMES))) * 10
+    clustered = centers[rng.integers(20, size=2000)] + rng.standard_normal((2000, len(FEATURE_NAMES)))
+    index, _ = write_store(tmp_path / 'store', 2000)
+    save_store(tmp_path / 'store', index, clustered.astype(np.float32))
+    meta = build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    assert len(meta['centroids']) == 45
+    reference = ReferenceIndex(tmp_path / 'index')
+    recall = []
+    for query in clustered[:50] + 0.1:
+        exact = set(reference.search(query, k=5, method='exact')[0])
+        approximate = set(reference.search(query, k=5, method='ivf', nprobe=8)[0])
+        recall.append(len(exact & approximate) / 5)
+    assert np.mean(recall) > 0.95
+
+
+def test_voice_result_includes_reference(tmp_path):
+    _, features = write_store(tmp_path / 'store', 50)
+    build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    reference = load_reference_index(tmp_path / 'index', k=3)
+    result = assess_voice(vector_to_features(features[4]), reference=reference)
+    assert result['reference']['neighbours'][0]['recording'] == '00004.wav'
+    assert len(result['reference']['neighbours']) == 3
+    assert result['reference']['prediction'] in ("Yes", "No")
+
+
+def test_missing_or_stale_index_is_ignored(tmp_path):
+    assert load_reference_index(tmp_path / 'none') is None
+    write_store(tmp_path / 'store', 20)
+    build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    meta_path = tmp_path / 'index' / reference_index.META_FILE
+    meta = json.loads(meta_path.read_text())
+    meta_path.write_text(json.dumps(dict(meta, version='0')))
+    assert load_reference_index(tmp_path / 'index') is None
+    with pytest.raises(ValueError):
+        ReferenceIndex(tmp_path / 'index', method='hnsw')
+
+
+def test_rebuild_does_not_disturb_open_readers(tmp_path):
+    index, features = write_store(tmp_path / 'store', 60, seed=0)
+    build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    old = ReferenceIndex(tmp_path / 'index')
+    old_rows = old.search(features[5], k=3)
+
+    # A changed recording forces a full rebuild into new data files, twice
+    for mtime_ns in (2, 3):
+        index.loc[5, 'mtime_ns'] = mtime_ns
+        save_store(tmp_path / 'store', index, features[::-1].copy())
+        meta = build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    assert meta['generation'] == 3
+    assert sorted(p.name for p in (tmp_path / 'index').iterdir() if p.name != reference_index.META_FILE) == sorted(
+        name.format(generation) for name in reference_index.DATA_FILES for generation in (2, 3))
+
+    rows, distances = old.search(features[5], k=3)
+    np.testing.assert_array_equal(rows, old_rows[0])
+    np.testing.assert_allclose(distances, old_rows[1])
+    assert old.paths[rows[0]] == 'data/00005.wav'
+    new = ReferenceIndex(tmp_path / 'index')
+    assert new.search(features[5], k=1)[0][0] == 54
+
+
+def test_non_finite_features_skip_the_reference_vote(tmp_path):
+    _, features = write_store(tmp_path / 'store', 30)
+    build_reference_index(tmp_path / 'store', tmp_path / 'index')
+    reference = load_reference_index(tmp_path / 'index')
+    for bad in (np.nan, np.inf):
+        query = features[0].copy()
+        query[3] = bad
+        assert reference.assess(query) is None
+        result = assess_voice(vector_to_features(query), reference=reference)
+        assert 'reference' not in result
+        json.dumps(result, allow_nan=False)
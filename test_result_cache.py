@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, content_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache.time, 'time', clock)
+    return clock
+
+
+def test_content_key_depends_on_version():
+    assert content_key(b'abc', 'v1') == content_key(b'abc', 'v1')
+    assert content_key(b'abc', 'v1') != content_key(b'abc', 'v2')
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the oldest
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    stats = cache.stats()
+    assert (stats['evictions'], stats['entries'], stats['memory_hits'], stats['misses']) == (1, 2, 3, 1)
+    assert stats['hit_rate'] == 0.75
+
+
+def test_membership_does_not_count_as_a_lookup(tmp_path, clock):
+    cache = ResultCache(ttl_seconds=60, disk_dir=str(tmp_path))
+    assert 'a' not in cache
+    cache.set('a', 1)
+    assert 'a' in cache
+    assert 'a' in ResultCache(ttl_seconds=60, disk_dir=str(tmp_path))
+    clock.now += 61
+    assert 'a' not in cache
+    assert cache.stats()['misses'] == cache.stats()['memory_hits'] == 0
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.set('a', 1)
+    clock.now += 60
+    assert cache.get('a') == 1
+    clock.now += 1
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['expirations'], stats['misses'], stats['entries']) == (1, 1, 0)
+
+
+def test_disk_tier_survives_a_restart(tmp_path, clock):
+    ResultCache(disk_dir=str(tmp_path), ttl_seconds=60).set('ab12', {'prediction': "Yes"})
+    cache = ResultCache(disk_dir=str(tmp_path), ttl_seconds=60)
+    assert cache.get('ab12') == {'prediction': "Yes"}
+    assert cache.get('ab12') == {'prediction': "Yes"}
+    stats = cache.stats()
+    assert (stats['disk_hits'], stats['memory_hits'], stats['disk_enabled']) == (1, 1, True)
+
+
+def test_stale_disk_entry_is_removed(tmp_path, clock):
+    ResultCache(disk_dir=str(tmp_path), ttl_seconds=60).set('ab12', 1)
+    path = os.path.join(str(tmp_path), 'ab', 'ab12.json')
+    assert os.path.exists(path)
+    clock.now += 61
+    cache = ResultCache(disk_dir=str(tmp_path), ttl_seconds=60)
+    assert cache.get('ab12') is None
+    assert not os.path.exists(path)
+    assert cache.stats()['expirations'] == 1
+
+
+@pytest.mark.parametrize('content', ['{"stored_at": 10', '{}', '[1, 2]', ''])
+def test_corrupt_disk_entry_is_a_miss(tmp_path, clock, content):
+    os.makedirs(tmp_path / 'ab')
+    (tmp_path / 'ab' / 'ab12.json').write_text(content)
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.get('ab12') is None
+    assert cache.stats()['misses'] == 1
+    cache.set('ab12', 2)
+    assert ResultCache(disk_dir=str(tmp_path)).get('ab12') == 2
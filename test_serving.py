@@ -0,0 +1,85 @@
+import pytest
+
+from serving import worker_plan
+from warmup import BackgroundWarmup
+
+
+@pytest.mark.parametrize('cpus, workers, threads', [(1, 1, 1), (4, 4, 1), (8, 4, 2), (16, 8, 2)])
+def test_worker_plan_fills_the_cores(monkeypatch, cpus, workers, threads):
+    for name in ('WEB_CONCURRENCY', 'SERVING_THREADS_PER_WORKER', 'SERVING_REQUEST_THREADS'):
+        monkeypatch.delenv(name, raising=False)
+    plan = worker_plan(cpus)
+    assert (plan['workers'], plan['threads_per_worker']) == (workers, threads)
+
+
+def test_worker_plan_environment_overrides(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    monkeypatch.setenv('SERVING_THREADS_PER_WORKER', '4')
+    monkeypatch.setenv('SERVING_REQUEST_THREADS', '2')
+    assert worker_plan(16) == {'cpus': 16, 'workers': 3, 'threads_per_worker': 4, 'request_threads': 2}
+
+
+def test_warmup_runs_named_steps_before_the_rest():
+    calls = []
+    warmup = BackgroundWarmup([(name, lambda name=name: calls.append(name) or name) for name in ('model', 'forward')])
+    warmup.run(['model'])
+    assert calls == ['model'] and not warmup.ready
+    assert warmup.result('model') == 'model'
+    warmup.start()
+    assert warmup.wait(timeout=5)
+    assert calls == ['model', 'forward']
+
+
+def test_failed_warmup_step_is_retried_after_backoff(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('warmup.time.time', lambda: clock[0])
+    attempts = []
+
+    def load_model():
+        attempts.append(clock[0])
+        if len(attempts) < 3:
+            raise OSError("download failed")
+        return 'model'
+
+    warmup = BackgroundWarmup([('model', load_model)], retry_seconds=5, max_retry_seconds=60)
+    warmup.run()
+    assert warmup.status()['state'] == 'failed'
+    with pytest.raises(RuntimeError, match="download failed"):
+        warmup.result('model')
+    assert len(attempts) == 1
+
+    clock[0] += 5
+    with pytest.raises(RuntimeError):
+        warmup.result('model')
+    clock[0] += 9  # the backoff doubled to 10s
+    with pytest.raises(RuntimeError):
+        warmup.result('model')
+    assert len(attempts) == 2
+
+    clock[0] += 1
+    assert warmup.result('model') == 'model'
+    assert len(attempts) == 3
+    assert warmup.ready and warmup.status()['state'] == 'ready'
+
+
+def test_start_retries_failed_steps_in_the_background(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('warmup.time.time', lambda: clock[0])
+    failures = [OSError("download failed")]
+
+    def load_model():
+        if failures:
+            raise failures.pop()
+        return 'model'
+
+    warmup = BackgroundWarmup([('model', load_model), ('forward', lambda: warmup.result('model'))],
+                              retry_seconds=5)
+    warmup.start()
+    assert not warmup.wait(timeout=5)
+    assert set(warmup.status()['errors']) == {'model', 'forward'}
+    warmup.start()._thread.join(5)
+    assert warmup.status()['state'] == 'failed'
+
+    clock[0] += 5
+    warmup.start()._thread.join(5)
+    assert warmup.ready and warmup.result('forward') == 'model'
@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Wall-clock budget for importing each entry point, measured in a fresh interpreter
+IMPORT_BUDGET_SECONDS = {
+    'voice_extraction': 1.0,
+    'app': 2.0,
+}
+# Modules that must only load when a feature actually needs them
+DEFERRED_MODULES = ['sounddevice', 'pandas', 'transformers', 'torch', 'scipy.io.wavfile']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def import_profile(module):
+    env = dict(os.environ, WARMUP_ON_STARTUP='0')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGET_SECONDS))
+def test_import_stays_within_budget(module):
+    profile = import_profile(module)
+    assert profile['loaded'] == []
+    assert profile['elapsed'] < IMPORT_BUDGET_SECONDS[module]
@@ -0,0 +1,119 @@
+import glob
+import io
+import os
+
+import librosa
+import numpy as np
+import pytest
+
+from voice_extraction import (F0_METHODS, FEATURE_NAMES, PYIN_ASSUMED_SR, assess_parkinsons,
+                              assess_parkinsons_batch, estimate_f0, extract_features,
+                              extract_spectral_features, features_to_vector, normalize_features,
+                              vector_to_features)
+
+VOICE_FILES = sorted(glob.glob(os.path.join("data", "voice_data", "*", "*.wav")))
+
+
+def reference_spectral_features(y, sr):
+    """The original per-feature computation, each call running its own STFT."""
+    features = {}
+    harmonics = librosa.effects.harmonic(y)
+    noise = y - harmonics
+    features['NHR'] = np.mean(np.abs(noise)) / np.mean(np.abs(harmonics))
+    features['HNR'] = librosa.feature.spectral_rolloff(y=y)[0].mean()
+    mfccs = librosa.feature.mfcc(y=y, sr=sr)
+    features['RPDE'] = np.std(mfccs) / np.mean(mfccs)
+    features['DFA'] = np.mean(np.abs(np.diff(mfccs, axis=1)))
+    spec_cent = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+    features['spread1'] = np.std(spec_cent)
+    features['spread2'] = np.percentile(spec_cent, 75) - np.percentile(spec_cent, 25)
+    features['D2'] = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
+    features['PPE'] = np.sum(np.abs(np.diff(mfccs, axis=1))) / mfccs.shape[1]
+    return features
+
+
+@pytest.mark.parametrize("file_path", VOICE_FILES, ids=os.path.basename)
+def test_shared_stft_matches_reference(file_path):
+    y, sr = librosa.load(file_path, sr=None)
+    expected = reference_spectral_features(y, sr)
+    actual = extract_spectral_features(y, sr)
+    assert actual.keys() == expected.keys()
+    for key in expected:
+        assert np.isclose(actual[key], expected[key], rtol=1e-5, atol=1e-8), key
+
+
+@pytest.mark.parametrize("method", F0_METHODS)
+@pytest.mark.parametrize("sr", [8000, 44100])
+def test_f0_backends_track_a_steady_tone(method, sr):
+    freq = 180.0
+    t = np.arange(int(2.0 * sr)) / sr
+    y = (0.5 * np.sin(2 * np.pi * freq * t) + 0.1 * np.sin(4 * np.pi * freq * t)).astype(np.float32)
+    f0 = estimate_f0(y, sr, method=method)
+    # Both backends report on the scale pyin has always used
+    expected = freq * PYIN_ASSUMED_SR / sr
+    assert len(f0) > 0
+    assert np.isclose(np.median(f0), expected, rtol=0.02)
+
+
+def test_unknown_f0_method_is_rejected():
+    with pytest.raises(ValueError):
+        extract_features(VOICE_FILES[0], f0_method='crepe')
+
+
+def test_in_memory_sources_match_file_path():
+    file_path = VOICE_FILES[0]
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    expected = extract_features(file_path, f0_method='yin')
+    for source in (data, io.BytesIO(data), librosa.load(file_path, sr=None)):
+        assert extract_features(source, f0_method='yin') == expected
+
+
+def reference_assessment(features):
+    """The original one-dict-at-a-time rules."""
+    details = []
+    if features['MDVP:Jitter(%)'] > 1.0:
+        details.append("High Jitter percentage")
+    if features['MDVP:Shimmer'] > 2.0:
+        details.append("Elevated Shimmer")
+    if features['HNR'] < 0.6:
+        details.append("Low Harmonics to Noise Ratio")
+    if features['PPE'] > 50.0:
+        details.append("High Pitch Period Entropy")
+    return "Yes" if len(details) >= 3 else "No", len(details), details
+
+
+def random_feature_matrix(n=2000):
+    rng = np.random.default_rng(0)
+    matrix = rng.uniform(-100, 100, size=(n, len(FEATURE_NAMES))).astype(np.float32)
+    # Put the rule columns around their thresholds so every outcome occurs
+    for name, low, high in [('MDVP:Jitter(%)', 0, 2), ('MDVP:Shimmer', 0, 4), ('HNR', 0, 1.2), ('PPE', 0, 100)]:
+        matrix[:, FEATURE_NAMES.index(name)] = rng.uniform(low, high, size=n)
+    return matrix
+
+
+def test_batch_assessment_matches_per_row_rules():
+    matrix = random_feature_matrix()
+    has_parkinsons, risk_factors, flags = assess_parkinsons_batch(matrix)
+    assert flags.shape == (len(matrix), 4)
+    for i, row in enumerate(matrix):
+        features = vector_to_features(row)
+        expected = reference_assessment(features)
+        assert ("Yes" if has_parkinsons[i] else "No", int(risk_factors[i])) == expected[:2]
+        assert assess_parkinsons(features) == expected
+
+
+def test_column_normalizers_match_per_feature_lambdas():
+    normalizers = {
+        'MDVP:Fo(Hz)': lambda x: x / 1000, 'MDVP:Fhi(Hz)': lambda x: x / 1000, 'MDVP:Flo(Hz)': lambda x: x / 1000,
+        'MDVP:Jitter(%)': lambda x: min(x, 100), 'MDVP:Shimmer': lambda x: min(x, 100),
+        'HNR': lambda x: x / 10000, 'RPDE': lambda x: abs(x), 'DFA': lambda x: abs(x),
+        'spread1': lambda x: x / 100, 'spread2': lambda x: x / 100, 'D2': lambda x: x / 1000,
+        'PPE': lambda x: min(abs(x), 100),
+    }
+    matrix = random_feature_matrix(200) * 3
+    normalized = normalize_features(matrix)
+    assert normalized.dtype == np.float32 and normalized.shape == matrix.shape
+    for row, actual in zip(matrix, normalized):
+        expected = {name: normalizers.get(name, lambda x: x)(float(value)) for name, value in zip(FEATURE_NAMES, row)}
+        np.testing.assert_allclose(actual, features_to_vector(expected), rtol=1e-6)
@@ -0,0 +1,79 @@
+import glob
+import os
+
+import librosa
+import numpy as np
+import pytest
+from scipy.ndimage import median_filter
+
+from voice_extraction import HOP_LENGTH, HPSS_KERNEL, N_FFT, extract_jitter_features, extract_shimmer_features
+from voice_kernels import diff_stats, frame_abs_means, frame_rms, hpss_harmonic, median_filter_freq, median_filter_time
+
+VOICE_FILES = sorted(glob.glob(os.path.join("data", "voice_data", "*", "*.wav")))
+
+
+def reference_jitter_shimmer_features(y):
+    """The original NumPy computation of the jitter and shimmer families."""
+    features = {}
+    frame_means = np.mean(np.abs(librosa.util.frame(y, frame_length=2048, hop_length=512)), axis=0)
+    jitter = np.diff(frame_means)
+    features['MDVP:Jitter(%)'] = np.std(jitter) * 100
+    features['MDVP:Jitter(Abs)'] = np.mean(np.abs(jitter))
+    features['MDVP:RAP'] = np.mean(np.abs(np.diff(jitter)))
+    features['MDVP:PPQ'] = np.percentile(np.abs(jitter), 25)
+    features['Jitter:DDP'] = np.mean(np.abs(np.diff(np.diff(frame_means))))
+    shimmer = np.diff(librosa.feature.rms(y=y)[0])
+    features['MDVP:Shimmer'] = np.std(shimmer) * 100
+    features['MDVP:Shimmer(dB)'] = librosa.amplitude_to_db(np.std(shimmer))
+    features['Shimmer:APQ3'] = np.mean(np.abs(shimmer))
+    features['Shimmer:APQ5'] = np.percentile(np.abs(shimmer), 75)
+    features['MDVP:APQ'] = np.mean(shimmer)
+    features['Shimmer:DDA'] = np.mean(np.abs(np.diff(shimmer)))
+    return features
+
+
+@pytest.mark.parametrize("file_path", VOICE_FILES[::8], ids=os.path.basename)
+def test_jitter_shimmer_match_reference(file_path):
+    y, sr = librosa.load(file_path, sr=None)
+    expected = reference_jitter_shimmer_features(y)
+    actual = {**extract_jitter_features(y), **extract_shimmer_features(y)}
+    assert actual.keys() == expected.keys()
+    for key in expected:
+        # The kernels sum in float64 where NumPy summed float32 frames
+        assert np.isclose(actual[key], expected[key], rtol=1e-4, atol=1e-9), key
+
+
+@pytest.mark.parametrize("n", [0, 511, 2047, 2048, 2049, 10000])
+def test_frame_statistics_match_librosa(n):
+    y = np.random.default_rng(n).standard_normal(n).astype(np.float32)
+    np.testing.assert_allclose(frame_rms(y, N_FFT, HOP_LENGTH), librosa.feature.rms(y=y)[0], rtol=1e-5, atol=1e-7)
+    expected = (np.mean(np.abs(librosa.util.frame(y, frame_length=N_FFT, hop_length=HOP_LENGTH)), axis=0)
+                if n >= N_FFT else np.zeros(0))
+    np.testing.assert_allclose(frame_abs_means(y, N_FFT, HOP_LENGTH), expected, rtol=1e-5)
+
+
+def test_diff_stats_match_numpy():
+    values = np.random.default_rng(0).standard_normal(500).cumsum()
+    d = np.diff(values)
+    expected = (np.mean(d), np.std(d), np.mean(np.abs(d)), np.percentile(np.abs(d), 25),
+                np.mean(np.abs(np.diff(d))))
+    np.testing.assert_allclose(diff_stats(values, 25), expected, rtol=1e-10)
+    assert np.isnan(diff_stats(values[:1], 25)).all()
+
+
+@pytest.mark.parametrize("shape", [(1025, 16), (1025, 200), (40, 3)])
+def test_median_filters_match_scipy(shape):
+    # scipy corrupts memory when the window is more than twice the line, so shapes stay above 15
+    S = np.random.default_rng(shape[1]).random(shape).astype(np.float32)
+    if shape[1] >= HPSS_KERNEL // 2 + 1:
+        np.testing.assert_array_equal(median_filter_time(S, HPSS_KERNEL),
+                                      median_filter(S, size=(1, HPSS_KERNEL), mode='reflect'))
+    np.testing.assert_array_equal(median_filter_freq(S, HPSS_KERNEL),
+                                  median_filter(S, size=(HPSS_KERNEL, 1), mode='reflect'))
+
+
+def test_hpss_harmonic_matches_librosa():
+    y, sr = librosa.load(VOICE_FILES[0], sr=None)
+    D = librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    expected = librosa.decompose.hpss(D)[0]
+    np.testing.assert_allclose(hpss_harmonic(D, HPSS_KERNEL), expected, rtol=0, atol=1e-6 * np.abs(expected).max())
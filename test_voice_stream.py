@@ -0,0 +1,80 @@
+import glob
+import os
+
+import librosa
+import numpy as np
+import pytest
+
+from voice_extraction import extract_features, load_audio
+from voice_stream import FrameBuffer, StreamingVoiceAnalyzer, VoiceStreamSessions, extract_features_chunked
+
+VOICE_FILES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'data', 'voice_data', '*', '*.wav')))
+
+
+def stream(y, sr, chunk_size, f0_method='yin'):
+    analyzer = StreamingVoiceAnalyzer(sr, f0_method=f0_method)
+    for i in range(0, len(y), chunk_size):
+        analyzer.push(y[i:i + chunk_size])
+    return analyzer.finish()
+
+
+@pytest.mark.parametrize('pad', [0, 1024])
+def test_frame_buffer_matches_librosa_frame(pad):
+    y = np.random.default_rng(0).standard_normal(10000).astype(np.float32)
+    buffer = FrameBuffer(2048, 512, pad=pad)
+    frames = [buffer.push(y[i:i + 777]) for i in range(0, len(y), 777)] + [buffer.flush()]
+    padded = np.pad(y, pad)
+    np.testing.assert_array_equal(np.concatenate(frames), librosa.util.frame(padded, frame_length=2048,
+                                                                              hop_length=512).T)
+
+
+@pytest.mark.parametrize('path', VOICE_FILES[::8], ids=os.path.basename)
+def test_streamed_features_match_batch(path):
+    y, sr = load_audio(path)
+    expected = extract_features((y, sr), f0_method='yin')
+    streamed = stream(y, sr, chunk_size=1000)
+    assert streamed.keys() == expected.keys()
+    for name in expected:
+        assert streamed[name] == pytest.approx(expected[name], rel=1e-4, abs=1e-9), name
+
+
+def test_streamed_pitch_with_resampling():
+    sr = 44100
+    t = np.arange(3 * sr) / sr
+    y = (0.5 * np.sin(2 * np.pi * 150 * t)).astype(np.float32)
+    expected = extract_features((y, sr), f0_method='yin')
+    streamed = stream(y, sr, chunk_size=4096)
+    for name in ('MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)'):
+        assert streamed[name] == pytest.approx(expected[name], rel=0.01), name
+
+
+@pytest.mark.parametrize('path', VOICE_FILES[3::12], ids=os.path.basename)
+def test_chunked_features_match_batch(path):
+    expected = extract_features(path, f0_method='yin')
+    # Blocks much shorter than the HPSS context, to exercise the carried frames
+    chunked = extract_features_chunked(path, f0_method='yin', block_seconds=0.3)
+    assert chunked.keys() == expected.keys()
+    for name in expected:
+        assert chunked[name] == pytest.approx(expected[name], rel=1e-4, abs=1e-9), name
+
+
+def test_chunked_extraction_trims_to_max_seconds():
+    path = VOICE_FILES[0]
+    y, sr = load_audio(path)
+    expected = extract_features((y[:sr], sr), f0_method='yin')
+    with open(path, 'rb') as f:
+        chunked = extract_features_chunked(f.read(), f0_method='yin', block_seconds=0.4, max_seconds=1.0)
+    for name in expected:
+        assert chunked[name] == pytest.approx(expected[name], rel=1e-4, abs=1e-9), name
+
+
+def test_sessions_reject_out_of_order_and_overlong_chunks():
+    sessions = VoiceStreamSessions(max_seconds=1.0)
+    stream_id = sessions.create(8000)
+    assert sessions.push(stream_id, 0, np.zeros(4000, dtype=np.float32))['seconds'] == 0.5
+    with pytest.raises(ValueError):
+        sessions.push(stream_id, 0, np.zeros(100, dtype=np.float32))
+    with pytest.raises(ValueError):
+        sessions.push(stream_id, 1, np.zeros(8000, dtype=np.float32))
+    assert sessions.push('unknown', 0, np.zeros(10, dtype=np.float32)) is None
+    assert sessions.finish(stream_id) is sessions.finish(stream_id)
@@ -1,11 +1,63 @@
-import sounddevice as sd
 import numpy as np
-import scipy.io.wavfile as wav
+# librosa resolves its submodules lazily; recording (sounddevice) and CSV export
+# (pandas) are imported inside the functions that need them so the web app
+# never pays for them and works on hosts without an audio device.
 import librosa
-import pandas as pd
+import io
 import os
 
-def record_audio(duration=5, sample_rate=22050, output_file="user_audio.wav"):
+from metrics import AUDIO_SECONDS, stage
+from voice_kernels import diff_stats, frame_abs_means, frame_rms, hpss_harmonic
+
+# Bump whenever a change alters feature values, so cached results are not reused
+FEATURE_EXTRACTOR_VERSION = "3"
+
+# The 22 voice features, in the column order of every feature vector, matrix and CSV
+FEATURE_NAMES = (
+    'MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)', 'MDVP:Jitter(%)', 'MDVP:Jitter(Abs)',
+    'MDVP:RAP', 'MDVP:PPQ', 'Jitter:DDP', 'MDVP:Shimmer', 'MDVP:Shimmer(dB)',
+    'Shimmer:APQ3', 'Shimmer:APQ5', 'MDVP:APQ', 'Shimmer:DDA', 'NHR', 'HNR',
+    'RPDE', 'DFA', 'spread1', 'spread2', 'D2', 'PPE'
+)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+FEATURE_DTYPE = np.float32
+
+
+class AudioDecodeError(ValueError):
+    """Raised by extract_features(strict=True) when the recording cannot be decoded."""
+
+
+# Voice risk factors as (feature, comparison, threshold, detail); 3 or more means "Yes"
+RISK_RULES = (
+    ('MDVP:Jitter(%)', '>', 1.0, "High Jitter percentage"),
+    ('MDVP:Shimmer', '>', 2.0, "Elevated Shimmer"),
+    ('HNR', '<', 0.6, "Low Harmonics to Noise Ratio"),
+    ('PPE', '>', 50.0, "High Pitch Period Entropy"),
+)
+RISK_FACTORS_FOR_YES = 3
+
+# STFT parameters shared by every spectral feature (librosa's defaults)
+N_FFT = 2048
+HOP_LENGTH = 512
+# Median filter length of the harmonic/percussive separation (librosa's default)
+HPSS_KERNEL = 31
+
+# F0 backends: "pyin" is the accurate reference, "yin" is the fast vectorized tracker
+F0_METHODS = ('pyin', 'yin')
+# pyin has always been called without sr, so it assumes librosa's default rate
+# and every MDVP:F* value is reported on that scale; the fast backend matches it.
+PYIN_ASSUMED_SR = 22050
+# Fast backend: analysis rate (only ever resampled down) and phonation range in Hz
+FAST_F0_SR = 16000
+FAST_F0_FMIN = 60.0
+FAST_F0_FMAX = 800.0
+FAST_F0_FRAME_SECONDS = 0.04
+FAST_F0_HOP_SECONDS = 0.01
+FAST_F0_THRESHOLD = 0.1
+# Voiced frames further than this ratio from the median F0 are octave errors
+FAST_F0_OUTLIER_RATIO = 1.5
+
+def record_audio(duration=5, sample_rate=22050, output_file="user_audio.wav", on_chunk=None):
     """
     Record audio from the user's microphone.
     
@@ -13,37 +65,122 @@ def record_audio(duration=5, sample_rate=22050, output_file="user_audio.wav"):
         duration (int): Recording duration in seconds.
         sample_rate (int): Sampling rate of the audio.
         output_file (str): Path to save the recorded audio.
+        on_chunk (callable): Called with each block of float32 samples while recording,
+            e.g. StreamingVoiceAnalyzer.push; runs in the calling thread, not the audio thread.
+
+    Returns:
+        np.ndarray: The recorded samples.
     """
+    import queue
+    import sounddevice as sd
+    import scipy.io.wavfile as wav
+
+    blocks = queue.Queue()
+
+    def callback(indata, frames, time_info, status):
+        # Runs on the audio thread: only copy the block out
+        if status:
+            print(f"Recording status: {status}")
+        blocks.put(indata[:, 0].copy())
+
+    total = int(duration * sample_rate)
+    chunks = []
+    received = 0
     print("Recording...")
-    audio = sd.rec(int(duration * sample_rate), samplerate=sample_rate, channels=1, dtype='float32')
-    sd.wait()  # Wait until recording is finished
+    with sd.InputStream(samplerate=sample_rate, channels=1, dtype='float32', callback=callback):
+        while received < total:
+            try:
+                chunk = blocks.get(timeout=duration + 5)
+            except queue.Empty:
+                raise RuntimeError("No audio received from the input device")
+            chunk = chunk[:total - received]
+            chunks.append(chunk)
+            received += len(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
     print("Recording complete.")
+    audio = np.concatenate(chunks)
 
     # Save the recorded audio as a WAV file
     wav.write(output_file, sample_rate, (audio * 32767).astype(np.int16))  # Convert to 16-bit PCM format
     print(f"Audio saved to {output_file}")
+    return audio
 
-def extract_features(file_path):
-    """Extract features from an audio file."""
+def load_audio(source):
+    """
+    Load audio from a path, raw bytes, a file-like object or a decoded (y, sr) pair.
+
+    Returns:
+        tuple: (y, sr) with y as a mono float32 array.
+    """
+    if isinstance(source, tuple):
+        y, sr = source
+        y = np.asarray(y, dtype=np.float32)
+        if y.ndim > 1:
+            y = librosa.to_mono(y)
+        return y, sr
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
     try:
         # First try with default parameters
-        y, sr = librosa.load(file_path, sr=None)
-    except Exception as e:
+        return librosa.load(source, sr=None)
+    except Exception:
+        # If failed, try with specific sample rate
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return librosa.load(source, sr=22050, mono=True)
+
+def extract_features(source, f0_method='pyin', strict=False):
+    """
+    Extract features from audio.
+
+    Parameters:
+        source: Path to an audio file, raw file bytes, a file-like object or a (y, sr) pair.
+        f0_method (str): Pitch tracker for the MDVP:Fo/Fhi/Flo features, one of F0_METHODS.
+        strict (bool): Raise AudioDecodeError for an undecodable recording instead of
+            returning all-zero default features (which must never be cached as its result).
+    """
+    if f0_method not in F0_METHODS:
+        raise ValueError(f"Unknown f0_method '{f0_method}', expected one of {F0_METHODS}")
+    # The stage is entered outside the try: its hooks (e.g. an expired request deadline)
+    # must propagate rather than be mistaken for a decoding failure
+    with stage('voice.load'):
         try:
-            # If failed, try with specific sample rate
-            y, sr = librosa.load(file_path, sr=22050, mono=True)
+            y, sr = load_audio(source)
         except Exception as e:
+            if strict:
+                raise AudioDecodeError(f"Could not decode the recording: {str(e)}") from e
             print(f"Error loading audio file: {str(e)}")
             # Return default features with zero values
             return create_default_features()
             
+    AUDIO_SECONDS.observe(len(y) / sr)
     features = {}
     
     # 1. Fundamental frequency features
-    f0, voiced_flag, voiced_probs = librosa.pyin(y, 
-                                                fmin=librosa.note_to_hz('C2'), 
-                                                fmax=librosa.note_to_hz('C7'))
-    f0_cleaned = f0[voiced_flag]
+    with stage(f'voice.f0.{f0_method}'):
+        features.update(f0_features(estimate_f0(y, sr, method=f0_method)))
+    
+    # 2. Jitter features
+    with stage('voice.jitter'):
+        features.update(extract_jitter_features(y))
+    
+    # 3. Shimmer features
+    with stage('voice.shimmer'):
+        features.update(extract_shimmer_features(y))
+    
+    features.update(extract_spectral_features(y, sr))
+    
+    # Ensure all values are finite
+    for key in features:
+        if not np.isfinite(features[key]):
+            features[key] = 0.0
+    
+    return features
+
+def f0_features(f0_cleaned):
+    """MDVP:Fo/Fhi/Flo from the F0 values of the voiced frames."""
+    features = {}
     if len(f0_cleaned) > 0:
         features['MDVP:Fo(Hz)'] = np.mean(f0_cleaned)
         features['MDVP:Fhi(Hz)'] = np.max(f0_cleaned)
@@ -52,104 +189,229 @@ def extract_features(file_path):
         features['MDVP:Fo(Hz)'] = 0.0
         features['MDVP:Fhi(Hz)'] = 0.0
         features['MDVP:Flo(Hz)'] = 0.0
-    
-    # 2. Jitter features
-    y_frames = librosa.util.frame(y, frame_length=2048, hop_length=512)
-    frame_means = np.mean(np.abs(y_frames), axis=0)
-    jitter = np.diff(frame_means)
-    features['MDVP:Jitter(%)'] = np.std(jitter) * 100
-    features['MDVP:Jitter(Abs)'] = np.mean(np.abs(jitter))
-    features['MDVP:RAP'] = np.mean(np.abs(np.diff(jitter)))
-    features['MDVP:PPQ'] = np.percentile(np.abs(jitter), 25)
-    features['Jitter:DDP'] = np.mean(np.abs(np.diff(np.diff(frame_means))))
-    
-    # 3. Shimmer features
-    rms = librosa.feature.rms(y=y)[0]
-    shimmer = np.diff(rms)
-    features['MDVP:Shimmer'] = np.std(shimmer) * 100
-    features['MDVP:Shimmer(dB)'] = librosa.amplitude_to_db(np.std(shimmer))
-    features['Shimmer:APQ3'] = np.mean(np.abs(shimmer))
-    features['Shimmer:APQ5'] = np.percentile(np.abs(shimmer), 75)
-    features['MDVP:APQ'] = np.mean(shimmer)
-    features['Shimmer:DDA'] = np.mean(np.abs(np.diff(shimmer)))
+    return features
+
+def extract_jitter_features(y):
+    """Jitter family from the frame-to-frame change in mean absolute amplitude."""
+    features = {}
+    # Frame means and every statistic of their differences in two compiled passes, see voice_kernels
+    frame_means = frame_abs_means(y, N_FFT, HOP_LENGTH)
+    _, std, mean_abs, q25_abs, mean_abs_second = diff_stats(frame_means, 25)
+    features['MDVP:Jitter(%)'] = std * 100
+    features['MDVP:Jitter(Abs)'] = mean_abs
+    features['MDVP:RAP'] = mean_abs_second
+    features['MDVP:PPQ'] = q25_abs
+    # The second difference of the frame means, as RAP
+    features['Jitter:DDP'] = mean_abs_second
+    return features
+
+def extract_shimmer_features(y):
+    """Shimmer family from the frame-to-frame change in RMS energy."""
+    features = {}
+    rms = frame_rms(y, N_FFT, HOP_LENGTH)
+    mean, std, mean_abs, q75_abs, mean_abs_second = diff_stats(rms, 75)
+    features['MDVP:Shimmer'] = std * 100
+    features['MDVP:Shimmer(dB)'] = librosa.amplitude_to_db(std)
+    features['Shimmer:APQ3'] = mean_abs
+    features['Shimmer:APQ5'] = q75_abs
+    features['MDVP:APQ'] = mean
+    features['Shimmer:DDA'] = mean_abs_second
+    return features
+
+def estimate_f0(y, sr, method='pyin'):
+    """
+    Return the F0 values of the voiced frames of y.
+
+    "pyin" runs librosa.pyin over C2-C7 exactly as before. "yin" resamples once
+    to at most FAST_F0_SR, runs a vectorized YIN over the phonation range and
+    drops octave errors around the median.
+    """
+    if method == 'pyin':
+        f0, voiced_flag, voiced_probs = librosa.pyin(y, 
+                                                    fmin=librosa.note_to_hz('C2'), 
+                                                    fmax=librosa.note_to_hz('C7'))
+        return f0[voiced_flag]
+
+    if sr > FAST_F0_SR:
+        y = librosa.resample(y, orig_sr=sr, target_sr=FAST_F0_SR, res_type='soxr_hq')
+        analysis_sr = FAST_F0_SR
+    else:
+        analysis_sr = sr
+    f0 = _yin(y, analysis_sr, FAST_F0_FMIN, FAST_F0_FMAX,
+              frame_length=int(FAST_F0_FRAME_SECONDS * analysis_sr),
+              hop_length=int(FAST_F0_HOP_SECONDS * analysis_sr))
+    return _clean_yin_f0(f0, sr)
+
+def _clean_yin_f0(f0, sr):
+    """Drop octave errors around the median and rescale to the pyin backend's scale."""
+    if len(f0) > 0:
+        median = np.median(f0)
+        f0 = f0[(f0 > median / FAST_F0_OUTLIER_RATIO) & (f0 < median * FAST_F0_OUTLIER_RATIO)]
+    # Report on the same scale as the pyin backend
+    return f0 * (PYIN_ASSUMED_SR / sr)
+
+def _yin(y, sr, fmin, fmax, frame_length, hop_length, threshold=FAST_F0_THRESHOLD):
+    """Vectorized YIN over all frames at once; returns F0 of the voiced frames only."""
+    if len(y) < frame_length:
+        return np.array([])
+    frames = librosa.util.frame(y, frame_length=frame_length, hop_length=hop_length).T
+    return _yin_frames(frames, sr, fmin, fmax, threshold)
+
+def _yin_frames(frames, sr, fmin, fmax, threshold=FAST_F0_THRESHOLD):
+    """YIN over a (n_frames, frame_length) array; returns F0 of the voiced frames only."""
+    frame_length = frames.shape[1]
+    min_period = max(int(np.floor(sr / fmax)), 1)
+    max_period = min(int(np.ceil(sr / fmin)), frame_length - 1)
+    window = frame_length - max_period
+    if len(frames) == 0 or window < 1:
+        return np.array([])
+
+    frames = frames - frames.mean(axis=1, keepdims=True)
+
+    # Difference function d(tau) = E(0) + E(tau) - 2 r(tau), with r from one FFT per frame
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + window)))
+    spectrum = np.fft.rfft(frames, n=n_fft, axis=1)
+    head = np.fft.rfft(frames[:, :window], n=n_fft, axis=1)
+    r = np.fft.irfft(spectrum * np.conj(head), n=n_fft, axis=1)[:, :max_period + 1]
+    energy = np.concatenate([np.zeros((len(frames), 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+    taus = np.arange(max_period + 1)
+    e_tau = energy[:, taus + window] - energy[:, taus]
+    diff = np.maximum(e_tau[:, :1] + e_tau - 2 * r, 0.0)
+
+    # Cumulative mean normalized difference
+    cumulative = np.cumsum(diff[:, 1:], axis=1)
+    cmndf = np.ones_like(diff)
+    cmndf[:, 1:] = diff[:, 1:] * taus[1:] / np.maximum(cumulative, np.finfo(float).tiny)
+
+    # First local minimum below threshold within the search range
+    search = cmndf[:, min_period:max_period]
+    is_trough = (search[:, 1:-1] <= search[:, :-2]) & (search[:, 1:-1] <= search[:, 2:])
+    candidates = is_trough & (search[:, 1:-1] < threshold)
+    voiced = candidates.any(axis=1)
+    if not voiced.any():
+        return np.array([])
+    rows = np.nonzero(voiced)[0]
+    tau = np.argmax(candidates[rows], axis=1) + min_period + 1
+
+    # Parabolic interpolation around the chosen lag
+    left, mid, right = cmndf[rows, tau - 1], cmndf[rows, tau], cmndf[rows, tau + 1]
+    denom = left - 2 * mid + right
+    shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+    return sr / (tau + np.clip(shift, -1, 1))
+
+def extract_spectral_features(y, sr):
+    """
+    Compute the harmonicity, MFCC and spectral shape features from one shared STFT.
+
+    HPSS, the mel spectrogram and the spectral shape features all reuse the
+    complex spectrogram D and its magnitude S instead of each running an STFT.
+    """
+    with stage('voice.stft'):
+        D, S = compute_spectrum(y)
+    with stage('voice.hpss'):
+        features = extract_harmonicity_features(y, D, S)
+    with stage('voice.mfcc_spectral'):
+        features.update(extract_cepstral_features(S, sr))
+    return features
+
+def compute_spectrum(y):
+    """The shared STFT: complex spectrogram D and its magnitude S."""
+    D = librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    return D, np.abs(D)
+
+def extract_harmonicity_features(y, D, S):
+    """NHR from an HPSS harmonic/noise split of D, and the rolloff-based HNR."""
+    features = {}
     
     # 4. Noise and harmonicity measures
-    harmonics = librosa.effects.harmonic(y)
+    # Only the harmonic part is needed; the compiled median filters skip the percussive mask
+    D_harmonic = hpss_harmonic(D, HPSS_KERNEL)
+    harmonics = librosa.istft(D_harmonic, hop_length=HOP_LENGTH, n_fft=N_FFT,
+                               length=len(y), dtype=y.dtype)
     noise = y - harmonics
     features['NHR'] = np.mean(np.abs(noise)) / np.mean(np.abs(harmonics))
-    features['HNR'] = librosa.feature.spectral_rolloff(y=y)[0].mean()
+    # Rolloff has always been computed at librosa's default sr of 22050
+    features['HNR'] = librosa.feature.spectral_rolloff(S=S)[0].mean()
+    
+    return features
+
+def extract_cepstral_features(S, sr):
+    """MFCC-based nonlinear measures and spectral centroid/bandwidth spread measures."""
+    features = {}
     
     # 5. Nonlinear measures
-    mfccs = librosa.feature.mfcc(y=y, sr=sr)
+    mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr, n_fft=N_FFT)
+    mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), sr=sr)
     features['RPDE'] = np.std(mfccs) / np.mean(mfccs)
     features['DFA'] = np.mean(np.abs(np.diff(mfccs, axis=1)))
     
     # 6. Spread and complexity measures
-    spec_cent = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+    spec_cent = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
     features['spread1'] = np.std(spec_cent)
     features['spread2'] = np.percentile(spec_cent, 75) - np.percentile(spec_cent, 25)
-    features['D2'] = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
+    features['D2'] = np.mean(librosa.feature.spectral_bandwidth(S=S, sr=sr))
     features['PPE'] = np.sum(np.abs(np.diff(mfccs, axis=1))) / mfccs.shape[1]
     
-    # Ensure all values are finite
-    for key in features:
-        if not np.isfinite(features[key]):
-            features[key] = 0.0
-    
     return features
 
+def warm_up(f0_method='pyin'):
+    """
+    Run the full feature pipeline once on a synthetic vowel so librosa's lazy
+    submodule imports and numba JIT compilation happen before the first request.
+    """
+    sr = 8000
+    t = np.arange(sr) / sr
+    y = (0.5 * np.sin(2 * np.pi * 150 * t) + 0.05 * np.sin(2 * np.pi * 300 * t)).astype(np.float32)
+    extract_features((y, sr), f0_method=f0_method)
+
 def create_default_features():
     """Create a default feature dictionary with zero values."""
-    feature_names = [
-        'MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)', 'MDVP:Jitter(%)', 
-        'MDVP:Jitter(Abs)', 'MDVP:RAP', 'MDVP:PPQ', 'Jitter:DDP', 
-        'MDVP:Shimmer', 'MDVP:Shimmer(dB)', 'Shimmer:APQ3', 'Shimmer:APQ5',
-        'MDVP:APQ', 'Shimmer:DDA', 'NHR', 'HNR', 'RPDE', 'DFA',
-        'spread1', 'spread2', 'D2', 'PPE'
-    ]
-    return {name: 0.0 for name in feature_names}
+    return {name: 0.0 for name in FEATURE_NAMES}
+
+def features_to_vector(features, dtype=FEATURE_DTYPE):
+    """Pack a feature dict into a vector in FEATURE_NAMES order."""
+    return np.array([features[name] for name in FEATURE_NAMES], dtype=dtype)
+
+def vector_to_features(vector):
+    """Unpack a FEATURE_NAMES-ordered vector into a feature dict."""
+    return {name: float(value) for name, value in zip(FEATURE_NAMES, vector)}
+
+def _columns(*names):
+    return [FEATURE_INDEX[name] for name in names]
+
+# Normalization applied before features are saved to CSV, column by column
+_NORMALIZE_DIVISORS = np.ones(len(FEATURE_NAMES))
+_NORMALIZE_DIVISORS[_columns('MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)')] = 1000  # Frequency to kHz
+_NORMALIZE_DIVISORS[_columns('HNR')] = 10000  # Scale down high HNR values
+_NORMALIZE_DIVISORS[_columns('spread1', 'spread2')] = 100
+_NORMALIZE_DIVISORS[_columns('D2')] = 1000
+_NORMALIZE_ABS = _columns('RPDE', 'DFA', 'PPE')  # Ensure positive values
+_NORMALIZE_CAPPED = _columns('MDVP:Jitter(%)', 'MDVP:Shimmer', 'PPE')  # Cap percentage values at 100
+
+def normalize_features(matrix):
+    """
+    Scale a feature vector or N x 22 matrix to the ranges used in the CSV output.
+    Returns a new float32 array of the same shape.
+    """
+    matrix = np.asarray(matrix, dtype=FEATURE_DTYPE)
+    normalized = np.atleast_2d(matrix / _NORMALIZE_DIVISORS.astype(FEATURE_DTYPE))
+    normalized[:, _NORMALIZE_ABS] = np.abs(normalized[:, _NORMALIZE_ABS])
+    normalized[:, _NORMALIZE_CAPPED] = np.minimum(normalized[:, _NORMALIZE_CAPPED], 100)
+    return normalized.reshape(matrix.shape)
 
 def save_features_to_csv(features, output_csv):
     """
     Save extracted features to a CSV file with proper scaling.
     """
-    # Define the correct feature order
-    feature_order = [
-        'MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)', 'MDVP:Jitter(%)', 'MDVP:Jitter(Abs)',
-        'MDVP:RAP', 'MDVP:PPQ', 'Jitter:DDP', 'MDVP:Shimmer', 'MDVP:Shimmer(dB)',
-        'Shimmer:APQ3', 'Shimmer:APQ5', 'MDVP:APQ', 'Shimmer:DDA', 'NHR', 'HNR',
-        'RPDE', 'DFA', 'spread1', 'spread2', 'D2', 'PPE'
-    ]
-    
-    # Normalize features to expected ranges
-    normalizers = {
-        'MDVP:Fo(Hz)': lambda x: x / 1000,  # Normalize frequency to kHz
-        'MDVP:Fhi(Hz)': lambda x: x / 1000,
-        'MDVP:Flo(Hz)': lambda x: x / 1000,
-        'MDVP:Jitter(%)': lambda x: min(x, 100),  # Cap percentage values
-        'MDVP:Shimmer': lambda x: min(x, 100),
-        'HNR': lambda x: x / 10000,  # Scale down high HNR values
-        'RPDE': lambda x: abs(x),  # Ensure positive values
-        'DFA': lambda x: abs(x),
-        'spread1': lambda x: x / 100,
-        'spread2': lambda x: x / 100,
-        'D2': lambda x: x / 1000,
-        'PPE': lambda x: min(abs(x), 100)
-    }
-    
-    # Apply normalization
-    normalized_features = features.copy()
-    for key in normalized_features:
-        if key in normalizers:
-            normalized_features[key] = normalizers[key](features[key])
-    
-    # Create DataFrame with normalized values
-    df = pd.DataFrame([normalized_features], columns=feature_order)
+    import pandas as pd
+
+    normalized = normalize_features(features_to_vector(features))
+    df = pd.DataFrame([normalized], columns=FEATURE_NAMES)
     
     # Add validation
     print("\nFeature Statistics:")
     print("-" * 50)
-    for col in feature_order:
+    for col in FEATURE_NAMES:
         value = df[col].iloc[0]
         print(f"{col}: {value:.6f}")
     
@@ -157,7 +419,7 @@ def save_features_to_csv(features, output_csv):
     df.to_csv(output_csv, index=False, float_format='%.6f')
     print(f"\nFeatures saved to {output_csv}")
 
-    assessment, risk_factors, risk_details = assess_parkinsons(normalized_features)
+    assessment, risk_factors, risk_details = assess_parkinsons(vector_to_features(normalized))
     print("\nParkinson's Assessment:")
     print(f"Result: {assessment}")
     print(f"Risk Factors Found: {risk_factors}/4")
@@ -168,6 +430,8 @@ def save_features_to_csv(features, output_csv):
 
 def process_audio(file_path, output_csv):
     """Process audio file and extract features with verification."""
+    import pandas as pd
+
     if not os.path.exists(file_path):
         print(f"Error: File '{file_path}' not found.")
         return
@@ -199,30 +463,40 @@ def process_audio(file_path, output_csv):
         print(f"Error verifying saved file: {str(e)}")
 
     # Add this function after the existing functions, before main()
+_RISK_COLUMNS = _columns(*(rule[0] for rule in RISK_RULES))
+_RISK_THRESHOLDS = np.array([rule[2] for rule in RISK_RULES])
+_RISK_ABOVE = np.array([rule[1] == '>' for rule in RISK_RULES])
+
+def risk_flags(matrix):
+    """Boolean N x len(RISK_RULES) matrix: which risk rules each feature row triggers."""
+    values = np.atleast_2d(matrix)[:, _RISK_COLUMNS]
+    return np.where(_RISK_ABOVE, values > _RISK_THRESHOLDS, values < _RISK_THRESHOLDS)
+
+def assess_parkinsons_batch(matrix):
+    """
+    Score many feature rows at once.
+
+    Parameters:
+        matrix (np.ndarray): N x 22 features in FEATURE_NAMES order.
+
+    Returns:
+        tuple: (has_parkinsons bool array, risk_factors int array, risk_flags bool N x 4 array)
+    """
+    flags = risk_flags(matrix)
+    risk_factors = flags.sum(axis=1)
+    return risk_factors >= RISK_FACTORS_FOR_YES, risk_factors, flags
+
+@stage('voice.assess')
 def assess_parkinsons(features):
     """
     Assess the likelihood of Parkinson's Disease based on voice features.
-    Returns tuple of (assessment, risk_factors)
-    """
-    risk_factors = 0
-    risk_details = []
-    
-    # Define thresholds based on research
-    if features['MDVP:Jitter(%)'] > 1.0:
-        risk_factors += 1
-        risk_details.append("High Jitter percentage")
-    if features['MDVP:Shimmer'] > 2.0:
-        risk_factors += 1
-        risk_details.append("Elevated Shimmer")
-    if features['HNR'] < 0.6:
-        risk_factors += 1
-        risk_details.append("Low Harmonics to Noise Ratio")
-    if features['PPE'] > 50.0:
-        risk_factors += 1
-        risk_details.append("High Pitch Period Entropy")
-    
-    has_parkinsons = risk_factors >= 3
-    return "Yes" if has_parkinsons else "No", risk_factors, risk_details
+    Returns tuple of (assessment, risk_factors, risk_details)
+    """
+    if isinstance(features, dict):
+        features = features_to_vector(features, dtype=np.float64)
+    has_parkinsons, risk_factors, flags = assess_parkinsons_batch(features)
+    risk_details = [rule[3] for rule, flagged in zip(RISK_RULES, flags[0]) if flagged]
+    return "Yes" if has_parkinsons[0] else "No", int(risk_factors[0]), risk_details
 
 
 def main():
@@ -0,0 +1,174 @@
+import numpy as np
+from numba import njit
+
+# Compiled kernels for the voice feature math. Each replaces a chain of NumPy
+# calls (framing, abs, diff of diff, percentile, median filters, softmask) with
+# a single pass that allocates only its output. cache=True stores the machine
+# code next to this file, so the JIT cost is paid once per installation rather
+# than once per process; voice_extraction.warm_up loads it before the first request.
+
+
+@njit(cache=True, nogil=True)
+def frame_abs_means(y, frame_length, hop_length):
+    """Mean |y| of each uncentered frame, like np.mean(np.abs(librosa.util.frame(y, ...)), axis=0)."""
+    n_frames = 1 + (len(y) - frame_length) // hop_length if len(y) >= frame_length else 0
+    out = np.empty(n_frames)
+    # Sliding sum: each sample enters and leaves the window once instead of once per overlapping frame
+    total = 0.0
+    end = 0
+    for i in range(n_frames):
+        start = i * hop_length
+        if i > 0:
+            for j in range(start - hop_length, start):
+                total -= abs(y[j])
+        for j in range(end, start + frame_length):
+            total += abs(y[j])
+        end = start + frame_length
+        out[i] = total / frame_length
+    return out
+
+
+@njit(cache=True, nogil=True)
+def frame_rms(y, frame_length, hop_length):
+    """RMS of each centered, zero-padded frame, like librosa.feature.rms(y=y, ...)[0]."""
+    pad = frame_length // 2
+    n_frames = 1 + len(y) // hop_length
+    out = np.empty(n_frames)
+    total = 0.0
+    lo = 0
+    hi = 0
+    for i in range(n_frames):
+        # Frame i covers padded samples [i * hop, i * hop + frame_length); only real samples count
+        start = max(i * hop_length - pad, 0)
+        stop = min(i * hop_length - pad + frame_length, len(y))
+        for j in range(lo, start):
+            total -= y[j] * y[j]
+        for j in range(hi, stop):
+            total += y[j] * y[j]
+        lo, hi = max(lo, start), max(hi, stop)
+        out[i] = np.sqrt(max(total, 0.0) / frame_length)
+    return out
+
+
+@njit(cache=True, nogil=True)
+def diff_stats(values, q):
+    """
+    Statistics of d = np.diff(values) in one pass over values.
+
+    Returns:
+        tuple: mean(d), std(d), mean(|d|), percentile(|d|, q) and mean(|diff(d)|);
+            NaN where there are too few values.
+    """
+    n = len(values) - 1
+    if n < 1:
+        return np.nan, np.nan, np.nan, np.nan, np.nan
+    abs_d = np.empty(n)
+    total = 0.0
+    total_sq = 0.0
+    total_abs = 0.0
+    total_abs_second = 0.0
+    # Shift by the first difference so the variance does not lose precision to cancellation
+    shift = values[1] - values[0]
+    previous = shift
+    for i in range(n):
+        d = values[i + 1] - values[i]
+        total += d - shift
+        total_sq += (d - shift) * (d - shift)
+        abs_d[i] = abs(d)
+        total_abs += abs_d[i]
+        if i > 0:
+            total_abs_second += abs(d - previous)
+        previous = d
+    mean_shifted = total / n
+    std = np.sqrt(max(total_sq / n - mean_shifted * mean_shifted, 0.0))
+    mean_abs_second = total_abs_second / (n - 1) if n > 1 else np.nan
+    return mean_shifted + shift, std, total_abs / n, np.percentile(abs_d, q), mean_abs_second
+
+
+@njit(cache=True, nogil=True)
+def _reflect(i, n):
+    # scipy.ndimage mode='reflect': (d c b a | a b c d | d c b a)
+    while i < 0 or i >= n:
+        i = -i - 1 if i < 0 else 2 * n - i - 1
+    return i
+
+
+@njit(cache=True, nogil=True)
+def _sliding_median(line, size, out):
+    """Running median of `size` values centered on each element of line, edges reflected."""
+    n = len(line)
+    half = size // 2
+    window = np.empty(size, dtype=line.dtype)
+    for k in range(size):
+        window[k] = line[_reflect(k - half, n)]
+    window.sort()
+    for i in range(n):
+        out[i] = window[half]
+        if i == n - 1:
+            break
+        # Slide: drop the value leaving the window, insert the one entering, keeping the window sorted
+        leaving = line[_reflect(i - half, n)]
+        entering = line[_reflect(i + half + 1, n)]
+        pos = np.searchsorted(window, leaving)
+        if entering >= leaving:
+            while pos + 1 < size and window[pos + 1] < entering:
+                window[pos] = window[pos + 1]
+                pos += 1
+        else:
+            while pos > 0 and window[pos - 1] > entering:
+                window[pos] = window[pos - 1]
+                pos -= 1
+        window[pos] = entering
+
+
+@njit(cache=True, nogil=True)
+def median_filter_time(S, size):
+    """Median over `size` neighbouring frames (last axis), like median_filter(S, size=(1, size), mode='reflect')."""
+    out = np.empty_like(S)
+    for row in range(S.shape[0]):
+        _sliding_median(S[row], size, out[row])
+    return out
+
+
+@njit(cache=True, nogil=True)
+def median_filter_freq(S, size):
+    """Median over `size` neighbouring bins (first axis), like median_filter(S, size=(size, 1), mode='reflect')."""
+    out = np.empty_like(S)
+    column = np.empty(S.shape[0], dtype=S.dtype)
+    filtered = np.empty(S.shape[0], dtype=S.dtype)
+    for col in range(S.shape[1]):
+        column[:] = S[:, col]
+        _sliding_median(column, size, filtered)
+        out[:, col] = filtered
+    return out
+
+
+@njit(cache=True, nogil=True)
+def apply_harmonic_mask(D, S, harm, perc):
+    """
+    D * softmask(harm, perc, power=2, split_zeros=True): the harmonic part of
+    librosa.decompose.hpss(D) with margin 1, given the two median filters of S = |D|.
+    """
+    out = np.empty_like(D)
+    tiny = np.finfo(S.dtype).tiny
+    for i in range(D.shape[0]):
+        for j in range(D.shape[1]):
+            h = harm[i, j]
+            p = perc[i, j]
+            z = max(h, p)
+            if z < tiny:
+                mask = 0.5
+            else:
+                h = (h / z) ** 2
+                p = (p / z) ** 2
+                mask = h / (h + p)
+            out[i, j] = D[i, j] * mask
+    return out
+
+
+def hpss_harmonic(D, kernel_size=31):
+    """Harmonic spectrogram of D, equivalent to librosa.decompose.hpss(D, kernel_size=kernel_size)[0]."""
+    if kernel_size % 2 == 0:
+        raise ValueError("kernel_size must be odd")
+    S = np.abs(D)
+    return apply_harmonic_mask(D, S, median_filter_time(S, kernel_size), median_filter_freq(S, kernel_size))
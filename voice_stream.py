@@ -0,0 +1,659 @@
+import io
+import threading
+import time
+import uuid
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from metrics import AUDIO_SECONDS, checkpoint, stage
+from voice_kernels import apply_harmonic_mask, median_filter_freq, median_filter_time
+from voice_extraction import (F0_METHODS, FAST_F0_SR, FAST_F0_FMIN, FAST_F0_FMAX, FAST_F0_FRAME_SECONDS,
+                              FAST_F0_HOP_SECONDS, N_FFT, HOP_LENGTH, HPSS_KERNEL, PYIN_ASSUMED_SR, _clean_yin_f0,
+                              _yin_frames, estimate_f0, extract_features, extract_spectral_features, f0_features)
+
+# Seconds of audio read and analysed at a time by extract_features_chunked
+CHUNK_SECONDS = 5.0
+# power_to_db's default dynamic range below the loudest mel bin
+TOP_DB = 80.0
+
+
+class RunningMoments:
+    """Count, mean and population variance of a stream of values, merged batch by batch."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = values.size
+        if n == 0:
+            return
+        mean = values.mean()
+        m2 = np.sum((values - mean) ** 2)
+        # Chan et al. parallel update of the two partial moments
+        delta = mean - self.mean
+        total = self.count + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+
+
+class FrameDiffStats:
+    """
+    Running statistics of the frame-to-frame differences d of a per-frame series
+    (frame mean amplitude for jitter, RMS for shimmer), fed as the frames arrive.
+
+    Means and the standard deviation are running accumulators; the percentile
+    measures need every |d|, which is kept (one float per hop).
+    """
+
+    def __init__(self):
+        self.moments = RunningMoments()
+        self.abs_sum = 0.0
+        self.second_abs_sum = 0.0
+        self.second_count = 0
+        self._abs = []
+        self._last_value = None
+        self._last_diff = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        if self._last_value is not None:
+            values = np.concatenate([[self._last_value], values])
+        self._last_value = values[-1]
+        d = np.diff(values)
+        if d.size == 0:
+            return
+        self.moments.update(d)
+        self.abs_sum += np.abs(d).sum()
+        self._abs.append(np.abs(d))
+
+        dd = np.diff(d if self._last_diff is None else np.concatenate([[self._last_diff], d]))
+        self.second_abs_sum += np.abs(dd).sum()
+        self.second_count += dd.size
+        self._last_diff = d[-1]
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean if self.count else np.nan
+
+    @property
+    def std(self):
+        return self.moments.std if self.count else np.nan
+
+    @property
+    def mean_abs(self):
+        return self.abs_sum / self.count if self.count else np.nan
+
+    @property
+    def mean_abs_second(self):
+        return self.second_abs_sum / self.second_count if self.second_count else np.nan
+
+    def percentile_abs(self, q):
+        return np.percentile(np.concatenate(self._abs), q) if self._abs else np.nan
+
+
+class FrameBuffer:
+    """
+    Cut audio arriving in arbitrary chunks into overlapping frames, exactly as
+    librosa.util.frame would on the whole signal. `pad` zeros are added at both
+    ends, like librosa's centered framing.
+    """
+
+    def __init__(self, frame_length, hop_length, pad=0):
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.pad = pad
+        self._buffer = np.zeros(pad, dtype=np.float32)
+
+    def push(self, samples):
+        """Return every frame completed by `samples` as a (n_frames, frame_length) array."""
+        buffer = np.concatenate([self._buffer, np.asarray(samples, dtype=np.float32)])
+        if len(buffer) < self.frame_length:
+            self._buffer = buffer
+            return np.empty((0, self.frame_length), dtype=np.float32)
+        n_frames = 1 + (len(buffer) - self.frame_length) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.frame_length)[::self.hop_length][:n_frames]
+        self._buffer = buffer[n_frames * self.hop_length:]
+        return frames
+
+    def flush(self):
+        """Frames completed by the trailing padding; call once after the last chunk."""
+        return self.push(np.zeros(self.pad, dtype=np.float32))
+
+
+class StreamingYin:
+    """The fast "yin" F0 backend run incrementally: streaming resample, then YIN per completed frame."""
+
+    def __init__(self, sr):
+        self.sr = sr
+        self._resampler = None
+        analysis_sr = sr
+        if sr > FAST_F0_SR:
+            import soxr  # installed with librosa, which uses it for the batch resample
+            self._resampler = soxr.ResampleStream(sr, FAST_F0_SR, 1, dtype='float32', quality='HQ')
+            analysis_sr = FAST_F0_SR
+        self.analysis_sr = analysis_sr
+        self._frames = FrameBuffer(int(FAST_F0_FRAME_SECONDS * analysis_sr), int(FAST_F0_HOP_SECONDS * analysis_sr))
+        self._f0 = []
+        self.voiced = RunningMoments()
+
+    def update(self, samples, last=False):
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(np.asarray(samples, dtype=np.float32), last=last)
+        frames = self._frames.push(samples)
+        if len(frames):
+            f0 = _yin_frames(frames, self.analysis_sr, FAST_F0_FMIN, FAST_F0_FMAX)
+            self._f0.append(f0)
+            self.voiced.update(f0)
+
+    def result(self):
+        """F0 of the voiced frames, octave errors removed, on the pyin backend's scale."""
+        f0 = np.concatenate(self._f0) if self._f0 else np.array([])
+        return _clean_yin_f0(f0, self.sr)
+
+
+class StreamingVoiceAnalyzer:
+    """
+    Compute the voice features of a recording while it is still arriving.
+
+    Each pushed chunk is framed as soon as enough samples exist: jitter (frame
+    mean amplitude), shimmer (RMS) and "yin" pitch are updated frame by frame
+    with running accumulators, so finish() only has the spectral features left
+    to compute. With f0_method='pyin' the pitch is tracked at finish() instead,
+    since pyin decodes the whole recording at once.
+
+    Given a SpectralAccumulator the spectral features are accumulated as well
+    and no audio is kept, so memory no longer grows with the recording; pyin
+    then runs on consecutive blocks of pyin_block_seconds.
+
+    Parameters:
+        sr (int): Sample rate of the pushed audio.
+        f0_method (str): Pitch tracker, one of F0_METHODS.
+        spectral (SpectralAccumulator): Optional streaming spectral analysis.
+        pyin_block_seconds (float): Block length for pyin when the audio is not kept.
+    """
+
+    def __init__(self, sr, f0_method='yin', spectral=None, pyin_block_seconds=CHUNK_SECONDS):
+        if f0_method not in F0_METHODS:
+            raise ValueError(f"Unknown f0_method '{f0_method}', expected one of {F0_METHODS}")
+        self.sr = int(sr)
+        self.f0_method = f0_method
+        self.samples = 0
+        self._chunks = []
+        # Same framing as extract_jitter_features (uncentered) and librosa.feature.rms (centered)
+        self._amplitude_frames = FrameBuffer(N_FFT, HOP_LENGTH)
+        self._rms_frames = FrameBuffer(N_FFT, HOP_LENGTH, pad=N_FFT // 2)
+        self.jitter = FrameDiffStats()
+        self.shimmer = FrameDiffStats()
+        self.rms = RunningMoments()
+        self.pitch = StreamingYin(self.sr) if f0_method == 'yin' else None
+        self.spectral = spectral
+        self._pyin_block = max(int(pyin_block_seconds * self.sr), N_FFT)
+        self._pyin_pending = np.zeros(0, dtype=np.float32)
+        self._pyin_f0 = []
+        self._features = None
+
+    @property
+    def finished(self):
+        return self._features is not None
+
+    def push(self, samples):
+        """Add the next chunk of mono float samples."""
+        if self.finished:
+            raise ValueError("Stream already finished")
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        self.samples += len(samples)
+        if self.spectral is None:
+            self._chunks.append(samples)
+        else:
+            self.spectral.push(samples)
+            if self.f0_method == 'pyin':
+                self._push_pyin(samples)
+        self._update(samples)
+
+    def _push_pyin(self, samples):
+        # Keep between one and two blocks pending so the last block is never a short tail
+        self._pyin_pending = np.concatenate([self._pyin_pending, samples])
+        while len(self._pyin_pending) >= 2 * self._pyin_block:
+            self._pyin_f0.append(estimate_f0(self._pyin_pending[:self._pyin_block], self.sr, method='pyin'))
+            self._pyin_pending = self._pyin_pending[self._pyin_block:]
+
+    def _finish_pyin(self):
+        if len(self._pyin_pending):
+            self._pyin_f0.append(estimate_f0(self._pyin_pending, self.sr, method='pyin'))
+            self._pyin_pending = np.zeros(0, dtype=np.float32)
+        return np.concatenate(self._pyin_f0) if self._pyin_f0 else np.array([])
+
+    def _update(self, samples, last=False):
+        frames = self._amplitude_frames.flush() if last else self._amplitude_frames.push(samples)
+        if len(frames):
+            self.jitter.update(np.mean(np.abs(frames), axis=1))
+
+        frames = self._rms_frames.flush() if last else self._rms_frames.push(samples)
+        if len(frames):
+            rms = np.sqrt(np.mean(frames ** 2, axis=1))
+            self.rms.update(rms)
+            self.shimmer.update(rms)
+
+        if self.pitch is not None:
+            self.pitch.update(samples, last=last)
+
+    def partial(self):
+        """Running statistics of the audio received so far, for live feedback."""
+        voiced = self.pitch.voiced if self.pitch is not None else None
+        return {
+            'seconds': self.samples / self.sr,
+            'f0_hz': voiced.mean * PYIN_ASSUMED_SR / self.sr if voiced is not None and voiced.count else None,
+            'voiced_frames': voiced.count if voiced is not None else None,
+            'rms': self.rms.mean if self.rms.count else None,
+            'jitter_percent': float(self.jitter.std * 100) if self.jitter.count else None,
+            'shimmer_percent': float(self.shimmer.std * 100) if self.shimmer.count else None,
+        }
+
+    def finish(self):
+        """Flush the trailing frames and return the full feature dict, as extract_features would."""
+        if self.finished:
+            return self._features
+        self._update(np.zeros(0, dtype=np.float32), last=True)
+        AUDIO_SECONDS.observe(self.samples / self.sr)
+        y = None
+        if self.spectral is None:
+            y = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.float32)
+            self._chunks = []
+
+        features = {}
+        with stage(f'voice.f0.{self.f0_method}'):
+            if self.pitch is not None:
+                f0 = self.pitch.result()
+            elif y is None:
+                f0 = self._finish_pyin()
+            else:
+                f0 = estimate_f0(y, self.sr, method='pyin')
+            features.update(f0_features(f0))
+        features.update(jitter_features(self.jitter))
+        features.update(shimmer_features(self.shimmer))
+        if y is None:
+            features.update(self.spectral.finish())
+        else:
+            features.update(extract_spectral_features(y, self.sr))
+
+        for key in features:
+            if not np.isfinite(features[key]):
+                features[key] = 0.0
+        self._features = {name: float(value) for name, value in features.items()}
+        return self._features
+
+
+def jitter_features(stats):
+    """The jitter family of extract_jitter_features, from accumulated frame-mean differences."""
+    return {
+        'MDVP:Jitter(%)': stats.std * 100,
+        'MDVP:Jitter(Abs)': stats.mean_abs,
+        'MDVP:RAP': stats.mean_abs_second,
+        'MDVP:PPQ': stats.percentile_abs(25),
+        'Jitter:DDP': stats.mean_abs_second,
+    }
+
+
+def shimmer_features(stats):
+    """The shimmer family of extract_shimmer_features, from accumulated RMS differences."""
+    return {
+        'MDVP:Shimmer': stats.std * 100,
+        'MDVP:Shimmer(dB)': float(librosa.amplitude_to_db(stats.std)) if stats.count else np.nan,
+        'Shimmer:APQ3': stats.mean_abs,
+        'Shimmer:APQ5': stats.percentile_abs(75),
+        'MDVP:APQ': stats.mean,
+        'Shimmer:DDA': stats.mean_abs_second,
+    }
+
+
+class SpectralAccumulator:
+    """
+    extract_spectral_features computed block by block in bounded memory.
+
+    STFT frames are produced as audio arrives. HPSS's median filter along time
+    needs HPSS_KERNEL // 2 frames of context on each side, so a frame is
+    separated once the frames after it exist, and the last few frames are
+    carried into the next block. The harmonic part is overlap-added back into
+    audio the same way librosa.istft does and compared with the matching input
+    samples for NHR. MFCC and spectral shape statistics are running sums; only
+    the spectral centroid (one float per hop, for the spread2 percentiles) is kept.
+
+    Parameters:
+        sr (int): Sample rate of the pushed audio.
+        mel_floor_db (float): power_to_db clipping floor of the whole recording, from mel_floor_db().
+    """
+
+    def __init__(self, sr, mel_floor_db):
+        self.sr = int(sr)
+        self.mel_floor_db = mel_floor_db
+        self.samples = 0
+        self._frames = FrameBuffer(N_FFT, HOP_LENGTH, pad=N_FFT // 2)
+        self._window = librosa.filters.get_window('hann', N_FFT, fftbins=True)
+        n_bins = N_FFT // 2 + 1
+        self._context = np.zeros((n_bins, 0), dtype=np.float32)   # magnitudes of the last separated frames
+        self._pending = np.zeros((n_bins, 0), dtype=np.complex64)  # frames waiting for their right context
+        # Overlap-add tail of the harmonic signal and of the window envelope, in padded samples
+        self._ola = np.zeros(N_FFT - HOP_LENGTH, dtype=np.float32)
+        self._ola_wss = np.zeros(N_FFT - HOP_LENGTH, dtype=np.float32)
+        self._ola_start = 0
+        # Input samples not yet matched with harmonic output
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._audio_start = 0
+
+        self.n_frames = 0
+        self.rolloff_sum = 0.0
+        self.noise_abs_sum = 0.0
+        self.harmonic_abs_sum = 0.0
+        self.mfcc = RunningMoments()
+        self.mfcc_diff_abs_sum = 0.0
+        self.mfcc_diff_count = 0
+        self._last_mfcc = None
+        self.centroid = RunningMoments()
+        self._centroids = []
+        self.bandwidth_sum = 0.0
+
+    def push(self, samples, last=False):
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        self.samples += len(samples)
+        self._audio = np.concatenate([self._audio, samples])
+        frames = self._frames.push(samples)
+        if last:
+            frames = np.concatenate([frames, self._frames.flush()])
+        if len(frames):
+            self._pending = np.concatenate([self._pending, _stft_frames(frames, self._window)], axis=1)
+
+        half = HPSS_KERNEL // 2
+        n_ready = self._pending.shape[1] if last else self._pending.shape[1] - half
+        if n_ready <= 0:
+            return
+        S_pending = np.abs(self._pending)
+        S_all = np.concatenate([self._context, S_pending], axis=1)
+        # Windows of the ready frames lie inside S_all, or reach the true start/end of the signal
+        harm = median_filter_time(S_all, HPSS_KERNEL)
+        start = self._context.shape[1]
+        D = self._pending[:, :n_ready]
+        S = S_pending[:, :n_ready]
+        self._context = S_all[:, max(0, start + n_ready - half):start + n_ready]
+        self._pending = self._pending[:, n_ready:]
+
+        self._update_harmonicity(D, S, harm[:, start:start + n_ready], last)
+        self._update_cepstral(S)
+
+    def _update_harmonicity(self, D, S, harm, last):
+        D_harmonic = apply_harmonic_mask(D, S, harm, median_filter_freq(S, HPSS_KERNEL))
+        frames = self._window[:, np.newaxis] * np.fft.irfft(D_harmonic, n=N_FFT, axis=0)
+
+        n = frames.shape[1]
+        ola = np.zeros((n - 1) * HOP_LENGTH + N_FFT, dtype=np.float32)
+        wss = np.zeros_like(ola)
+        ola[:len(self._ola)] += self._ola
+        wss[:len(self._ola_wss)] += self._ola_wss
+        win_sq = self._window ** 2
+        for i in range(n):
+            ola[i * HOP_LENGTH:i * HOP_LENGTH + N_FFT] += frames[:, i]
+            wss[i * HOP_LENGTH:i * HOP_LENGTH + N_FFT] += win_sq
+        # Padded samples before the next frame's start receive no more contributions
+        done = len(ola) if last else n * HOP_LENGTH
+        self._ola, self._ola_wss = ola[done:], wss[done:]
+        harmonics, envelope = ola[:done], wss[:done]
+
+        # Padded sample p is output sample p - N_FFT // 2 (istft's centered trim), up to len(y)
+        first = self._ola_start - N_FFT // 2
+        self._ola_start += done
+        lo, hi = max(first, self._audio_start), min(first + done, self.samples)
+        if hi <= lo:
+            return
+        harmonics, envelope = harmonics[lo - first:hi - first], envelope[lo - first:hi - first]
+        nonzero = envelope > np.finfo(np.float32).tiny
+        harmonics[nonzero] /= envelope[nonzero]
+        y = self._audio[lo - self._audio_start:hi - self._audio_start]
+        self.noise_abs_sum += np.abs(y - harmonics).sum(dtype=np.float64)
+        self.harmonic_abs_sum += np.abs(harmonics).sum(dtype=np.float64)
+        self._audio = self._audio[hi - self._audio_start:]
+        self._audio_start = hi
+
+    def _update_cepstral(self, S):
+        sr = self.sr
+        self.n_frames += S.shape[1]
+        # Rolloff has always been computed at librosa's default sr of 22050
+        self.rolloff_sum += librosa.feature.spectral_rolloff(S=S)[0].sum(dtype=np.float64)
+
+        mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr, n_fft=N_FFT)
+        mfccs = librosa.feature.mfcc(S=np.maximum(librosa.power_to_db(mel, top_db=None), self.mel_floor_db), sr=sr)
+        self.mfcc.update(mfccs)
+        if self._last_mfcc is not None:
+            mfccs = np.concatenate([self._last_mfcc, mfccs], axis=1)
+        self._last_mfcc = mfccs[:, -1:]
+        diff = np.abs(np.diff(mfccs, axis=1))
+        self.mfcc_diff_abs_sum += diff.sum(dtype=np.float64)
+        self.mfcc_diff_count += diff.size
+
+        centroid = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
+        self.centroid.update(centroid)
+        self._centroids.append(centroid)
+        self.bandwidth_sum += librosa.feature.spectral_bandwidth(S=S, sr=sr).sum(dtype=np.float64)
+
+    def finish(self):
+        """Separate the trailing frames and return the features of extract_spectral_features."""
+        self.push(np.zeros(0, dtype=np.float32), last=True)
+        centroids = np.concatenate(self._centroids) if self._centroids else np.array([np.nan])
+        n_frames = self.n_frames or np.nan
+        return {
+            'NHR': self.noise_abs_sum / self.harmonic_abs_sum if self.harmonic_abs_sum else np.nan,
+            'HNR': self.rolloff_sum / n_frames,
+            'RPDE': self.mfcc.std / self.mfcc.mean if self.mfcc.count else np.nan,
+            'DFA': self.mfcc_diff_abs_sum / self.mfcc_diff_count if self.mfcc_diff_count else np.nan,
+            'spread1': self.centroid.std if self.centroid.count else np.nan,
+            'spread2': np.percentile(centroids, 75) - np.percentile(centroids, 25),
+            'D2': self.bandwidth_sum / n_frames,
+            'PPE': self.mfcc_diff_abs_sum / n_frames,
+        }
+
+
+def _stft_frames(frames, window):
+    """librosa.stft of (n_frames, N_FFT) audio frames, as a (bins, n_frames) complex64 array."""
+    return np.fft.rfft(window[:, np.newaxis] * frames.T, axis=0).astype(np.complex64)
+
+
+def mel_floor_db(blocks, sr):
+    """
+    The power_to_db(top_db=80) clipping floor of a recording given as audio blocks:
+    its loudest mel bin in dB minus TOP_DB. One cheap pass over the audio.
+    """
+    frames = FrameBuffer(N_FFT, HOP_LENGTH, pad=N_FFT // 2)
+    window = librosa.filters.get_window('hann', N_FFT, fftbins=True)
+    loudest = -np.inf
+
+    def update(framed):
+        nonlocal loudest
+        if len(framed):
+            S = np.abs(_stft_frames(framed, window))
+            mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr, n_fft=N_FFT)
+            loudest = max(loudest, librosa.power_to_db(mel, top_db=None).max())
+
+    for block in blocks:
+        update(frames.push(block))
+    update(frames.flush())
+    return loudest - TOP_DB
+
+
+def read_blocks(source, block_seconds=CHUNK_SECONDS, max_seconds=None):
+    """
+    Yield (block, sr) from an audio file in mono float32 blocks, reading
+    through soundfile so only one block is in memory at a time.
+
+    Parameters:
+        source: Path, or a seekable file-like object rewound before reading.
+        block_seconds (float): Length of each block.
+        max_seconds (float): Stop after this much audio (trim overlong recordings).
+    """
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    with sf.SoundFile(source) as f:
+        block = max(int(block_seconds * f.samplerate), 1)
+        remaining = int(max_seconds * f.samplerate) if max_seconds else None
+        while remaining is None or remaining > 0:
+            data = f.read(block if remaining is None else min(block, remaining), dtype='float32', always_2d=True)
+            if not len(data):
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            # Same downmix as librosa.load
+            yield (data[:, 0] if data.shape[1] == 1 else data.mean(axis=1, dtype=np.float32)), f.samplerate
+
+
+def audio_duration(source):
+    """Duration in seconds of an audio file soundfile can read, else None."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return sf.info(source).duration
+    except Exception:
+        return None
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+
+def extract_features_chunked(source, f0_method='pyin', block_seconds=CHUNK_SECONDS, max_seconds=None):
+    """
+    extract_features for long recordings, with peak memory bounded by the
+    block size instead of the recording length.
+
+    The file is read twice in blocks: once for the loudest mel bin, which
+    power_to_db's clipping floor depends on, then through a
+    StreamingVoiceAnalyzer with a SpectralAccumulator. With f0_method="yin"
+    the features match extract_features. With the default "pyin", pitch is
+    tracked per block, so the pitch, jitter and shimmer features can differ
+    slightly from a whole-recording pyin pass.
+    Sources soundfile cannot read fall back to extract_features.
+
+    Parameters:
+        source: Path to an audio file, raw file bytes or a seekable file-like object.
+        f0_method (str): Pitch tracker, one of F0_METHODS.
+        block_seconds (float): Audio read and analysed per step.
+        max_seconds (float): Only analyse the first max_seconds of the recording.
+    """
+    if f0_method not in F0_METHODS:
+        raise ValueError(f"Unknown f0_method '{f0_method}', expected one of {F0_METHODS}")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if audio_duration(source) is None:
+        return extract_features(source, f0_method=f0_method)
+
+    with stage('voice.chunked.mel_range'):
+        sr = sf.info(source).samplerate
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        floor_db = mel_floor_db((block for block, _ in read_blocks(source, block_seconds, max_seconds)), sr)
+    analyzer = StreamingVoiceAnalyzer(sr, f0_method=f0_method, spectral=SpectralAccumulator(sr, floor_db),
+                                      pyin_block_seconds=block_seconds)
+    with stage('voice.chunked.analysis'):
+        for block, _ in read_blocks(source, block_seconds, max_seconds):
+            # A long recording can outlive its request's deadline between blocks
+            checkpoint('voice.chunked.analysis')
+            analyzer.push(block)
+        return analyzer.finish()
+
+
+class StreamStoreFull(Exception):
+    """Raised when no more voice streams can be opened until older ones expire."""
+
+
+class VoiceStreamSessions:
+    """
+    Open streaming voice analyses, keyed by stream id.
+
+    Chunks of a stream must arrive in order (seq 0, 1, 2, ...). A finished
+    stream keeps its features, not its audio, until ttl_seconds after its last
+    activity; idle unfinished streams expire the same way.
+    """
+
+    def __init__(self, f0_method='yin', max_sessions=64, ttl_seconds=300, max_seconds=120):
+        self.f0_method = f0_method
+        self.max_sessions = int(max_sessions)
+        self.ttl = float(ttl_seconds)
+        self.max_seconds = float(max_seconds)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, sample_rate):
+        now = time.time()
+        stream_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune(now)
+            if len(self._sessions) >= self.max_sessions:
+                raise StreamStoreFull(f"{len(self._sessions)} voice streams open")
+            self._sessions[stream_id] = {
+                'analyzer': StreamingVoiceAnalyzer(sample_rate, f0_method=self.f0_method),
+                'next_seq': 0,
+                'updated': now,
+                'lock': threading.Lock(),
+            }
+        return stream_id
+
+    def push(self, stream_id, seq, samples):
+        """Add chunk `seq` of a stream; returns the running statistics, or None if the stream is unknown."""
+        session = self._get(stream_id)
+        if session is None:
+            return None
+        with session['lock']:
+            if seq != session['next_seq']:
+                raise ValueError(f"Expected chunk {session['next_seq']}, got {seq}")
+            analyzer = session['analyzer']
+            if (analyzer.samples + len(samples)) / analyzer.sr > self.max_seconds:
+                raise ValueError(f"Streams are limited to {self.max_seconds:.0f} seconds of audio")
+            with stage('voice.stream.chunk'):
+                analyzer.push(samples)
+            session['next_seq'] += 1
+            session['updated'] = time.time()
+            return analyzer.partial()
+
+    def finish(self, stream_id):
+        """Return the stream's features, finishing it on the first call; None if the stream is unknown."""
+        session = self._get(stream_id)
+        if session is None:
+            return None
+        with session['lock']:
+            with stage('voice.stream.finish'):
+                features = session['analyzer'].finish()
+            session['updated'] = time.time()
+            return features
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            'streams': len(sessions),
+            'max_streams': self.max_sessions,
+            'finished': sum(session['analyzer'].finished for session in sessions),
+        }
+
+    def _get(self, stream_id):
+        with self._lock:
+            self._prune(time.time())
+            return self._sessions.get(stream_id)
+
+    def _prune(self, now):
+        """Drop streams idle past their TTL; caller holds the lock."""
+        expired = [stream_id for stream_id, session in self._sessions.items() if now - session['updated'] > self.ttl]
+        for stream_id in expired:
+            del self._sessions[stream_id]
@@ -0,0 +1,161 @@
+import threading
+import time
+
+
+class BackgroundWarmup:
+    """
+    Run named start-up steps (model loading, dummy inference, JIT warm-up) on a
+    background thread so the process can start serving immediately.
+
+    Steps run in order; each step's return value is kept and can be waited on
+    with result(). A failing step is recorded and the remaining steps still run,
+    so e.g. a model download failure does not stop the librosa warm-up. A failed
+    step is retried by the next result() call that asks for it or by restarting
+    the thread with start(), at most once per backoff period; the backoff doubles
+    after each failure from retry_seconds up to max_retry_seconds.
+    """
+
+    def __init__(self, steps, retry_seconds=5.0, max_retry_seconds=300.0):
+        self.steps = list(steps)
+        self.retry_seconds = float(retry_seconds)
+        self.max_retry_seconds = float(max_retry_seconds)
+        self._results = {}
+        self._timings = {}
+        self._errors = {}
+        self._failures = {}  # name -> (consecutive failures, time of the last one)
+        self._running = set()
+        self._current = None
+        self._started_at = None
+        self._done = threading.Event()
+        self._step_done = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """
+        Start the warm-up thread. Once it has finished, calling this again
+        restarts it only if a failed step is due for a retry.
+        """
+        with self._step_done:
+            if self._thread is not None and (self._thread.is_alive() or
+                                             not any(self._due(name) for name in self._errors)):
+                return self
+            self._started_at = self._started_at or time.time()
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def run(self, names=None):
+        """
+        Run the steps in the calling thread: every step that has not run yet or
+        failed and is due for a retry, or only those in `names` (e.g. load a
+        model before forking, warm up later).
+        """
+        for name, step in self.steps:
+            if names is not None and name not in names:
+                continue
+            with self._step_done:
+                if not self._due(name):
+                    continue
+                self._current = name
+                self._running.add(name)
+            self._run_step(name, step)
+        with self._step_done:
+            self._current = None
+            self._step_done.notify_all()
+
+    def _due(self, name):
+        """Whether step `name` should run now; caller holds the lock."""
+        if name in self._results or name in self._running:
+            return False
+        if name not in self._failures:
+            return True
+        failures, failed_at = self._failures[name]
+        return time.time() >= failed_at + min(self.retry_seconds * 2 ** (failures - 1), self.max_retry_seconds)
+
+    def _run_step(self, name, step):
+        """Run a step the caller has added to _running, recording its outcome."""
+        start = time.perf_counter()
+        try:
+            value = step()
+        except Exception as e:
+            print(f"Warm-up step '{name}' failed: {str(e)}")
+            with self._step_done:
+                self._running.discard(name)
+                self._errors[name] = str(e)
+                failures = self._failures.get(name, (0, 0.0))[0] + 1
+                self._failures[name] = (failures, time.time())
+                self._finish_step()
+            return
+        with self._step_done:
+            self._running.discard(name)
+            self._errors.pop(name, None)
+            self._failures.pop(name, None)
+            self._results[name] = value
+            self._timings[name] = (time.perf_counter() - start) * 1000
+            self._finish_step()
+
+    def _finish_step(self):
+        """Wake waiters and flag completion once every step has an outcome; caller holds the lock."""
+        if all(name in self._results or name in self._errors for name, _ in self.steps):
+            self._done.set()
+        self._step_done.notify_all()
+
+    @property
+    def ready(self):
+        return self._done.is_set() and not self._errors
+
+    def wait(self, timeout=None):
+        """Block until every step has finished; returns True if warm-up succeeded."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def result(self, name, timeout=None):
+        """
+        Return the value produced by step `name`, waiting for it if necessary.
+
+        If the step failed and its backoff has passed, it is retried in the
+        calling thread; callers arriving during the retry wait for it.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        retried = False
+        with self._step_done:
+            while name not in self._results:
+                if name in self._errors and name not in self._running:
+                    if retried or not self._due(name):
+                        raise RuntimeError(f"'{name}' is unavailable: {self._errors[name]}")
+                    self._running.add(name)
+                    self._step_done.release()
+                    try:
+                        self._run_step(name, dict(self.steps)[name])
+                    finally:
+                        self._step_done.acquire()
+                    retried = True
+                    continue
+                if name not in self._errors and name not in self._running and self._done.is_set():
+                    raise RuntimeError(f"'{name}' is unavailable: step did not run")
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"Timed out waiting for '{name}' to load")
+                self._step_done.wait(remaining)
+            return self._results[name]
+
+    def status(self):
+        with self._step_done:
+            if self._done.is_set() and self._errors:
+                state = 'failed'
+            elif self._done.is_set():
+                state = 'ready'
+            elif self._thread is None:
+                state = 'not_started'
+            else:
+                state = 'warming'
+            return {
+                'ready': state == 'ready',
+                'state': state,
+                'current_step': self._current,
+                'completed_steps': dict(self._timings),
+                'pending_steps': [name for name, _ in self.steps
+                                  if name not in self._timings and name not in self._errors],
+                'errors': dict(self._errors),
+                'uptime_s': time.time() - self._started_at if self._started_at else 0.0,
+            }